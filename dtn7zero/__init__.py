@@ -3,4 +3,6 @@ Exposing the simplified networkzero inspired API.
 
 To make full use of the libraries' capabilities import the needed modules directly.
 """
-from .api import setup, register, register_group, discover, update, run_forever, start_background_update_thread
+from .api import setup, register, register_group, register_status_reports, discover, update, run_forever, start_background_update_thread
+from .extension_blocks import BundlePriority
+from .status_reports import StatusReportRequest
@@ -0,0 +1,423 @@
+"""
+asyncio integration, works with CPython asyncio and MicroPython (u)asyncio.
+
+AsyncBundleProtocolAgent -> runs the bpa as a task, which sleeps on an event until a cla, an endpoint, or a timer
+                            wakes it up (no sleep-polling)
+AsyncMTcpCLA             -> mtcp cla on asyncio streams, every connection is served by its own coroutine
+AsyncLocalEndpoint       -> endpoint with 'await endpoint.receive()' and 'await endpoint.send(...)'
+
+Example:
+
+    bpa = create_bundle_protocol_agent('dtn://node1/')
+    endpoint = bpa.register_endpoint(AsyncLocalEndpoint('echo'))
+    bpa.start()
+
+    bundle = await endpoint.receive()
+    await endpoint.send(bundle.payload_block.data, bundle.primary_block.full_source_uri)
+"""
+import struct
+from typing import Optional, Dict, Tuple, Callable
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+try:
+    from collections import deque
+except ImportError:
+    from ucollections import deque
+
+try:
+    from cbor2 import dumps
+except ImportError:
+    from cbor import dumps
+
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.convergence_layer_adapters import PushBasedCLA
+from dtn7zero.convergence_layer_adapters.mtcp import TYPE_BYTES, _CBOR_TYPE_MASK, _CBOR_INFO_BITS, \
+    ReceivedInvalidDataOnSocketException
+from dtn7zero.data import Node
+from dtn7zero.endpoints import LocalEndpoint, LocalGroupEndpoint
+from dtn7zero.extension_blocks import BundlePriority
+from dtn7zero.routers import Router
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.storage import Storage
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import get_current_clock_millis, debug, warning
+from py_dtn7 import Bundle
+
+
+# uasyncio raises EOFError on incomplete reads, CPython raises IncompleteReadError (a subclass of EOFError)
+_STREAM_ERRORS = (EOFError, OSError)
+
+# cbor additional information -> struct format of the following length field
+_CBOR_LENGTH_FORMATS = {24: '!B', 25: '!H', 26: '!I', 27: '!Q'}
+
+
+async def _wait_for_event(event, timeout_milliseconds: Optional[int]):
+    if timeout_milliseconds is None:
+        await event.wait()
+        return
+    try:
+        await asyncio.wait_for(event.wait(), timeout_milliseconds / 1000)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _close_writer(writer):
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except _STREAM_ERRORS:
+        pass
+
+
+async def _read_message(reader) -> bytes:
+    header = (await reader.readexactly(1))[0]
+
+    if header & _CBOR_TYPE_MASK != TYPE_BYTES:
+        raise ReceivedInvalidDataOnSocketException('mtcp cla received invalid header: only accepting type byte-string')
+
+    length = header & _CBOR_INFO_BITS
+
+    if length > 23:
+        length_format = _CBOR_LENGTH_FORMATS.get(length)
+        if length_format is None:
+            raise ReceivedInvalidDataOnSocketException('mtcp cla received invalid header: only accepting definite length byte-strings')
+        length = struct.unpack(length_format, await reader.readexactly(struct.calcsize(length_format)))[0]
+
+    return await reader.readexactly(length)
+
+
+class AsyncMTcpCLA(PushBasedCLA):
+
+    def __init__(self, port: int = None):
+        """
+        the server is started by the AsyncBundleProtocolAgent, sending needs a running event loop
+
+        port -> defaults to CONFIGURATION.PORT.MTCP
+        """
+        self.port = CONFIGURATION.PORT.MTCP if port is None else port
+        self.server = None
+        self.wakeup_callback = None
+        self.retry_callback = None
+
+        # (message, from-node-address), micropython deques require a maxlen (the connections wait while it is full)
+        self.received_messages = deque((), CONFIGURATION.MTCP.MAX_QUEUED_RECEIVE_MESSAGES)
+        self.num_receive_connections = 0
+
+        # (address, port) -> stream writer of an established outgoing connection, None while connecting
+        self.send_connections: Dict[Tuple[str, int], Optional[object]] = {}
+
+    async def start(self, wakeup_callback=None, retry_callback=None):
+        """
+        wakeup_callback -> called when a bundle was received
+        retry_callback  -> called when a new outgoing connection is established (bundles waiting for it can be sent)
+        """
+        self.wakeup_callback = wakeup_callback
+        self.retry_callback = retry_callback
+        self.server = await asyncio.start_server(self._serve_receive_connection, '0.0.0.0', self.port, backlog=CONFIGURATION.MTCP.MAX_CONNECTIONS_STATE_WAITING)
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        for writer in tuple(self.send_connections.values()):
+            if writer is not None:
+                await _close_writer(writer)
+        self.send_connections.clear()
+
+    async def _serve_receive_connection(self, reader, writer):
+        address = writer.get_extra_info('peername')[0]
+
+        if self.num_receive_connections >= CONFIGURATION.MTCP.MAX_CONNECTIONS_STATE_OPEN_RECEIVE:
+            debug('refusing incoming mtcp connection {}, too many open connections'.format(address))
+            await _close_writer(writer)
+            return
+
+        self.num_receive_connections += 1
+        try:
+            while True:
+                message = await asyncio.wait_for(_read_message(reader), CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_INACTIVE_RECEIVE / 1000)
+
+                # a full deque would drop the oldest message, the bpa task drains it in the meantime
+                while len(self.received_messages) >= CONFIGURATION.MTCP.MAX_QUEUED_RECEIVE_MESSAGES:
+                    await asyncio.sleep(0)
+
+                self.received_messages.append((message, address))
+                if self.wakeup_callback is not None:
+                    self.wakeup_callback()
+        except asyncio.TimeoutError:
+            debug('closing incoming mtcp connection {} due to inactivity timeout'.format(address))
+        except ReceivedInvalidDataOnSocketException as e:
+            warning('incoming mtcp connection {} sent invalid data, discarding connection, error: {}'.format(address, e))
+        except _STREAM_ERRORS:
+            debug('remote closed down incoming mtcp connection {}'.format(address))
+        finally:
+            self.num_receive_connections -= 1
+            await _close_writer(writer)
+
+    def poll(self, bundle_id: str = None, node: Node = None) -> Tuple[Optional[Bundle], Optional[str]]:
+        if bundle_id is not None or node is not None:
+            raise Exception('cannot poll specific bundle from specific node with mtcp cla')
+
+        while self.received_messages:
+            serialized_bundle, from_node_address = self.received_messages.popleft()
+            try:
+                return deserialize_bundle(serialized_bundle), from_node_address
+            except Exception as e:
+                warning('error during mtcp bundle deserialization, ignoring bundle. error: {}'.format(e))
+        return None, None
+
+    def send_to(self, node: Optional[Node], serialized_bundle: bytes) -> bool:
+        """
+        writes into an established connection and returns True, otherwise a connection is opened in the background
+        and False is returned (the bundle is then sent on the next retry)
+
+        the transmission is not awaited, send_to_async(...) reports its outcome
+        """
+        return self._write(node, serialized_bundle, None)
+
+    def send_to_async(self, node: Optional[Node], serialized_bundle: bytes, on_sent: Callable[[bool], None]) -> bool:
+        """
+        like send_to(...), on_sent(success) is called once the written bundle was drained into the connection or the
+        connection failed
+        """
+        return self._write(node, serialized_bundle, on_sent)
+
+    def _write(self, node: Optional[Node], serialized_bundle: bytes, on_sent: Optional[Callable[[bool], None]]) -> bool:
+        if node is None:
+            raise Exception('cannot send bundle to unspecified node with mtcp cla')
+
+        if CONFIGURATION.IPND.IDENTIFIER_MTCP not in node.clas:
+            return False
+
+        key = (node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_MTCP])
+
+        if key not in self.send_connections:
+            self.send_connections[key] = None
+            asyncio.create_task(self._open_send_connection(node, key))
+            return False
+
+        writer = self.send_connections[key]
+        if writer is None:
+            return False  # still connecting
+
+        message = dumps(serialized_bundle)
+        writer.write(message)
+        asyncio.create_task(self._drain_send_connection(node, key, writer, len(message), get_current_clock_millis(), on_sent))
+        return True
+
+    async def _open_send_connection(self, node: Node, key: Tuple[str, int]):
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(*key), CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND / 1000)
+        except (asyncio.TimeoutError,) + _STREAM_ERRORS:
+            node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP).record_failure()
+            del self.send_connections[key]
+            return
+
+        self.send_connections[key] = writer
+        if self.retry_callback is not None:
+            self.retry_callback()
+
+        # the receiver never sends anything, a finished read means the remote closed the connection
+        try:
+            await reader.read(1)
+        except _STREAM_ERRORS:
+            pass
+        if self.send_connections.get(key) is writer:
+            del self.send_connections[key]
+        await _close_writer(writer)
+
+    async def _drain_send_connection(self, node: Node, key: Tuple[str, int], writer, num_bytes: int, send_start: int, on_sent: Optional[Callable[[bool], None]]):
+        link_quality = node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP)
+        try:
+            await asyncio.wait_for(writer.drain(), CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND / 1000)
+        except (asyncio.TimeoutError,) + _STREAM_ERRORS:
+            link_quality.record_failure()
+            if self.send_connections.get(key) is writer:
+                del self.send_connections[key]
+            await _close_writer(writer)
+            success = False
+        else:
+            link_quality.record_success(num_bytes, get_current_clock_millis() - send_start)
+            success = True
+
+        if on_sent is not None:
+            on_sent(success)
+
+
+if not RUNNING_MICROPYTHON:
+    class _IPNDDatagramProtocol(asyncio.DatagramProtocol):
+
+        def __init__(self, ipnd):
+            self.ipnd = ipnd
+
+        def datagram_received(self, data, address_tuple):
+            self.ipnd.process_beacon(data, address_tuple[0])
+
+
+class AsyncBundleProtocolAgent(BundleProtocolAgent):
+
+    def __init__(self, full_node_uri: str, storage: Storage, router: Router, poll_interval_milliseconds: int = 10):
+        """ runs the bundle protocol agent as an asyncio task, see BundleProtocolAgent for the arguments
+
+        poll_interval_milliseconds -> upper bound for the idle wait if a cla is not an async cla (e.g. espnow, lora)
+        """
+        super().__init__(full_node_uri, storage, router)
+
+        self.poll_interval_milliseconds = poll_interval_milliseconds
+        self.event = asyncio.Event()
+        self.task = None
+        self.discovery_task = None
+
+    def wakeup(self):
+        self.event.set()
+
+    def retry_stored_bundles(self):
+        """ starts the next storage retry sweep without waiting for the retry interval """
+        self.last_storage_retry_sweep = 0
+        self.event.set()
+
+    def _update_discovery(self):
+        pass  # the discovery task handles ipnd
+
+    def start(self):
+        """ starts the bpa as a task on the running event loop and returns the task """
+        if self.task is not None:
+            raise Exception('AsyncBundleProtocolAgent.start() should only be called once!')
+
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def run(self):
+        all_clas_async = True
+        for cla in self.router.clas.values():
+            if isinstance(cla, AsyncMTcpCLA):
+                await cla.start(self.wakeup, self.retry_stored_bundles)
+            else:
+                all_clas_async = False
+
+        self.discovery_task = asyncio.create_task(self._run_discovery())
+
+        try:
+            while True:
+                if self.update():
+                    await asyncio.sleep(0)  # let connections and applications run between batches
+                    continue
+
+                # no await since update() -> no wakeup can be lost between the update and the clear
+                self.event.clear()
+
+                timeout = CONFIGURATION.STORAGE_RETRY_INTERVAL_MILLISECONDS - (get_current_clock_millis() - self.last_storage_retry_sweep)
+                batch_timeout = self.status_reports.milliseconds_until_next_batch()
+                if batch_timeout is not None:
+                    timeout = min(timeout, batch_timeout)
+                if not all_clas_async:
+                    timeout = min(timeout, self.poll_interval_milliseconds)
+
+                await _wait_for_event(self.event, max(0, timeout))
+        finally:
+            self.discovery_task.cancel()
+            for cla in self.router.clas.values():
+                if isinstance(cla, AsyncMTcpCLA):
+                    await cla.stop()
+
+    async def _run_discovery(self):
+        transport = None
+
+        try:
+            while True:
+                if not self.ipnd.check_enabled():
+                    await asyncio.sleep(CONFIGURATION.IPND.SEND_INTERVAL_MILLISECONDS / 1000)
+                    continue
+
+                if RUNNING_MICROPYTHON:
+                    # no datagram endpoints on micropython -> poll the non-blocking socket
+                    while self.ipnd.receive_beacon():
+                        pass
+                    timeout = min(self.ipnd.milliseconds_until_next_beacon(), self.poll_interval_milliseconds)
+                elif transport is None:
+                    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(lambda: _IPNDDatagramProtocol(self.ipnd), sock=self.ipnd.sock)
+                    timeout = 0
+                else:
+                    timeout = self.ipnd.milliseconds_until_next_beacon()
+
+                if timeout > 0:
+                    await asyncio.sleep(timeout / 1000)
+
+                self.ipnd.broadcast_beacon_if_due()
+        finally:
+            if transport is not None:
+                transport.close()
+
+
+async def _receive(endpoint) -> Bundle:
+    while not endpoint.bundle_buffer:
+        endpoint.event.clear()
+        await endpoint.event.wait()
+    return endpoint.bundle_buffer.pop(0)
+
+
+class AsyncLocalEndpoint(LocalEndpoint):
+
+    def __init__(self, endpoint_identifier: str):
+        """ a LocalEndpoint for coroutines, received bundles are buffered until they are awaited with receive() """
+        super().__init__(endpoint_identifier)
+
+        self.event = asyncio.Event()
+
+    def bpa_local_bundle_delivery(self, bundle: Bundle):
+        self._prepare_payload(bundle)
+        self.bundle_buffer.append(bundle)
+        self.event.set()
+
+    async def receive(self) -> Bundle:
+        return await _receive(self)
+
+    async def send(self, payload: bytes, full_destination_uri: str, lifetime: int = 3600 * 24 * 1000, anonymous=False, priority: int = BundlePriority.NORMAL) -> str:
+        """ queues the bundle at the bpa (which is woken up) and returns the bundle id
+
+        waits (without blocking the event loop) while the local dispatch queue of the bpa is full
+        """
+        while True:
+            bundle_id = self.start_transmission(payload, full_destination_uri, lifetime=lifetime, anonymous=anonymous, priority=priority, timeout_milliseconds=0)
+            if bundle_id is not None:
+                await asyncio.sleep(0)
+                return bundle_id
+
+            writable = asyncio.Event()
+            self.notify_when_writable(writable.set)
+            await writable.wait()
+
+
+class AsyncLocalGroupEndpoint(LocalGroupEndpoint):
+
+    def __init__(self, full_group_uri: str):
+        """ a LocalGroupEndpoint for coroutines, received bundles are buffered until they are awaited with receive() """
+        super().__init__(full_group_uri)
+
+        self.event = asyncio.Event()
+
+    def bpa_local_bundle_delivery(self, bundle: Bundle):
+        self._prepare_payload(bundle)
+        self.bundle_buffer.append(bundle)
+        self.event.set()
+
+    async def receive(self) -> Bundle:
+        return await _receive(self)
+
+
+def create_bundle_protocol_agent(full_node_uri: str) -> AsyncBundleProtocolAgent:
+    """ creates an async bpa with in-memory storage, epidemic routing and the async mtcp cla
+
+    the bpa runs after start() was called from within the event loop
+    """
+    storage = SimpleInMemoryStorage()
+    router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: AsyncMTcpCLA()}, storage)
+    return AsyncBundleProtocolAgent(full_node_uri, storage, router)
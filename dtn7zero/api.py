@@ -5,15 +5,15 @@ Inspired by the networkzero library.
 
 Provides a simple NDN (named data network) interface on top of DTN7.
 """
-import time
-
-from typing import Optional, List, Tuple, Callable
+from typing import Optional, List, Tuple, Callable, Union
 
 from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
 from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
 from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
 from dtn7zero.data import Node
-from dtn7zero.endpoints import LocalEndpoint, LocalGroupEndpoint
+from dtn7zero.endpoints import LocalEndpoint, LocalGroupEndpoint, BundleTemplate
+from dtn7zero.extension_blocks import BundlePriority
+from dtn7zero.status_reports import AdministrativeEndpoint, StatusReport
 from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
 from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
 from dtn7zero.utility import get_current_clock_millis, is_timestamp_older_than_timeout
@@ -31,17 +31,46 @@ BPA_THREAD = None
 
 class SimpleEndpoint:
 
-    def __init__(self, service_name, callback=None):
+    def __init__(self, service_name, callback=None, zero_copy=False):
         self._callback = callback
-        self._endpoint = LocalEndpoint(service_name, self._simplifying_callback if callback is not None else None)
+        self._endpoint = LocalEndpoint(service_name, self._simplifying_callback if callback is not None else None, zero_copy)
 
     def _simplifying_callback(self, bundle: Bundle):
         self._callback(bundle.payload_block.data, bundle.primary_block.full_source_uri, bundle.primary_block.full_destination_uri, bundle.primary_block)
 
-    def send(self, payload: bytes, full_destination_address: str, anonymous: bool = False):
+    def send(self, payload: bytes, full_destination_address: str, anonymous: bool = False, priority: int = BundlePriority.NORMAL, timeout_milliseconds: int = None, status_report_requests: int = 0) -> bool:
         """ sends a payload(message) to the specified node_id and service_name
+
+        priority               -> BundlePriority.BULK, BundlePriority.NORMAL (default), or BundlePriority.EXPEDITED
+        timeout_milliseconds   -> how long to block if the bundle protocol agent is overloaded (None -> as long as needed)
+        status_report_requests -> StatusReportRequest flags, the reports are received via register_status_reports(...)
+
+        returns False if the message could not be queued in time (would block)
         """
-        self._endpoint.start_transmission(payload, full_destination_address, anonymous=anonymous)
+        return self._endpoint.start_transmission(payload, full_destination_address, anonymous=anonymous, priority=priority, timeout_milliseconds=timeout_milliseconds, status_report_requests=status_report_requests) is not None
+
+    def create_template(self, full_destination_address: str, anonymous: bool = False, priority: int = BundlePriority.NORMAL, status_report_requests: int = 0) -> BundleTemplate:
+        """ returns a reusable template for send_many(...), the addresses are parsed only once for all its bundles """
+        return self._endpoint.create_bundle_template(full_destination_address, anonymous=anonymous, priority=priority, status_report_requests=status_report_requests)
+
+    def send_many(self, payloads: List[bytes], destination: Union[str, BundleTemplate], anonymous: bool = False, priority: int = BundlePriority.NORMAL, timeout_milliseconds: int = None, status_report_requests: int = 0) -> int:
+        """ sends the payloads(messages) in order to the same destination, e.g. for high-rate telemetry
+
+        destination -> full destination address, or a template from create_template(...) (then the other options of
+                       the template are used)
+
+        returns the number of queued payloads, fewer than len(payloads) if the rest could not be queued in time
+        """
+        if isinstance(destination, BundleTemplate):
+            template = destination
+        else:
+            template = self.create_template(destination, anonymous=anonymous, priority=priority, status_report_requests=status_report_requests)
+
+        return len(self._endpoint.start_transmissions(payloads, template, timeout_milliseconds=timeout_milliseconds))
+
+    def notify_when_writable(self, callback: Callable[[], None]):
+        """ calls the callback once, as soon as send(...) would not block """
+        self._endpoint.notify_when_writable(callback)
 
     def poll(self) -> Tuple[Optional[bytes], Optional[str], Optional[str], Optional[PrimaryBlock]]:
         """ polls a passive endpoint (without callback) for a new payload(message)
@@ -61,9 +90,9 @@ class SimpleEndpoint:
 
 class SimpleGroupEndpoint:
 
-    def __init__(self, full_group_uri, callback=None):
+    def __init__(self, full_group_uri, callback=None, zero_copy=False):
         self._callback = callback
-        self._endpoint = LocalGroupEndpoint(full_group_uri, self._simplifying_callback if callback is not None else None)
+        self._endpoint = LocalGroupEndpoint(full_group_uri, self._simplifying_callback if callback is not None else None, zero_copy)
 
     def _simplifying_callback(self, bundle: Bundle):
         self._callback(bundle.payload_block.data, bundle.primary_block.full_source_uri, bundle.primary_block.full_destination_uri, bundle.primary_block)
@@ -84,7 +113,7 @@ class SimpleGroupEndpoint:
         return None, None, None, None
 
 
-def setup(full_node_uri: str, node_receive_callback: Callable[[bytes, str, str, PrimaryBlock], None] = None) -> SimpleEndpoint:
+def setup(full_node_uri: str, node_receive_callback: Callable[[bytes, str, str, PrimaryBlock], None] = None, pipelined: bool = False) -> SimpleEndpoint:
     """ initializes the bundle protocol agent with the provided full-node-id and returns the node-central endpoint
 
     full_node_uri examples:
@@ -100,6 +129,8 @@ def setup(full_node_uri: str, node_receive_callback: Callable[[bytes, str, str,
 
     the primary block is provided for direct access to additional information
 
+    pipelined -> (CPython only) receive/decode and forwarding run in their own threads, see dtn7zero/pipeline.py
+
     call only once!
     """
     global BPA
@@ -108,8 +139,27 @@ def setup(full_node_uri: str, node_receive_callback: Callable[[bytes, str, str,
         raise Exception('setup(node_id) was called twice!')
 
     storage = SimpleInMemoryStorage()
-    router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: MTcpCLA()}, storage)
-    BPA = BundleProtocolAgent(full_node_uri, storage, router)
+    clas = {CONFIGURATION.IPND.IDENTIFIER_MTCP: MTcpCLA()}
+    if CONFIGURATION.TCPCL.ENABLED:
+        from dtn7zero.convergence_layer_adapters.tcpcl import TcpclCLA
+
+        clas[CONFIGURATION.IPND.IDENTIFIER_TCPCL] = TcpclCLA(full_node_uri)
+    if CONFIGURATION.UDPCL.ENABLED:
+        from dtn7zero.convergence_layer_adapters.udpcl import UdpCLA
+
+        clas[CONFIGURATION.IPND.IDENTIFIER_UDPCL] = UdpCLA()
+    if CONFIGURATION.LOCAL.ENABLED:
+        from dtn7zero.convergence_layer_adapters.local import LocalCLA
+
+        clas[CONFIGURATION.IPND.IDENTIFIER_LOCAL] = LocalCLA()
+    router = SimpleEpidemicRouter(clas, storage)
+    if pipelined:
+        from dtn7zero.pipeline import PipelinedBundleProtocolAgent
+
+        BPA = PipelinedBundleProtocolAgent(full_node_uri, storage, router)
+        BPA.start()
+    else:
+        BPA = BundleProtocolAgent(full_node_uri, storage, router)
 
     # node specific endpoint works like a normal endpoint (only receives exactly matched bundles), but for the node itself
     endpoint = SimpleEndpoint('', node_receive_callback)
@@ -118,7 +168,7 @@ def setup(full_node_uri: str, node_receive_callback: Callable[[bytes, str, str,
     return endpoint
 
 
-def register(endpoint_identifier: str, receive_callback: Callable[[bytes, str, str, PrimaryBlock], None] = None) -> SimpleEndpoint:
+def register(endpoint_identifier: str, receive_callback: Callable[[bytes, str, str, PrimaryBlock], None] = None, zero_copy: bool = False) -> SimpleEndpoint:
     """ registers an endpoint at the bundle protocol agent over which you can send/receive bundles(messages)
 
     endpoint_identifier examples:
@@ -133,24 +183,30 @@ def register(endpoint_identifier: str, receive_callback: Callable[[bytes, str, s
         pass
 
     the primary block is provided for direct access to additional information
+
+    zero_copy -> the payload may be a memoryview into the receive buffer instead of bytes (mtcp), which saves a copy
+                 of large payloads. keep the view only as long as needed, as it keeps the whole received bundle alive
     """
     global BPA
 
     if BPA is None:
         raise Exception('setup(node_id) was not called!')
 
-    endpoint = SimpleEndpoint(endpoint_identifier, receive_callback)
+    endpoint = SimpleEndpoint(endpoint_identifier, receive_callback, zero_copy)
     BPA.register_endpoint(endpoint._endpoint)
 
     return endpoint
 
 
-def register_group(full_group_uri: str, receive_callback: Callable[[bytes, str, str, PrimaryBlock], None] = None) -> SimpleGroupEndpoint:
+def register_group(full_group_uri: str, receive_callback: Callable[[bytes, str, str, PrimaryBlock], None] = None, zero_copy: bool = False) -> SimpleGroupEndpoint:
     """ registers a group-endpoint at the bundle protocol agent over which you can receive group-addressed bundles
 
     full_group_uri examples:
         "dtn://news/~sport", "dtn://my-group/interesting/new/~topics"
 
+    full_group_uri pattern examples:
+        "dtn://news/~*", "dtn://*/~alerts", "dtn://sensors/building1/" (prefix)
+
     receive_callback -> may be None, but then you need to manually poll the endpoint
 
     receive_callback signature/example:
@@ -159,18 +215,36 @@ def register_group(full_group_uri: str, receive_callback: Callable[[bytes, str,
         pass
 
     the primary block is provided for direct access to additional information
+
+    zero_copy -> the payload may be a memoryview into the receive buffer instead of bytes (mtcp), which saves a copy
+                 of large payloads. keep the view only as long as needed, as it keeps the whole received bundle alive
     """
     global BPA
 
     if BPA is None:
         raise Exception('setup(node_id) was not called!')
 
-    endpoint = SimpleGroupEndpoint(full_group_uri, receive_callback)
+    endpoint = SimpleGroupEndpoint(full_group_uri, receive_callback, zero_copy)
     BPA.register_group_endpoint(endpoint._endpoint)
 
     return endpoint
 
 
+def register_status_reports(receive_callback: Callable[[StatusReport], None] = None) -> AdministrativeEndpoint:
+    """ registers an endpoint for the status reports addressed to this node (requested via send(status_report_requests=...))
+
+    status reports are only generated by nodes with CONFIGURATION.SEND_STATUS_REPORTS_ENABLED = True
+
+    receive_callback -> may be None, but then you need to manually poll the endpoint
+    """
+    global BPA
+
+    if BPA is None:
+        raise Exception('setup(node_id) was not called!')
+
+    return BPA.register_administrative_endpoint(AdministrativeEndpoint(receive_callback))
+
+
 def discover() -> List[Node]:
     """ returns a list of all currently known other nodes in the local network
     """
@@ -188,13 +262,15 @@ def update():
     to be called in an endless loop if you want to write the loop yourself
 
     the alternative solution (or inspiration) is: run_forever()
+
+    returns True if bundles were processed, False if the bundle protocol agent was idle (a good moment to sleep)
     """
     global BPA
 
     if BPA is None:
         raise Exception('setup(node_id was not called!')
 
-    BPA.update()
+    return BPA.update()
 
 
 def run_forever(loop_callback=None, loop_callback_interval_milliseconds=1000, sleep_time_milliseconds=10):
@@ -206,6 +282,9 @@ def run_forever(loop_callback=None, loop_callback_interval_milliseconds=1000, sl
 
     callback() -> None:
         pass
+
+    if the bundle protocol agent had nothing to do, the loop blocks until a socket is readable or the next timer is due,
+    sleep_time_milliseconds bounds this wait only if a cla cannot be waited on (e.g. espnow, lora, dtn7rs rest)
     """
     global BPA
 
@@ -216,16 +295,18 @@ def run_forever(loop_callback=None, loop_callback_interval_milliseconds=1000, sl
 
     try:
         while True:
-            BPA.update()
+            busy = BPA.update()
 
             if loop_callback is not None and is_timestamp_older_than_timeout(last_callback_execution, loop_callback_interval_milliseconds):
                 last_callback_execution = get_current_clock_millis()
                 loop_callback()
 
-            if RUNNING_MICROPYTHON:
-                time.sleep_ms(sleep_time_milliseconds)
-            else:
-                time.sleep(sleep_time_milliseconds / 1000.0)
+            if not busy:
+                if loop_callback is not None:
+                    callback_timeout = loop_callback_interval_milliseconds - (get_current_clock_millis() - last_callback_execution)
+                    BPA.wait(max(0, callback_timeout), sleep_time_milliseconds)
+                else:
+                    BPA.wait(None, sleep_time_milliseconds)
     except KeyboardInterrupt:
         pass
 
@@ -233,6 +314,9 @@ def run_forever(loop_callback=None, loop_callback_interval_milliseconds=1000, sl
 def start_background_update_thread(sleep_time_milliseconds=10):
     """ (experimental) background update thread
 
+    The thread blocks while the bundle protocol agent is idle, bundles sent from other threads wake it up.
+    On MicroPython there is no wakeup, the thread then waits at most sleep_time_milliseconds.
+
     On MicroPython the limited RAM can lead to crashes (most prominently a maximum-recursion-depth RuntimeError).
     The _thread.stack_size(...) can be adjusted for compensation if needed and possible.
     """
@@ -250,15 +334,16 @@ def start_background_update_thread(sleep_time_milliseconds=10):
 
         def update_runner():
             while True:
-                BPA.update()
-                time.sleep_ms(sleep_time_milliseconds)
+                if not BPA.update():
+                    BPA.wait(None, sleep_time_milliseconds)
 
         BPA_THREAD = _thread.start_new_thread(update_runner, ())
     else:
         def self_stopping_update_runner():
             while threading.main_thread().is_alive():
-                BPA.update()
-                time.sleep(sleep_time_milliseconds / 1000.0)
+                if not BPA.update():
+                    # bounded, so the thread notices the end of the main thread
+                    BPA.wait(1000, sleep_time_milliseconds)
 
         BPA_THREAD = threading.Thread(target=self_stopping_update_runner)
         BPA_THREAD.start()
@@ -0,0 +1,146 @@
+"""
+Rebroadcast scheduling for broadcast convergence layer adapters (ESPNOW, LoRa).
+
+Broadcast clas do not tell us which nodes received a bundle, so the router cannot fill the forwarding ledger.
+Without scheduling every retry sweep would rebroadcast every stored bundle.
+
+BroadcastScheduler -> per-bundle trickle timer (RFC 6206): the rebroadcast interval doubles after each interval,
+                      and a rebroadcast is suppressed if enough duplicates of the bundle were heard in the interval.
+AirtimeBudget      -> per-cla duty-cycle limit as a token bucket over the transmission time.
+"""
+import random
+from typing import Dict, List
+
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.utility import get_current_clock_millis
+
+
+_INTERVAL = 0
+_INTERVAL_START = 1
+_TRANSMIT_AT = 2
+_COUNTER = 3
+_REBROADCASTS = 4
+_DONE_IN_INTERVAL = 5
+
+
+def _random_transmit_time(interval_start: int, interval: int) -> int:
+    # trickle picks a random point in the second half of the interval
+    half = interval // 2
+    return interval_start + half + ((random.getrandbits(16) * half) >> 16)
+
+
+class BroadcastScheduler:
+
+    def __init__(self):
+        # bundle-id -> [interval, interval_start, transmit_at, counter, rebroadcasts, done_in_interval]
+        self.states: Dict[str, List[int]] = {}
+        # the tracked bundle-ids, oldest first (micropython dicts do not keep the insertion order)
+        self.tracking_order: List[str] = []
+
+    def _new_state(self, bundle_id: str, now: int) -> List[int]:
+        if len(self.states) >= CONFIGURATION.BROADCAST.MAX_TRACKED_BUNDLES:
+            # the earliest tracked bundle, the router forgets the bundles that left the storage
+            del self.states[self.tracking_order.pop(0)]
+
+        # the first broadcast of a bundle happens immediately, trickle only governs the rebroadcasts
+        interval = CONFIGURATION.BROADCAST.TRICKLE_INTERVAL_MIN_MILLISECONDS
+        state = [interval, now, now, 0, 0, 0]
+        self.states[bundle_id] = state
+        self.tracking_order.append(bundle_id)
+        return state
+
+    def should_broadcast(self, bundle_id: str) -> bool:
+        """
+        returns True if the bundle is due for a (re-)broadcast, the caller calls broadcast_sent(...) once the cla sent
+        it (a broadcast refused by the airtime budget stays due and is not counted)
+        """
+        now = get_current_clock_millis()
+        state = self.states.get(bundle_id)
+
+        if state is None:
+            state = self._new_state(bundle_id, now)
+
+        if now - state[_INTERVAL_START] >= state[_INTERVAL]:
+            # interval expired -> double it (bounded) and reset the duplicate counter
+            state[_INTERVAL] = min(state[_INTERVAL] * 2, CONFIGURATION.BROADCAST.TRICKLE_INTERVAL_MAX_MILLISECONDS)
+            state[_INTERVAL_START] = now
+            state[_TRANSMIT_AT] = _random_transmit_time(now, state[_INTERVAL])
+            state[_COUNTER] = 0
+            state[_DONE_IN_INTERVAL] = 0
+
+        if state[_DONE_IN_INTERVAL] or now < state[_TRANSMIT_AT]:
+            return False
+
+        if state[_COUNTER] >= CONFIGURATION.BROADCAST.TRICKLE_REDUNDANCY_CONSTANT:
+            state[_DONE_IN_INTERVAL] = 1
+            return False  # enough neighbors rebroadcast it already
+        if state[_REBROADCASTS] >= CONFIGURATION.BROADCAST.MAX_REBROADCASTS:
+            return False
+
+        return True
+
+    def broadcast_sent(self, bundle_id: str):
+        """
+        to be called after the bundle was (re-)broadcast, following should_broadcast(...)
+        """
+        state = self.states.get(bundle_id)
+
+        if state is not None:
+            state[_DONE_IN_INTERVAL] = 1
+            state[_REBROADCASTS] += 1
+
+    def heard_duplicate(self, bundle_id: str):
+        """
+        to be called if an already known bundle was received again over the broadcast cla
+        """
+        state = self.states.get(bundle_id)
+
+        if state is None:
+            # we never sent it, but others do -> start tracking with the duplicate already counted
+            state = self._new_state(bundle_id, get_current_clock_millis())
+            state[_TRANSMIT_AT] = _random_transmit_time(state[_INTERVAL_START], state[_INTERVAL])
+
+        state[_COUNTER] += 1
+
+    def forget(self, bundle_id: str):
+        """
+        to be called once the bundle left the storage (forwarded, delivered, deleted or expired)
+        """
+        if self.states.pop(bundle_id, None) is not None:
+            self.tracking_order.remove(bundle_id)
+
+
+class AirtimeBudget:
+
+    def __init__(self, duty_cycle: float, window_milliseconds: int = None):
+        """
+        duty_cycle -> fraction of time the transmitter may be active (0.01 == 1 %), 1.0 disables the limit
+        """
+        if window_milliseconds is None:
+            window_milliseconds = CONFIGURATION.BROADCAST.DUTY_CYCLE_WINDOW_MILLISECONDS
+
+        self.duty_cycle = duty_cycle
+        self.capacity_milliseconds = duty_cycle * window_milliseconds
+
+        self.available_milliseconds = self.capacity_milliseconds
+        self.last_refill = get_current_clock_millis()
+
+    def _refill(self):
+        now = get_current_clock_millis()
+        self.available_milliseconds = min(self.capacity_milliseconds, self.available_milliseconds + (now - self.last_refill) * self.duty_cycle)
+        self.last_refill = now
+
+    def has_budget(self) -> bool:
+        if self.duty_cycle >= 1.0:
+            return True
+
+        self._refill()
+        return self.available_milliseconds > 0
+
+    def consume(self, airtime_milliseconds: float):
+        if self.duty_cycle >= 1.0:
+            return
+
+        self._refill()
+        # may become negative -> the next transmissions wait until the debt is paid off
+        self.available_milliseconds -= airtime_milliseconds
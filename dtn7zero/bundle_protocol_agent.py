@@ -1,17 +1,31 @@
+import socket
+import time
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List
 
-from dtn7zero.data import BundleInformation, BundleStatusReportReasonCodes
+from dtn7zero.data import BundleInformation, BundleStatusReportReasonCodes, BundleDispatchQueue
 from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
 from dtn7zero.endpoints import LocalEndpoint, LocalGroupEndpoint, _LocalEndpoint
+from dtn7zero.extension_blocks import get_extension_block_handler
+from dtn7zero.fragmentation import Reassembler
+from dtn7zero.group_matching import GroupEndpointTrie
 from dtn7zero.ipnd import IPND
 from dtn7zero.routers import Router
+from dtn7zero.serialization import FragmentBundle
+from dtn7zero.status_reports import StatusReportGenerator, StatusReport, AdministrativeEndpoint, parse_administrative_record
 from dtn7zero.storage import Storage
-from dtn7zero.utility import debug, is_correct_node_uri, is_correct_endpoint_uri, is_correct_group_uri
+from dtn7zero.utility import debug, warning, is_correct_node_uri, is_correct_endpoint_uri, is_correct_group_uri, \
+    get_current_clock_millis, is_timestamp_older_than_timeout, SocketPoller, allocate_lock, get_thread_ident
 from py_dtn7.bundle import PrimaryBlock
 
 if RUNNING_MICROPYTHON:
     from wlan import connect, isconnected
+else:
+    import threading
+
+
+# upper bound for a producer waiting on a full local dispatch queue, before it checks whether it must update itself
+_DISPATCH_CAPACITY_CHECK_MILLISECONDS = 100
 
 
 class BundleProtocolAgent:
@@ -29,42 +43,215 @@ class BundleProtocolAgent:
         self.storage = storage
         self.router = router
         self.local_registered_endpoints: Dict[str, List[_LocalEndpoint]] = {}
+        self.local_group_endpoints = GroupEndpointTrie()
 
-        self.local_bundle_dispatch_queue: List[BundleInformation] = []  # this pipeline-stage is needed to prevent infinite-recursion if two local endpoints answer each other on every reception-callback
+        self.local_bundle_dispatch_queue: BundleDispatchQueue = BundleDispatchQueue()  # this pipeline-stage is needed to prevent infinite-recursion if two local endpoints answer each other on every reception-callback
         self.storage_retry_generator = None
+        self.last_storage_retry_sweep = 0
         self.router_poll_generator = None
 
+        # update() is serialized, producers blocking on a full dispatch queue use it to decide whether to update themselves
+        self.update_lock = allocate_lock()
+        self.updating_thread = None
+
+        # producers blocking on a full dispatch queue wait on this condition, notified by the queue on pop()
+        self.dispatch_capacity = None if RUNNING_MICROPYTHON else threading.Condition()
+
         # on micropython we need to handle wireless connections manually
         if RUNNING_MICROPYTHON and CONFIGURATION.MICROPYTHON_CHECK_WIFI:
             if not isconnected():
                 connect()  # the microcontroller may be moved around, so connect to any available network instead of reconnect
 
         scheme_encoded, node_encoded = PrimaryBlock.from_full_uri(full_node_uri)
-        self.ipnd = IPND(scheme_encoded, node_encoded, storage)
+        self.ipnd = IPND(scheme_encoded, node_encoded, storage, router.get_ipnd_services() or None)
+
+        # event loop support -> wait() blocks until one of these sockets is readable or the next timer is due
+        self.poller = SocketPoller()
+        self.poller.register(self.ipnd.sock)
+        self.poller_covers_all_clas = router.register_wakeup_poller(self.poller)
+
+        # a local socket pair lets other threads interrupt a blocking wait() (not available on micropython)
+        self.waiting = False
+        if RUNNING_MICROPYTHON:
+            self.waker_receive, self.waker_send = None, None
+        else:
+            self.waker_receive, self.waker_send = socket.socketpair()
+            self.waker_receive.setblocking(False)
+            self.waker_send.setblocking(False)
+            self.poller.register(self.waker_receive)
+
+        # RFC 9171, 6.1 -> status reports are collected and sent batched, received reports go to these endpoints
+        self.status_reports = StatusReportGenerator(self)
+        self.administrative_endpoints: List[AdministrativeEndpoint] = []
+
+        # fragments destined for this node are collected here until the bundle is complete
+        self.reassembler = Reassembler()
+
+    def update(self, time_budget_milliseconds: int = None, max_items: int = None) -> bool:
+        """ processes the local, stored, and remote bundle stages in round-robin batches until either the time budget
+        or the item budget is spent, or all stages are idle.
+
+        time_budget_milliseconds, max_items -> default to CONFIGURATION.UPDATE_TIME_BUDGET_MILLISECONDS and
+                                               CONFIGURATION.UPDATE_MAX_ITEMS
+
+        returns True if any bundle was processed, False if all stages were idle (the caller may sleep then)
+        """
+        with self.update_lock:
+            self.updating_thread = get_thread_ident()
+            try:
+                return self._update(time_budget_milliseconds, max_items)
+            finally:
+                self.updating_thread = None
+
+    def _update(self, time_budget_milliseconds: int, max_items: int) -> bool:
+        if time_budget_milliseconds is None:
+            time_budget_milliseconds = CONFIGURATION.UPDATE_TIME_BUDGET_MILLISECONDS
+        if max_items is None:
+            max_items = CONFIGURATION.UPDATE_MAX_ITEMS
+
+        update_start = get_current_clock_millis()
 
-    def update(self):
         # on micropython we need to handle wireless connections manually
         if RUNNING_MICROPYTHON and CONFIGURATION.MICROPYTHON_CHECK_WIFI:
             if not isconnected():
                 connect()  # the microcontroller may be moved around, so connect to any available network instead of reconnect
 
-        # update discovery
+        self._update_discovery()
+
+        processed_items = int(self.status_reports.update())
+
+        local_active, stored_active, remote_active = True, True, True
+
+        while local_active or stored_active or remote_active:
+            if local_active:
+                local_active = self._process_local_bundle()
+                processed_items += local_active
+            if stored_active:
+                stored_active = self._process_stored_bundle()
+                processed_items += stored_active
+            if remote_active:
+                remote_active = self._process_remote_bundle()
+                processed_items += remote_active
+
+            if processed_items >= max_items or is_timestamp_older_than_timeout(update_start, time_budget_milliseconds):
+                break
+
+        return processed_items > 0
+
+    def wait_for_dispatch_capacity(self, timeout_milliseconds: int = None) -> bool:
+        """ blocks until the local dispatch queue has capacity, returns False if it is still full after the timeout
+
+        timeout_milliseconds -> None blocks as long as needed, 0 only checks
+
+        if no other thread is updating the bpa, the waiting thread updates it itself to drain the queue.
+        inside a receive-callback (the updating thread itself) blocking is impossible and False is returned.
+        """
+        wait_start = get_current_clock_millis()
+
+        while self.local_bundle_dispatch_queue.is_full():
+            if timeout_milliseconds is not None and is_timestamp_older_than_timeout(wait_start, timeout_milliseconds):
+                return False
+
+            if self.updating_thread == get_thread_ident():
+                return False
+            elif self.update_lock.acquire(False):
+                self.update_lock.release()
+                self.update()
+            else:
+                # another thread is draining the queue
+                max_wait_milliseconds = _DISPATCH_CAPACITY_CHECK_MILLISECONDS
+                if timeout_milliseconds is not None:
+                    max_wait_milliseconds = min(max_wait_milliseconds, timeout_milliseconds - (get_current_clock_millis() - wait_start))
+                self._wait_for_dispatch_capacity_notification(max_wait_milliseconds)
+        return True
+
+    def _wait_for_dispatch_capacity_notification(self, max_wait_milliseconds: int):
+        if self.dispatch_capacity is None:
+            time.sleep(0.001)
+            return
+
+        with self.dispatch_capacity:
+            # a pop() between the registration and the check cannot notify before wait() released the condition
+            self.local_bundle_dispatch_queue.add_capacity_callback(self._notify_dispatch_capacity)
+            if self.local_bundle_dispatch_queue.is_full():
+                self.dispatch_capacity.wait(max(0, max_wait_milliseconds) / 1000)
+
+    def _notify_dispatch_capacity(self):
+        with self.dispatch_capacity:
+            self.dispatch_capacity.notify_all()
+
+    def _update_discovery(self):
         self.ipnd.update()
 
-        # process stored/delayed bundle
+    def wait(self, max_wait_milliseconds: int = None, poll_interval_milliseconds: int = 10):
+        """ blocks until a registered socket is readable, a timer of the bpa (beacon, storage retry) is due, or the
+        maximum wait time passed. meant to be called when update() returned False.
+
+        max_wait_milliseconds      -> None waits for the next event or timer only
+        poll_interval_milliseconds -> upper bound for the wait if a cla cannot signal new bundles via sockets
+                                      (pull based clas, espnow, lora) or a wakeup from another thread is impossible
+        """
+        timeout = CONFIGURATION.STORAGE_RETRY_INTERVAL_MILLISECONDS - (get_current_clock_millis() - self.last_storage_retry_sweep)
+
+        beacon_timeout = self.ipnd.milliseconds_until_next_beacon()
+        if beacon_timeout is not None:
+            timeout = min(timeout, beacon_timeout)
+        batch_timeout = self.status_reports.milliseconds_until_next_batch()
+        if batch_timeout is not None:
+            timeout = min(timeout, batch_timeout)
+        if max_wait_milliseconds is not None:
+            timeout = min(timeout, max_wait_milliseconds)
+        if not self.poller_covers_all_clas or self.waker_receive is None:
+            timeout = min(timeout, poll_interval_milliseconds)
+
+        # set before the queue check, so a bundle queued in between still triggers a wakeup
+        self.waiting = True
+        try:
+            if timeout <= 0 or self.local_bundle_dispatch_queue:
+                return
+
+            for sock, _, _, _ in self.poller.poll(timeout):
+                if sock is self.waker_receive:
+                    try:
+                        self.waker_receive.recv(64)
+                    except OSError:
+                        pass
+        finally:
+            self.waiting = False
+
+    def wakeup(self):
+        """ interrupts a blocking wait(), e.g. after a bundle was queued from another thread """
+        if self.waiting and self.waker_send is not None:
+            try:
+                self.waker_send.send(b'\x00')
+            except OSError:
+                pass  # buffer full -> a wakeup is pending anyway
+
+    def _process_local_bundle(self) -> bool:
+        # process one new local bundle (highest priority class first)
+        if self.local_bundle_dispatch_queue:
+            self.bundle_reception(self.local_bundle_dispatch_queue.pop())
+            return True
+        return False
+
+    def _process_stored_bundle(self) -> bool:
+        # process one stored/delayed bundle (the storage yields the highest priority class first)
         if self.storage_retry_generator is None:
+            # a new retry sweep over the storage is started at most once per retry interval
+            if not is_timestamp_older_than_timeout(self.last_storage_retry_sweep, CONFIGURATION.STORAGE_RETRY_INTERVAL_MILLISECONDS):
+                return False
+            self.last_storage_retry_sweep = get_current_clock_millis()
             self.storage_retry_generator = self.storage.get_bundles_to_retry()
 
         try:
             self.bundle_dispatching(next(self.storage_retry_generator))
         except StopIteration:
             self.storage_retry_generator = None
+            return False
+        return True
 
-        # process one new local bundle
-        if self.local_bundle_dispatch_queue:
-            self.bundle_reception(self.local_bundle_dispatch_queue.pop(0))
-
-        # process new remote bundle
+    def _process_remote_bundle(self) -> bool:
+        # process one new remote bundle
         if self.router_poll_generator is None:
             self.router_poll_generator = self.router.generator_poll_bundles()
 
@@ -72,6 +259,8 @@ class BundleProtocolAgent:
             self.bundle_reception(next(self.router_poll_generator))
         except StopIteration:
             self.router_poll_generator = None
+            return False
+        return True
 
     def register_endpoint(self, endpoint: LocalEndpoint) -> LocalEndpoint:
         """ RFC 9171, 3.3 Services Offered by Bundle Protocol Agents
@@ -97,10 +286,7 @@ class BundleProtocolAgent:
 
         endpoint.bpa_register(self)
 
-        if endpoint.full_endpoint_uri in self.local_registered_endpoints:
-            self.local_registered_endpoints[endpoint.full_endpoint_uri].append(endpoint)
-        else:
-            self.local_registered_endpoints[endpoint.full_endpoint_uri] = [endpoint]
+        self.local_group_endpoints.insert(endpoint.full_endpoint_uri, endpoint)
 
         return endpoint
 
@@ -119,16 +305,30 @@ class BundleProtocolAgent:
         """ RFC 9171, 3.3 Services Offered by Bundle Protocol Agents
         […] * terminating a registration.
         """
-        if endpoint.full_endpoint_uri not in self.local_registered_endpoints:
+        if not self.local_group_endpoints.remove(endpoint.full_endpoint_uri, endpoint):
             raise Exception('tried to unregister non-existent local group endpoint {}'.format(endpoint.full_endpoint_uri))
 
+        endpoint.bpa_unregister()
+
+    def get_local_endpoints(self, full_destination_uri: str) -> List[_LocalEndpoint]:
+        # the unicast-endpoint (if any) and all group-endpoints with a matching group uri (pattern)
+        group_endpoints = self.local_group_endpoints.match(full_destination_uri)
+        endpoints = self.local_registered_endpoints.get(full_destination_uri)
+
+        if endpoints is None:
+            return group_endpoints
+        return list(endpoints) + group_endpoints
+
+    def register_administrative_endpoint(self, endpoint: AdministrativeEndpoint) -> AdministrativeEndpoint:
+        # receives the status reports addressed to this node (full_node_uri)
+        self.administrative_endpoints.append(endpoint)
+        return endpoint
+
+    def unregister_administrative_endpoint(self, endpoint: AdministrativeEndpoint):
         try:
-            self.local_registered_endpoints[endpoint.full_endpoint_uri].remove(endpoint)
+            self.administrative_endpoints.remove(endpoint)
         except ValueError:
-            raise Exception('tried to unregister non-existent local group endpoint {}'.format(endpoint.full_endpoint_uri))
-
-        if not self.local_registered_endpoints[endpoint.full_endpoint_uri]:
-            del self.local_registered_endpoints[endpoint.full_endpoint_uri]
+            raise Exception('tried to unregister non-existent administrative endpoint')
 
     def cancel_transmission(self, bundle_id: str) -> bool:
         """ RFC 9171, 3.3 Services Offered by Bundle Protocol Agents
@@ -136,6 +336,7 @@ class BundleProtocolAgent:
         """
         # should only be called by a local endpoint
         # returns True if the bundle was still in local storage to delete, False otherwise
+        self.router.forget_bundle(bundle_id)
         return self.storage.remove_bundle(bundle_id)
 
     def bundle_reception(self, bundle_information: BundleInformation):
@@ -154,8 +355,7 @@ class BundleProtocolAgent:
         "No additional information" SHOULD be generated, destined for the bundle's report-to endpoint ID. […]
         """
         if bundle.primary_block.bundle_processing_control_flags.status_of_report_reception_is_requested:
-            # todo: create a status report
-            pass
+            self.status_reports.add(bundle, StatusReport.RECEIVED, BundleStatusReportReasonCodes.NO_ADDITIONAL_INFORMATION)
 
         """ RFC 9171, 5.6 Bundle Reception
         […] Step 3: CRCs SHOULD be computed for every block of the bundle that has an attached CRC. 
@@ -165,8 +365,8 @@ class BundleProtocolAgent:
         procedure defined in Section 5.10 MUST be followed, and all remaining steps of the Bundle Reception procedure 
         MUST be skipped. […]
         """
-        # currently there is no CRC implemented and bundles with CRC are rejected at bundle deserialization
-        # todo: implement CRC support
+        # the CRCs are verified at bundle deserialization (see serialization.py), where malformed bundles and bundles
+        # with a wrong CRC are already discarded by the CLAs (the bundle, and thereby its report-to endpoint, is unknown)
 
         """ RFC 9171, 5.6 Bundle Reception
         […] Step 4: For each block in the bundle that is an extension block that the BPA cannot process:
@@ -186,12 +386,26 @@ class BundleProtocolAgent:
         indicate that the block must be discarded, then processing continues with the next extension block that the 
         BPA cannot process, if any; otherwise, processing proceeds from Step 5. […]
         """
+        # known extension blocks are decoded and validated by their handlers in the same pass
         for block in bundle.other_blocks[:]:
+            handler = get_extension_block_handler(block.block_type_code)
+
+            if handler is not None:
+                try:
+                    is_valid = handler.validate(bundle, handler.decode(block.data))
+                except Exception as e:
+                    debug('extension block {} of bundle {} could not be decoded, error: {}'.format(block.block_type_code, bundle.bundle_id, e))
+                    is_valid = False
+
+                if not is_valid:
+                    self.bundle_deletion(bundle_information, BundleStatusReportReasonCodes.BLOCK_UNINTELLIGIBLE)
+                    return
+                continue
+
             flags = block.block_processing_control_flags
 
-            if flags.report_status_if_block_cant_be_processed and CONFIGURATION.SEND_STATUS_REPORTS_ENABLED:
-                # todo: generate a status report
-                pass
+            if flags.report_status_if_block_cant_be_processed:
+                self.status_reports.add(bundle, StatusReport.RECEIVED, BundleStatusReportReasonCodes.BLOCK_UNSUPPORTED)
 
             if flags.delete_bundle_if_block_cant_be_processed:
                 self.bundle_deletion(bundle_information, BundleStatusReportReasonCodes.BLOCK_UNSUPPORTED)
@@ -226,7 +440,13 @@ class BundleProtocolAgent:
         the Bundle Delivery procedure defined in Section 5.7 MUST be followed and, […] the node SHALL NOT undertake to 
         forward the bundle to itself in the course of performing the procedure described in Section 5.4. […]
         """
-        if not bundle_information.locally_delivered and bundle_information.bundle.primary_block.full_destination_uri in self.local_registered_endpoints:
+        primary_block = bundle_information.bundle.primary_block
+
+        if bundle_information.locally_delivered:
+            pass
+        elif primary_block.bundle_processing_control_flags.payload_is_admin_record and primary_block.full_destination_uri == self.full_node_uri:
+            self.administrative_record_delivery(bundle_information)
+        elif self.get_local_endpoints(primary_block.full_destination_uri):
             self.local_bundle_delivery(bundle_information)
 
         """ RFC 9171, 5.3 Bundle Dispatching
@@ -243,8 +463,22 @@ class BundleProtocolAgent:
         received fragment) proceeds from Step 2; otherwise, the retention constraint "Reassembly pending" MUST be added 
         to the bundle, and all remaining steps of this procedure MUST be skipped. […]
         """
-        # there is currently no fragment support implemented and fragmented bundles are rejected at deserialization
-        # todo: implement fragment support
+        if isinstance(bundle_information.bundle, FragmentBundle):
+            bundle_information.locally_delivered = True  # the fragment itself is never delivered
+            original_bundle_id = bundle_information.bundle.original_bundle_id
+
+            # the whole bundle may have arrived (or been reassembled) before
+            if self.storage.was_seen(original_bundle_id):
+                return
+
+            reassembled_bundle = self.reassembler.add(bundle_information.bundle)
+
+            if reassembled_bundle is None:
+                bundle_information.retention_constraint = BundleInformation.RETENTION_CONSTRAINT_REASSEMBLY_PENDING
+                return
+
+            self.storage.store_seen(original_bundle_id, None)
+            bundle_information = BundleInformation(reassembled_bundle)
 
         """ RFC 9171, 5.7 Local Bundle Delivery
         […] Step 2: Delivery depends on the state of the registration whose endpoint ID matches that of the destination 
@@ -255,10 +489,37 @@ class BundleProtocolAgent:
         """
         bundle_information.locally_delivered = True
 
-        # on group-endpoints there can be multiple registrations, on unicast-endpoints this is a 1-tuple
-        for endpoint in self.local_registered_endpoints[bundle_information.bundle.primary_block.full_destination_uri]:
+        # on group-endpoints there can be multiple (pattern) registrations
+        for endpoint in self.get_local_endpoints(bundle_information.bundle.primary_block.full_destination_uri):
             endpoint.bpa_local_bundle_delivery(bundle_information.bundle)
 
+        """ RFC 9171, 5.7 Local Bundle Delivery
+        […] Step 3: As soon as any registration matching the bundle's destination endpoint has received the ADU,
+        if the "request reporting of bundle delivery" flag in the bundle's status report request field is set to 1
+        and bundle status reporting is enabled, then a bundle delivery status report SHOULD be generated, destined
+        for the bundle's report-to endpoint ID. […]
+        """
+        if bundle_information.bundle.primary_block.bundle_processing_control_flags.status_of_report_delivery_is_requested:
+            self.status_reports.add(bundle_information.bundle, StatusReport.DELIVERED, BundleStatusReportReasonCodes.NO_ADDITIONAL_INFORMATION)
+
+    def administrative_record_delivery(self, bundle_information: BundleInformation):
+        """ RFC 9171, 6 Administrative Records
+        […] Administrative records are standard application data units that are used in providing some of the
+        features of the Bundle Protocol. […]
+        """
+        bundle_information.locally_delivered = True
+        bundle = bundle_information.bundle
+
+        try:
+            status_reports = parse_administrative_record(bytes(bundle.payload_block.data), bundle.primary_block.full_source_uri)
+        except Exception as e:
+            warning('error during parsing of administrative record, ignoring record. error: {}, bundle: {}'.format(e, bundle.bundle_id))
+            return
+
+        for status_report in status_reports:
+            for endpoint in self.administrative_endpoints:
+                endpoint.bpa_status_report_delivery(status_report)
+
     def bundle_forwarding(self, bundle_information: BundleInformation):
 
         """ RFC 9171, 5.4 Bundle Forwarding
@@ -303,7 +564,7 @@ class BundleProtocolAgent:
                     reason = BundleStatusReportReasonCodes.DEPLETED_STORAGE
 
                 for removed_bundle_information in removed_bundle_informations:
-                    if len(removed_bundle_information.forwarded_to_nodes) > 0:
+                    if removed_bundle_information.forwarded_to_nodes_count > 0:
                         removed_bundle_reason = BundleStatusReportReasonCodes.NO_ADDITIONAL_INFORMATION
                     else:
                         removed_bundle_reason = BundleStatusReportReasonCodes.DEPLETED_STORAGE
@@ -330,8 +591,9 @@ class BundleProtocolAgent:
                 deleted: the Bundle Deletion procedure defined in Section 5.10 MUST be followed, citing the reason for 
                 which forwarding was determined to be contraindicated.
                 """
-                if bundle_information.bundle.primary_block.destination_specific_part in self.local_registered_endpoints:
+                if self.get_local_endpoints(bundle_information.bundle.primary_block.full_destination_uri):
                     bundle_information.retention_constraint = None
+                    self.router.forget_bundle(bundle_information.bundle.bundle_id)
                 else:
                     self.bundle_deletion(bundle_information, reason)
         else:
@@ -346,13 +608,13 @@ class BundleProtocolAgent:
             be "no additional information". […]
             """
             if bundle_information.bundle.primary_block.bundle_processing_control_flags.status_of_report_forwarding_is_requested:
-                # todo: generate a status report
-                pass
+                self.status_reports.add(bundle_information.bundle, StatusReport.FORWARDED, BundleStatusReportReasonCodes.NO_ADDITIONAL_INFORMATION)
 
             """ RFC 9171, 5.4 Bundle Forwarding
             […] * The bundle's "Forward pending" retention constraint MUST be removed.
             """
             bundle_information.retention_constraint = None
+            self.router.forget_bundle(bundle_information.bundle.bundle_id)
 
     def bundle_deletion(self, bundle_information: BundleInformation, reason: int):
         """ RFC 9171, 5.10 Bundle Deletion
@@ -361,13 +623,13 @@ class BundleProtocolAgent:
         deletion SHOULD be generated, destined for the bundle's report-to endpoint ID. […]
         """
         flags = bundle_information.bundle.primary_block.bundle_processing_control_flags
-        if flags.status_of_report_deletion_is_requested and CONFIGURATION.SEND_STATUS_REPORTS_ENABLED:
-            # todo: generate a status report
-            pass
+        if flags.status_of_report_deletion_is_requested:
+            self.status_reports.add(bundle_information.bundle, StatusReport.DELETED, reason)
 
         """ RFC 9171, 5.10 Bundle Deletion
         […] Step 2: All of the bundle's retention constraints MUST be removed.
         """
         bundle_information.retention_constraint = None
+        self.router.forget_bundle(bundle_information.bundle.bundle_id)
 
         debug('bundle scheduled for deletion, reason: {}, bundle: {}'.format(reason, bundle_information.bundle.bundle_id))
@@ -8,6 +8,9 @@ class _SubConfigurationIPND:
     def __init__(self):
         self.ENABLED = True
         self.IDENTIFIER_MTCP = 'mtcp'
+        self.IDENTIFIER_TCPCL = 'tcp'  # the tcpclv4 identifier of dtn7-rs and dtn7-go
+        self.IDENTIFIER_UDPCL = 'udp'
+        self.IDENTIFIER_LOCAL = 'local'  # unofficial, local nodes are added manually (see dtn7zero/convergence_layer_adapters/local.py)
         self.IDENTIFIER_REST = 'rest'  # unofficial, to be used to manually add the rest-cla to the router
         self.IDENTIFIER_ESPNOW = 'espnow'  # unofficial, to be used to manually add the espnow-cla to the router
         self.IDENTIFIER_RF95_LORA = 'rf95_lora'  # unofficial, to be used to manually add the rf95-lora-cla to the router
@@ -31,13 +34,174 @@ class _SubConfigurationMTCP:
             self.MAX_CONNECTIONS_STATE_WAITING = 2
             self.MAX_CONNECTIONS_STATE_OPEN_RECEIVE = 3
             self.TIMEOUT_MILLISECONDS_INACTIVE_RECEIVE = 5000
+            self.MAX_RECEIVE_MESSAGE_BYTES = 64 * 1024  # the receive buffer is allocated at once from the message header
         else:
             self.MAX_CONNECTIONS_STATE_WAITING = 5
             self.MAX_CONNECTIONS_STATE_OPEN_RECEIVE = 10000
             self.TIMEOUT_MILLISECONDS_INACTIVE_RECEIVE = 1000000
+            self.MAX_RECEIVE_MESSAGE_BYTES = 1024 * 1024 * 1024
 
         self.TIMEOUT_MILLISECONDS_STALLED_SEND = 2000
 
+        # outgoing connections are pooled per node, the idle timeout must stay below the inactivity timeout of the
+        # receivers (5 seconds on micropython), otherwise a bundle may be sent into a connection the receiver closes
+        if RUNNING_MICROPYTHON:
+            self.MAX_CONNECTIONS_IDLE_SEND = 2
+        else:
+            self.MAX_CONNECTIONS_IDLE_SEND = 100
+        self.TIMEOUT_MILLISECONDS_IDLE_SEND = 3000
+
+        # the messages buffered per outgoing connection by asynchronous sends, further sends block (send_to)
+        if RUNNING_MICROPYTHON:
+            self.MAX_BYTES_BUFFERED_SEND = 8 * 1024
+        else:
+            self.MAX_BYTES_BUFFERED_SEND = 64 * 1024 * 1024
+
+        # the received messages the async mtcp cla (dtn7zero.aio) queues for the bpa, the connections wait while full
+        if RUNNING_MICROPYTHON:
+            self.MAX_QUEUED_RECEIVE_MESSAGES = 8
+        else:
+            self.MAX_QUEUED_RECEIVE_MESSAGES = 10000
+
+
+class _SubConfigurationTCPCL:
+
+    def __init__(self):
+        self.ENABLED = False  # adds the tcpcl cla to the router on setup(...)
+
+        # offered in the SESS_INIT message, the session uses the minimum of both peers (0 -> no keepalives)
+        self.KEEPALIVE_INTERVAL_SECONDS = 30
+
+        if RUNNING_MICROPYTHON:
+            self.MAX_CONNECTIONS_STATE_WAITING = 2
+            self.MAX_SESSIONS = 3
+            self.SEGMENT_MRU = 4 * 1024
+            self.TRANSFER_MRU = 64 * 1024
+            self.RECEIVE_BUFFER_SIZE = 1024
+            self.MAX_BYTES_BUFFERED_SEND = 8 * 1024
+        else:
+            self.MAX_CONNECTIONS_STATE_WAITING = 5
+            self.MAX_SESSIONS = 1000
+            self.SEGMENT_MRU = 1024 * 1024
+            self.TRANSFER_MRU = 1024 * 1024 * 1024
+            self.RECEIVE_BUFFER_SIZE = 64 * 1024
+            self.MAX_BYTES_BUFFERED_SEND = 64 * 1024 * 1024
+
+        self.TIMEOUT_MILLISECONDS_CONTACT = 5000
+        self.TIMEOUT_MILLISECONDS_TRANSFER = 10000  # without acknowledgement progress
+        self.TIMEOUT_MILLISECONDS_IDLE_SESSION = 60000  # outgoing sessions without transfers are terminated
+
+
+class _SubConfigurationUDPCL:
+
+    def __init__(self):
+        self.ENABLED = False  # adds the udp cla to the router on setup(...)
+
+        # the largest datagram sent or received, larger bundles are fragmented (1472 -> no ip fragmentation on ethernet)
+        self.MAX_DATAGRAM_SIZE = 1472
+
+        # pack several small bundles to the same node into one datagram, only dtn7zero nodes can receive these
+        self.PACK_BUNDLES = False
+
+
+class _SubConfigurationLOCAL:
+
+    def __init__(self):
+        self.ENABLED = False  # adds the local cla to the router on setup(...), with CONFIGURATION.PORT.LOCAL
+
+        # the unix sockets of the local nodes of other processes (CPython only)
+        self.SOCKET_DIRECTORY = '/tmp/dtn7zero'
+        self.MAX_DATAGRAM_SIZE = 64 * 1024
+
+        # the bundles handed over in-process, but not yet polled by the receiving cla
+        if RUNNING_MICROPYTHON:
+            self.MAX_QUEUED_BUNDLES = 10
+        else:
+            self.MAX_QUEUED_BUNDLES = 1000
+
+
+class _SubConfigurationBROADCAST:
+
+    def __init__(self):
+        # trickle-style rebroadcast suppression (RFC 6206) per bundle on broadcast clas (espnow, rf95_lora)
+        self.TRICKLE_INTERVAL_MIN_MILLISECONDS = 1000
+        self.TRICKLE_INTERVAL_MAX_MILLISECONDS = 60000
+        self.TRICKLE_REDUNDANCY_CONSTANT = 2  # suppress a rebroadcast if this many duplicates were heard in the interval
+        self.MAX_REBROADCASTS = 8
+
+        # airtime budget per broadcast cla: fraction of the window the cla may be transmitting
+        self.DUTY_CYCLE_WINDOW_MILLISECONDS = 3600000
+        self.DUTY_CYCLE_ESPNOW = 0.1  # no regulatory limit, but keeps the shared channel usable
+        self.DUTY_CYCLE_RF95_LORA = 0.01  # EU 868 MHz g-band regulatory limit
+
+        if RUNNING_MICROPYTHON:
+            self.MAX_TRACKED_BUNDLES = 18
+        else:
+            self.MAX_TRACKED_BUNDLES = 10000
+
+
+class _SubConfigurationLINK_QUALITY:
+
+    def __init__(self):
+        self.EWMA_ALPHA = 0.25  # weight of the newest sample
+        self.BACKOFF_MIN_MILLISECONDS = 1000  # doubled on every consecutive send failure
+        self.BACKOFF_MAX_MILLISECONDS = 60000
+
+
+class _SubConfigurationSTATUS_REPORTS:
+
+    def __init__(self):
+        # reports to the same report-to endpoint are collected (and merged per bundle) for this window before sending
+        self.BATCH_WINDOW_MILLISECONDS = 1000
+        # False -> one standard RFC 9171 status report per bundle, True -> several reports per bundle as a dtn7zero
+        # specific administrative record, which other implementations (e.g. dtn7-rs) drop -> only for dtn7zero networks
+        self.BATCHING_ENABLED = False
+        self.MAX_BUNDLES_PER_SECOND = 5  # rate limit of report bundles, excess reports stay pending
+        self.LIFETIME_MILLISECONDS = 3600 * 1000
+
+        if RUNNING_MICROPYTHON:
+            self.MAX_REPORTS_PER_BUNDLE = 4
+            self.MAX_PENDING_REPORTS = 8
+        else:
+            self.MAX_REPORTS_PER_BUNDLE = 64
+            self.MAX_PENDING_REPORTS = 10000  # further reports are dropped
+
+
+class _SubConfigurationFRAGMENTATION:
+
+    def __init__(self):
+        # incomplete reassemblies are dropped after this time without a new fragment
+        self.REASSEMBLY_TIMEOUT_MILLISECONDS = 600000
+
+        # reassembly buffers are preallocated in memory up to this total, larger ones are spilled to files in the
+        # spill directory (None -> not spilled, the reassembly is refused)
+        if RUNNING_MICROPYTHON:
+            self.MAX_REASSEMBLY_BUFFERS = 2
+            self.MAX_REASSEMBLY_MEMORY_BYTES = 8 * 1024
+            self.MAX_APPLICATION_DATA_UNIT_BYTES = 256 * 1024
+            self.SPILL_DIRECTORY = 'reassembly'
+        else:
+            self.MAX_REASSEMBLY_BUFFERS = 100
+            self.MAX_REASSEMBLY_MEMORY_BYTES = 64 * 1024 * 1024
+            self.MAX_APPLICATION_DATA_UNIT_BYTES = 1024 * 1024 * 1024
+            self.SPILL_DIRECTORY = None
+
+
+class _SubConfigurationPIPELINE:
+
+    def __init__(self):
+        # optional threaded pipeline (CPython only), see dtn7zero/pipeline.py
+        self.QUEUE_SIZE = 1000  # per stage, a full queue blocks the previous stage
+        self.FORWARDING_WORKERS = 4
+
+
+class _SubConfigurationSHARDING:
+
+    def __init__(self):
+        # optional multi-process deployment (CPython only), see dtn7zero/sharding.py
+        self.NUM_WORKERS = 0  # 0 -> one worker per cpu core
+        self.HANDOVER_QUEUE_SIZE = 1000  # bundles received by a worker that does not own them
+
 
 class _SubConfigurationPORT:
 
@@ -45,6 +209,9 @@ class _SubConfigurationPORT:
         self.BEACON_UDP = 7000
         self.REST = 3000
         self.MTCP = 16162
+        self.TCPCL = 4556
+        self.UDPCL = 4556
+        self.LOCAL = 1
         self.IPND = 3003
 
 
@@ -56,17 +223,48 @@ class _Configuration:
         self.WARNING = True
 
         self.ATTACH_PREVIOUS_NODE_BLOCK = True
+        # crc type of the primary block of created bundles: 0 -> none, 1 -> CRC-16/X.25, 2 -> CRC-32C
+        # (received crcs are always verified, nodes before crc support reject bundles with crc)
+        self.PRIMARY_BLOCK_CRC_TYPE = 0
         self.SEND_STATUS_REPORTS_ENABLED = False
         self.ENCODING = 'utf-8'
         self.IPND: _SubConfigurationIPND = _SubConfigurationIPND()
         self.MTCP: _SubConfigurationMTCP = _SubConfigurationMTCP()
+        self.TCPCL: _SubConfigurationTCPCL = _SubConfigurationTCPCL()
+        self.UDPCL: _SubConfigurationUDPCL = _SubConfigurationUDPCL()
+        self.LOCAL: _SubConfigurationLOCAL = _SubConfigurationLOCAL()
+        self.BROADCAST: _SubConfigurationBROADCAST = _SubConfigurationBROADCAST()
+        self.LINK_QUALITY: _SubConfigurationLINK_QUALITY = _SubConfigurationLINK_QUALITY()
+        self.STATUS_REPORTS: _SubConfigurationSTATUS_REPORTS = _SubConfigurationSTATUS_REPORTS()
+        self.FRAGMENTATION: _SubConfigurationFRAGMENTATION = _SubConfigurationFRAGMENTATION()
+        self.PIPELINE: _SubConfigurationPIPELINE = _SubConfigurationPIPELINE()
+        self.SHARDING: _SubConfigurationSHARDING = _SubConfigurationSHARDING()
         self.PORT: _SubConfigurationPORT = _SubConfigurationPORT()
 
+        # one bpa update processes bundles in batches until one of these budgets is spent or all stages are idle
+        self.UPDATE_TIME_BUDGET_MILLISECONDS = 50
+        self.UPDATE_MAX_ITEMS = 1000
+        # push based clas are drained in batches (poll_many) of at most these budgets
+        if RUNNING_MICROPYTHON:
+            self.POLL_MAX_ITEMS = 4
+            self.POLL_MAX_BYTES = 16 * 1024
+        else:
+            self.POLL_MAX_ITEMS = 100
+            self.POLL_MAX_BYTES = 16 * 1024 * 1024
+        # stored bundles are retried in sweeps over the whole storage, a new sweep starts at most once per interval
+        self.STORAGE_RETRY_INTERVAL_MILLISECONDS = 1000
+
         self.SIMPLE_EPIDEMIC_ROUTER_MIN_NODES_TO_FORWARD_TO = 3
         self.SOCKET_RECEIVE_BUFFER_SIZE = 512
 
         self.MICROPYTHON_CHECK_WIFI = True
 
+        # bundles sent by local endpoints wait here for the next bpa update, a full queue applies backpressure
+        if RUNNING_MICROPYTHON:
+            self.LOCAL_DISPATCH_QUEUE_SIZE = 10
+        else:
+            self.LOCAL_DISPATCH_QUEUE_SIZE = 1000
+
         if RUNNING_MICROPYTHON:
             self.SIMPLE_IN_MEMORY_STORAGE_MAX_STORED_BUNDLES = 7  # experimental setting
             self.SIMPLE_IN_MEMORY_STORAGE_MAX_KNOWN_BUNDLE_IDS = 18  # experimental setting
@@ -1,11 +1,14 @@
 from abc import ABC
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Callable
 
 from dtn7zero.data import Node
+from dtn7zero.utility import SocketPoller
 from py_dtn7 import Bundle
 
 
 class PullBasedCLA(ABC):
+    # the maximum serialized bundle size the cla can send, None -> unlimited (larger bundles are fragmented)
+    mtu: Optional[int] = None
 
     def poll(self, bundle_id: str, node: Node) -> Tuple[Optional[Bundle], Optional[str]]:
         raise NotImplementedError('do not instantiate CLA class directly')
@@ -16,11 +19,87 @@ class PullBasedCLA(ABC):
     def send_to(self, node: Node, serialized_bundle: bytes) -> bool:
         raise NotImplementedError('do not instantiate CLA class directly')
 
+    def get_mtu(self, node: Node) -> Optional[int]:
+        """
+        optional: the maximum serialized bundle size towards the node, defaults to the mtu of the cla
+        """
+        return self.mtu
+
+    def send_to_async(self, node: Node, serialized_bundle: bytes, on_sent: Callable[[bool], None]) -> bool:
+        """
+        optional: buffer the bundle for sending without waiting for the transmission, on_sent(success) is called by a
+        later poll once the transmission finished or failed
+
+        returns False if the bundle was not buffered and must be sent with send_to
+        """
+        return False
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        """
+        optional: register all sockets on which new bundles can arrive (now and in the future) with the poller
+
+        returns False if the cla cannot signal new bundles this way and must be polled periodically
+        """
+        return False
+
+    def get_ipnd_service(self) -> Optional[Tuple[str, int]]:
+        """
+        optional: the (cla identifier, port) announced in the ipnd service block, None if the cla is not announced
+        """
+        return None
+
 
 class PushBasedCLA(ABC):
+    # the maximum serialized bundle size the cla can send, None -> unlimited (larger bundles are fragmented)
+    mtu: Optional[int] = None
+
     def poll(self) -> Tuple[Optional[Bundle], Optional[str]]:
         raise NotImplementedError('do not instantiate CLA class directly')
 
+    def poll_many(self, max_items: int, max_bytes: Optional[int] = None) -> List[Tuple[Bundle, Optional[str]]]:
+        """
+        returns up to max_items received bundles with the addresses of their senders, empty if none is available
+
+        max_bytes -> stop after this many serialized bundle bytes were received (the last bundle may exceed it),
+                     ignored by this default implementation, which calls poll() until no bundle is available
+        """
+        bundles = []
+        while len(bundles) < max_items:
+            bundle, node_address = self.poll()
+            if bundle is None:
+                break
+            bundles.append((bundle, node_address))
+        return bundles
+
     def send_to(self, node: Optional[Node], serialized_bundle: bytes) -> bool:
         raise NotImplementedError('do not instantiate CLA class directly')
 
+    def get_mtu(self, node: Optional[Node]) -> Optional[int]:
+        """
+        optional: the maximum serialized bundle size towards the node (None -> broadcast), defaults to the cla mtu
+        """
+        return self.mtu
+
+    def send_to_async(self, node: Optional[Node], serialized_bundle: bytes, on_sent: Callable[[bool], None]) -> bool:
+        """
+        optional: buffer the bundle for sending without waiting for the transmission, on_sent(success) is called by a
+        later poll once the transmission finished or failed
+
+        returns False if the bundle was not buffered and must be sent with send_to
+        """
+        return False
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        """
+        optional: register all sockets on which new bundles can arrive (now and in the future) with the poller
+
+        returns False if the cla cannot signal new bundles this way and must be polled periodically
+        """
+        return False
+
+    def get_ipnd_service(self) -> Optional[Tuple[str, int]]:
+        """
+        optional: the (cla identifier, port) announced in the ipnd service block, None if the cla is not announced
+        """
+        return None
+
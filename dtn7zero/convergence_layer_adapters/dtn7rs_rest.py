@@ -2,7 +2,8 @@ from typing import Dict, List, Optional, Tuple
 
 from dtn7zero.convergence_layer_adapters import PullBasedCLA
 from dtn7zero.data import Node
-from dtn7zero.utility import debug, warning
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.utility import debug, warning, get_current_clock_millis
 
 try:
     import requests
@@ -49,7 +50,7 @@ class Dtn7RsRestCLA(PullBasedCLA):
         if raw_bundle == b'Bundle not found':
             return None, None
 
-        return Bundle.from_cbor(raw_bundle), node.address
+        return deserialize_bundle(raw_bundle), node.address
 
     def poll_ids(self, node: Node) -> Optional[List[str]]:
         if node not in self.connections:
@@ -70,15 +71,20 @@ class Dtn7RsRestCLA(PullBasedCLA):
             # try to establish a new node connection, todo: what to do on repeated failures (slowing the framework down)?
             self.add_connection(node)
 
+        link_quality = node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_REST)
+        send_start = get_current_clock_millis()
         try:
             response = self.connections[node].push(serialized_bundle)
             if response.status_code != 200:
                 warning('connection {} did not accept our bundle: {} {}'.format(node.address, response.status_code, response.content))
+                link_quality.record_failure()
                 return False
+            link_quality.record_success(len(serialized_bundle), get_current_clock_millis() - send_start)
             return True
         except OSError:  # urequests only uses default exceptions
             warning('removing bad connection {}'.format(node.address))
             del self.connections[node]
+            link_quality.record_failure()
         except KeyError:
             return False
         return False
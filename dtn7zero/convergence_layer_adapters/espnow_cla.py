@@ -9,17 +9,31 @@ import network
 from typing import Tuple, Optional
 
 from py_dtn7 import Bundle
+from dtn7zero.broadcast_scheduler import AirtimeBudget
+from dtn7zero.configuration import CONFIGURATION
 from dtn7zero.convergence_layer_adapters import PushBasedCLA
 from dtn7zero.data import Node
-from dtn7zero.utility import warning
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.utility import warning, debug
 
 
 BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
 
+ESPNOW_MAX_MESSAGE_SIZE = 250
+
+# espnow sends with 1 Mbps by default, the overhead is the 802.11 action frame around the vendor specific content
+ESPNOW_BITS_PER_MILLISECOND = 1000
+ESPNOW_FRAME_OVERHEAD_BYTES = 43
+
 
 class EspNowCLA(PushBasedCLA):
+    mtu = ESPNOW_MAX_MESSAGE_SIZE
+
+    def __init__(self, duty_cycle: float = None):
+        if duty_cycle is None:
+            duty_cycle = CONFIGURATION.BROADCAST.DUTY_CYCLE_ESPNOW
+        self.airtime_budget = AirtimeBudget(duty_cycle)
 
-    def __init__(self):
         sta = network.WLAN(network.STA_IF)
 
         # assuming wifi is active through boot.py setup
@@ -40,7 +54,7 @@ class EspNowCLA(PushBasedCLA):
 
         if serialized_bundle:
             try:
-                return Bundle.from_cbor(serialized_bundle), from_node_address
+                return deserialize_bundle(serialized_bundle), from_node_address
             except Exception as e:
                 warning('error during espnow bundle deserialization, ignoring bundle. error: {}'.format(e))
 
@@ -50,9 +64,14 @@ class EspNowCLA(PushBasedCLA):
         if node is not None:
             raise Exception('cannot send bundle to specific node with espnow cla')
 
-        if len(serialized_bundle) > 250:
-            warning('cannot forward bundle through espnow cla because it is longer than 250 bytes: {}'.format(len(serialized_bundle)))
+        if len(serialized_bundle) > ESPNOW_MAX_MESSAGE_SIZE:
+            warning('cannot forward bundle through espnow cla because it is longer than {} bytes: {}'.format(ESPNOW_MAX_MESSAGE_SIZE, len(serialized_bundle)))
+            return False
+
+        if not self.airtime_budget.has_budget():
+            debug('espnow cla airtime budget depleted, not sending bundle')
             return False
 
         self.endpoint.send(BROADCAST_MAC, serialized_bundle)
+        self.airtime_budget.consume((len(serialized_bundle) + ESPNOW_FRAME_OVERHEAD_BYTES) * 8 / ESPNOW_BITS_PER_MILLISECOND)
         return True
@@ -0,0 +1,256 @@
+"""
+Local convergence layer -> nodes on the same host, identified by a local port instead of an ip address
+
+in-process -> bundles to a local cla of the same interpreter (several bpas, e.g. in threads or for benchmarks) are
+              handed over directly, without socket or copy
+unix       -> bundles to other processes are sent as AF_UNIX datagrams to <SOCKET_DIRECTORY>/<port> (CPython only,
+              larger bundles are fragmented by the router, get_mtu), the sender is identified by the path it is bound to
+
+Local nodes are not discovered by ipnd, they are added to the storage manually:  storage.add_node(create_local_node(...))
+"""
+import os
+import socket
+from typing import Optional, Dict, Tuple, List
+
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.convergence_layer_adapters import PushBasedCLA
+from dtn7zero.data import Node
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.utility import get_current_clock_millis, allocate_lock, debug, warning, SocketPoller
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock
+
+
+_UNIX_SOCKETS_SUPPORTED = not RUNNING_MICROPYTHON and hasattr(socket, 'AF_UNIX')
+
+# the local clas of this interpreter by port
+_IN_PROCESS_CLAS: Dict[int, 'LocalCLA'] = {}
+_IN_PROCESS_CLAS_LOCK = allocate_lock()
+
+
+def get_local_address(port: int) -> str:
+    """
+    returns the address of the local node with this port, as used by the storage and returned by poll
+    """
+    return 'local:{}'.format(port)
+
+
+def create_local_node(full_node_uri: str, port: int) -> Node:
+    """
+    returns the neighbor information of a local node, to be added to the storage
+    """
+    return Node(get_local_address(port), PrimaryBlock.from_full_uri(full_node_uri), {CONFIGURATION.IPND.IDENTIFIER_LOCAL: port}, 0)
+
+
+def _get_socket_path(port: int) -> str:
+    return '{}/{}'.format(CONFIGURATION.LOCAL.SOCKET_DIRECTORY, port)
+
+
+def _is_would_block_error(e: OSError) -> bool:
+    return isinstance(e, BlockingIOError)
+
+
+class LocalCLA(PushBasedCLA):
+
+    def __init__(self, port: int = None):
+        """
+        port -> the local port of this node, unique per host, defaults to CONFIGURATION.PORT.LOCAL
+        """
+        self.port = CONFIGURATION.PORT.LOCAL if port is None else port
+        # the datagram limit of the unix socket path, the in-process hand over is not limited (see get_mtu)
+        self.mtu = CONFIGURATION.LOCAL.MAX_DATAGRAM_SIZE if _UNIX_SOCKETS_SUPPORTED else None
+
+        # bundles handed over by the local clas of this interpreter, which may run in other threads
+        self.in_process_bundles: List[Tuple[bytes, int]] = []
+        self.in_process_lock = allocate_lock()
+
+        self.socket = None
+        if _UNIX_SOCKETS_SUPPORTED:
+            self.socket = self._bind_unix_socket()
+
+        with _IN_PROCESS_CLAS_LOCK:
+            if self.port in _IN_PROCESS_CLAS:
+                raise Exception('local port {} is already in use'.format(self.port))
+            _IN_PROCESS_CLAS[self.port] = self
+
+        self.wakeup_poller: Optional[SocketPoller] = None
+
+    def _bind_unix_socket(self) -> socket.socket:
+        try:
+            os.mkdir(CONFIGURATION.LOCAL.SOCKET_DIRECTORY)
+        except OSError:
+            pass  # already exists
+
+        path = _get_socket_path(self.port)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+        try:
+            sock.bind(path)
+        except OSError:
+            # the socket file of a crashed process is replaced, the one of a running process is not
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.remove(path)
+                sock.bind(path)
+            else:
+                sock.close()
+                raise Exception('local port {} is already in use by another process'.format(self.port))
+            finally:
+                probe.close()
+
+        # a datagram must fit the send buffer of the sender
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2 * CONFIGURATION.LOCAL.MAX_DATAGRAM_SIZE)
+        sock.settimeout(0)
+        return sock
+
+    def close(self):
+        """
+        releases the local port (removes the socket file)
+        """
+        with _IN_PROCESS_CLAS_LOCK:
+            if _IN_PROCESS_CLAS.get(self.port) is self:
+                del _IN_PROCESS_CLAS[self.port]
+
+        if self.socket is not None:
+            if self.wakeup_poller is not None:
+                self.wakeup_poller.unregister(self.socket)
+            self.socket.close()
+            self.socket = None
+            try:
+                os.remove(_get_socket_path(self.port))
+            except OSError:
+                pass
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        if self.socket is None:
+            return False  # the in-process hand over cannot signal a poller without socket
+
+        self.wakeup_poller = poller
+        poller.register(self.socket)
+        return True
+
+    def poll(self, bundle_id: str = None, node: Node = None) -> Tuple[Optional[Bundle], Optional[str]]:
+        if bundle_id is not None or node is not None:
+            raise Exception('cannot poll specific bundle from specific node with local cla')
+
+        bundles = self.poll_many(1)
+        if bundles:
+            return bundles[0]
+        return None, None
+
+    def poll_many(self, max_items: int, max_bytes: Optional[int] = None) -> List[Tuple[Bundle, Optional[str]]]:
+        bundles = []
+        received_bytes = 0
+
+        while len(bundles) < max_items and (max_bytes is None or received_bytes < max_bytes):
+            serialized_bundle, from_port = self._receive_in_process()
+
+            if serialized_bundle is None:
+                serialized_bundle, from_port = self._receive_datagram()
+                if serialized_bundle is None:
+                    break
+
+            received_bytes += len(serialized_bundle)
+
+            try:
+                bundles.append((deserialize_bundle(serialized_bundle, zero_copy=True), get_local_address(from_port)))
+            except Exception as e:
+                warning('error during local bundle deserialization, ignoring bundle. error: {}'.format(e))
+
+        return bundles
+
+    def _receive_in_process(self) -> Tuple[Optional[bytes], Optional[int]]:
+        if not self.in_process_bundles:
+            return None, None
+
+        with self.in_process_lock:
+            return self.in_process_bundles.pop(0)
+
+    def _receive_datagram(self) -> Tuple[Optional[bytes], Optional[int]]:
+        # the empty wakeup datagrams of in-process hand overs are skipped
+        while self.socket is not None:
+            try:
+                datagram, path = self.socket.recvfrom(CONFIGURATION.LOCAL.MAX_DATAGRAM_SIZE)
+            except OSError as e:
+                if not _is_would_block_error(e):
+                    debug('local cla receive failed: {}'.format(e))
+                return None, None
+
+            if not datagram:
+                continue
+
+            try:
+                from_port = int(path.rsplit('/', 1)[1])
+            except (AttributeError, IndexError, ValueError):
+                warning('local cla received datagram from unknown sender {}, ignoring datagram'.format(path))
+                continue
+
+            return datagram, from_port
+
+        return None, None
+
+    def _hand_over(self, serialized_bundle: bytes, from_port: int) -> bool:
+        """
+        called by the sending local cla of this interpreter, returns False if too many bundles are queued
+        """
+        with self.in_process_lock:
+            if len(self.in_process_bundles) >= CONFIGURATION.LOCAL.MAX_QUEUED_BUNDLES:
+                return False
+            self.in_process_bundles.append((serialized_bundle, from_port))
+            wakeup = len(self.in_process_bundles) == 1
+
+        if wakeup and self.wakeup_poller is not None:
+            # the receiving bpa may wait on its poller in another thread
+            self._send_wakeup_datagram()
+        return True
+
+    def _send_wakeup_datagram(self):
+        try:
+            self.socket.sendto(b'', _get_socket_path(self.port))
+        except OSError:
+            pass  # the socket already has pending datagrams, the poller is signaled anyway
+
+    def get_mtu(self, node: Optional[Node]) -> Optional[int]:
+        if node is not None and node.clas.get(CONFIGURATION.IPND.IDENTIFIER_LOCAL) in _IN_PROCESS_CLAS:
+            return None
+        return self.mtu
+
+    def send_to(self, node: Optional[Node], serialized_bundle: bytes) -> bool:
+        if node is None:
+            raise Exception('cannot send bundle to unspecified node with local cla')
+
+        if CONFIGURATION.IPND.IDENTIFIER_LOCAL not in node.clas:
+            return False
+
+        port = node.clas[CONFIGURATION.IPND.IDENTIFIER_LOCAL]
+        link_quality = node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_LOCAL)
+        start = get_current_clock_millis()
+
+        receiver = _IN_PROCESS_CLAS.get(port)
+        if receiver is not None:
+            if not receiver._hand_over(serialized_bundle, self.port):
+                debug('local cla {} has too many queued bundles'.format(port))
+                return False
+        else:
+            if self.socket is None:
+                return False
+
+            if len(serialized_bundle) > self.mtu:
+                warning('cannot forward bundle through local cla because it is longer than {} bytes: {}'.format(self.mtu, len(serialized_bundle)))
+                return False
+
+            try:
+                self.socket.sendto(serialized_bundle, _get_socket_path(port))
+            except OSError as e:
+                if _is_would_block_error(e):
+                    # the receiving process is busy, the bundle is retried later
+                    debug('local cla {} has too many pending datagrams'.format(port))
+                    return False
+                debug('local cla could not send datagram to {}: {}'.format(port, e))
+                link_quality.record_failure()
+                return False
+
+        link_quality.record_success(len(serialized_bundle), get_current_clock_millis() - start)
+        return True
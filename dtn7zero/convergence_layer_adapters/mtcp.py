@@ -1,6 +1,7 @@
+import errno
 import socket
 import struct
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List, Callable
 
 try:
     from cbor2 import dumps
@@ -10,7 +11,10 @@ except ImportError:
 from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
 from dtn7zero.convergence_layer_adapters import PushBasedCLA
 from dtn7zero.data import Node
-from dtn7zero.utility import get_current_clock_millis, is_timestamp_older_than_timeout, debug, warning
+from dtn7zero.fragmentation import create_reactive_fragment
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.utility import get_current_clock_millis, is_timestamp_older_than_timeout, debug, warning, SocketPoller, \
+    allocate_lock
 from py_dtn7 import Bundle
 
 
@@ -29,6 +33,11 @@ class RemoteClosedConnectionException(Exception):
     pass
 
 
+class RemoteClosedMidMessageException(RemoteClosedConnectionException):
+    # args[0] -> the part of the message received before the remote closed the connection
+    pass
+
+
 class RemoteStalledConnectionException(Exception):
     pass
 
@@ -37,80 +46,143 @@ class ReceivedInvalidDataOnSocketException(Exception):
     pass
 
 
-def _poll_one_byte(connection):
+def _is_would_block_error(e: OSError) -> bool:
+    if RUNNING_MICROPYTHON:
+        return bool(e.args) and e.args[0] == errno.EAGAIN
+    return isinstance(e, BlockingIOError)
+
+
+def _receive_into(connection, buffer) -> Optional[int]:
+    """
+    returns the number of bytes received, 0 if the remote closed the connection, None if no data is available
+    """
     try:
-        buf = connection.recv(1)
-    # if a non-blocking read fails we have read everything there is to read at the moment
-    # ,but we need to read exactly n bytes
-    except OSError:
-        return None
-    else:
-        # on 0 bytes received the socket connection is closed
-        # the desired 1 byte could not be received -> incomplete data -> discard
-        if len(buf) == 0:
-            raise RemoteClosedConnectionException()
+        if RUNNING_MICROPYTHON:
+            # returns None if no data is available on a non-blocking socket
+            return connection.readinto(buffer)
+        return connection.recv_into(buffer)
+    except OSError as e:
+        if _is_would_block_error(e):
+            return None
+        # e.g. ConnectionResetError
+        raise RemoteClosedConnectionException(str(e))
+
+
+def _get_header_length(initial_byte: int) -> int:
+    if initial_byte & _CBOR_TYPE_MASK != TYPE_BYTES:
+        raise ReceivedInvalidDataOnSocketException('mtcp cla received invalid header: only accepting type byte-string')
 
-        return buf
+    tag_aux = initial_byte & _CBOR_INFO_BITS
 
+    if tag_aux <= 23:
+        return 1
+    elif tag_aux == _CBOR_UINT8_FOLLOWS:
+        return 2
+    elif tag_aux == _CBOR_UINT16_FOLLOWS:
+        return 3
+    elif tag_aux == _CBOR_UINT32_FOLLOWS:
+        return 5
+    elif tag_aux == _CBOR_UINT64_FOLLOWS:
+        return 9
+    raise ReceivedInvalidDataOnSocketException('mtcp cla received invalid header: only accepting definite length byte-strings')
 
-def _receive_exactly_n_bytes(connection, num_bytes):
-    result = b''
 
-    while True:
-        try:
-            buf = connection.recv(min(num_bytes, CONFIGURATION.SOCKET_RECEIVE_BUFFER_SIZE))
-        # if a non-blocking read fails we have read everything there is to read at the moment
-        # ,but we need to read exactly n bytes
-        except OSError:
-            pass
-        else:
-            # on 0 bytes received the socket connection is closed
-            # the desired num_bytes could not be received in total -> incomplete data -> discard
-            if len(buf) == 0:
-                raise RemoteClosedConnectionException()
+def _get_message_length(header) -> int:
+    tag_aux = header[0] & _CBOR_INFO_BITS
 
-            result += buf
-            num_bytes -= len(buf)
+    if tag_aux <= 23:
+        return tag_aux
+    elif tag_aux == _CBOR_UINT8_FOLLOWS:
+        return struct.unpack_from('!B', header, 1)[0]
+    elif tag_aux == _CBOR_UINT16_FOLLOWS:
+        return struct.unpack_from('!H', header, 1)[0]
+    elif tag_aux == _CBOR_UINT32_FOLLOWS:
+        return struct.unpack_from('!I', header, 1)[0]
+    return struct.unpack_from('!Q', header, 1)[0]
 
-            if num_bytes == 0:
-                return result
 
+class _MessageReader:
+    """
+    incremental receiver of the mtcp messages (cbor byte-strings) of one incoming connection
 
-def _read_full_message_or_none(connection):
-    header = _poll_one_byte(connection)
+    Each poll receives what is available without blocking, the state of a partially received message (header or body)
+    is kept until the next poll, so a slow sender does not block the other connections.
+    The body is received into a buffer preallocated from the header, the payload can later be passed on as a view of it.
+    """
 
-    if header is None:
-        return None
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.last_received = get_current_clock_millis()
 
-    header = struct.unpack_from('!B', header, 0)[0]
+        self.header = bytearray(9)
+        self.header_view = memoryview(self.header)
+        self.header_received = 0
+        self.header_length = 1
 
-    tag = header & _CBOR_TYPE_MASK
-    tag_aux = header & _CBOR_INFO_BITS
+        self.message: Optional[bytearray] = None
+        self.message_view: Optional[memoryview] = None
+        self.message_received = 0
 
-    if tag != TYPE_BYTES:
-        raise ReceivedInvalidDataOnSocketException('mtcp cla received invalid header: only accepting type byte-string')
+    def read_message_or_none(self) -> Optional[bytearray]:
+        """
+        returns the next complete message, or None if it is not fully received yet
+        """
+        if self.message is None and not self._receive_header():
+            return None
 
-    if tag_aux <= 23:
-        aux = tag_aux
-    elif tag_aux == _CBOR_UINT8_FOLLOWS:
-        data = _receive_exactly_n_bytes(connection, 1)
-        aux = struct.unpack_from('!B', data, 0)[0]
-    elif tag_aux == _CBOR_UINT16_FOLLOWS:
-        data = _receive_exactly_n_bytes(connection, 2)
-        aux = struct.unpack_from('!H', data, 0)[0]
-    elif tag_aux == _CBOR_UINT32_FOLLOWS:
-        data = _receive_exactly_n_bytes(connection, 4)
-        aux = struct.unpack_from('!I', data, 0)[0]
-    elif tag_aux == _CBOR_UINT64_FOLLOWS:
-        data = _receive_exactly_n_bytes(connection, 8)
-        aux = struct.unpack_from('!Q', data, 0)[0]
-    else:
-        raise ReceivedInvalidDataOnSocketException('mtcp cla received invalid header: only accepting definite length byte-strings')
+        while self.message_received < len(self.message):
+            chunk_size = min(len(self.message) - self.message_received, CONFIGURATION.SOCKET_RECEIVE_BUFFER_SIZE)
+            try:
+                num_received = _receive_into(self.connection, self.message_view[self.message_received:self.message_received + chunk_size])
+            except RemoteClosedConnectionException:
+                num_received = 0
+
+            if num_received is None:
+                return None
+
+            # on 0 bytes received the socket connection is closed -> the received part is passed on with the exception
+            if num_received == 0:
+                raise RemoteClosedMidMessageException(bytes(self.message_view[:self.message_received]))
+
+            self.message_received += num_received
+            self.last_received = get_current_clock_millis()
+
+        message = self.message
+
+        self.message, self.message_view, self.message_received = None, None, 0
+        self.header_received, self.header_length = 0, 1
+
+        return message
+
+    def _receive_header(self) -> bool:
+        while self.header_received < self.header_length:
+            num_received = _receive_into(self.connection, self.header_view[self.header_received:self.header_length])
+
+            if num_received is None:
+                return False
 
-    return _receive_exactly_n_bytes(connection, aux)
+            # on 0 bytes received the socket connection is closed -> an incomplete header is discarded
+            if num_received == 0:
+                raise RemoteClosedConnectionException()
+
+            if self.header_received == 0:
+                self.header_length = _get_header_length(self.header[0])
+
+            self.header_received += num_received
+            self.last_received = get_current_clock_millis()
+
+        message_length = _get_message_length(self.header)
+
+        if message_length > CONFIGURATION.MTCP.MAX_RECEIVE_MESSAGE_BYTES:
+            raise ReceivedInvalidDataOnSocketException('mtcp cla received too large message: {} bytes'.format(message_length))
 
+        self.message = bytearray(message_length)
+        self.message_view = memoryview(self.message)
 
-def _send_message(address, port, message):
+        return True
+
+
+def _connect(address, port):
     # create a standard ipv4 stream socket
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client_socket.settimeout(0)
@@ -138,42 +210,238 @@ def _send_message(address, port, message):
         # this will raise an exception on non-blocking sockets
         pass
 
+    return client_socket
+
+
+def _get_connect_error(client_socket) -> int:
+    # a failed non-blocking connect leaves the socket writable with a pending error, which the next send would consume
+    # and report like a busy socket (micropython has no SO_ERROR, there a failed connect ends in the stalled timeout)
+    if RUNNING_MICROPYTHON:
+        return 0
+    try:
+        return client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+    except OSError as e:
+        return e.errno or errno.ENOTCONN
+
+
+def _send_some(client_socket, message, is_established: bool) -> int:
+    """
+    is_established -> the connection was used before, all errors except "would block" mean that it is broken
+
+    returns the number of bytes sent, 0 if the socket is busy (or still connecting)
+    raises RemoteClosedConnectionException, also if the connect of a new connection failed
+    """
+    if not is_established:
+        connect_error = _get_connect_error(client_socket)
+        if connect_error:
+            raise RemoteClosedConnectionException('connect failed, errno {}'.format(connect_error))
+
+    try:
+        bytes_sent = client_socket.send(message)
+    # Windows behaviour??? If other end is forcibly closed it raises an ConnectionResetError -> OSError
+    except OSError as e:
+        # We ignore all OSErrors on new connections.
+        # The correct way would be to check the errno for "busy" (MicroPython -> 11, CPython+Windows -> 10035)
+        # but, because it is implementation dependent, and we do not expect the receiver to immediately close the
+        # connection, we accept the rare case of a deadlock-timeout because of an early-closed socket.
+        if is_established and not _is_would_block_error(e):
+            raise RemoteClosedConnectionException(str(e))
+        return 0
+    # on 0 bytes sent the socket connection is closed
+    if bytes_sent == 0:
+        raise RemoteClosedConnectionException("0 bytes")
+    return bytes_sent
+
+
+def _send_all(client_socket, message, is_established: bool):
+    """
+    is_established -> the connection was used before, all errors except "would block" mean that it is broken
+    """
     deadlock_check = get_current_clock_millis()
     while len(message) > 0 and not is_timestamp_older_than_timeout(deadlock_check, CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND):
-        try:
-            bytes_sent = client_socket.send(message)
-        # Windows behaviour??? If other end is forcibly closed it raises an ConnectionResetError -> OSError
-        except OSError:
-            # We ignore all OSErrors.
-            # The correct way would be to check the errno for "busy" (MicroPython -> 11, CPython+Windows -> 10035)
-            # but, because it is implementation dependent, and we do not expect the receiver to immediately close the
-            # connection, we accept the rare case of a deadlock-timeout because of an early-closed socket.
-            pass
-        else:
-            # on 0 bytes sent the socket connection is closed
-            if bytes_sent == 0:
-                client_socket.close()
-                raise RemoteClosedConnectionException("0 bytes")
+        bytes_sent = _send_some(client_socket, message, is_established)
+        if bytes_sent > 0:
             # update the message and length to send
             message = message[bytes_sent:]
             # update our deadlock-check as we managed to send some data
             deadlock_check = get_current_clock_millis()
 
     if len(message) > 0:
-        client_socket.close()
         raise RemoteStalledConnectionException()
 
-    client_socket.close()
 
+def _is_connection_healthy(client_socket) -> bool:
+    # the receiver never sends on a mtcp connection, a readable socket means it was closed (or reset) by the receiver
+    try:
+        client_socket.recv(1)
+    except OSError as e:
+        return _is_would_block_error(e)
+    return False
+
+
+class _OutboundConnection:
+    """
+    an outgoing connection with its buffered messages (asynchronous sends), flushed without blocking whenever the
+    socket is writable
+    """
+
+    def __init__(self, key: Tuple[str, int], connection: socket.socket, is_reused: bool):
+        self.key = key
+        self.connection = connection
+        self.is_reused = is_reused  # taken from the pool, a failure triggers one reconnect
+        self.is_established = is_reused
+
+        # (message, node, on_sent) in sending order, the first one is partially sent
+        self.messages: List[Tuple[bytes, Node, Callable[[bool], None]]] = []
+        self.buffered_bytes = 0
+        self.sent = 0
+        self.message_started = get_current_clock_millis()
+        self.last_progress = get_current_clock_millis()
+
+    def append(self, message: bytes, node: Node, on_sent: Callable[[bool], None]):
+        if not self.messages:
+            self.message_started = self.last_progress = get_current_clock_millis()
+        self.messages.append((message, node, on_sent))
+        self.buffered_bytes += len(message)
+
+    def reconnect(self, connection: socket.socket):
+        # the partially sent message is sent again from the start
+        self.connection = connection
+        self.is_reused = self.is_established = False
+        self.sent = 0
+        self.message_started = self.last_progress = get_current_clock_millis()
+
+    def flush(self) -> List[Tuple[bytes, Node, Callable[[bool], None], int]]:
+        """
+        sends as much as possible without blocking
+
+        returns the completely sent messages with their (node, on_sent, milliseconds to send)
+        raises RemoteClosedConnectionException or RemoteStalledConnectionException
+        """
+        completed = []
+
+        while self.messages:
+            message = self.messages[0][0]
+
+            bytes_sent = _send_some(self.connection, memoryview(message)[self.sent:], self.is_established)
+            if bytes_sent == 0:
+                if is_timestamp_older_than_timeout(self.last_progress, CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND):
+                    raise RemoteStalledConnectionException()
+                break
+
+            self.is_established = True
+            self.sent += bytes_sent
+            self.last_progress = get_current_clock_millis()
+
+            if self.sent == len(message):
+                _, node, on_sent = self.messages.pop(0)
+                completed.append((message, node, on_sent, self.last_progress - self.message_started))
+                self.buffered_bytes -= len(message)
+                self.sent = 0
+                self.message_started = self.last_progress
+
+        return completed
 
-class MTcpCLA(PushBasedCLA):
+
+# the inactivity timeouts of the incoming connections are checked periodically instead of on every poll
+_INACTIVITY_CHECK_INTERVAL_MILLISECONDS = 1000
+
+
+class _SendConnectionPool:
+    """
+    idle outgoing connections per (address, port), each connection is checked out by one send at a time,
+    so concurrent senders (pipeline forwarding workers) never interleave their messages
+    """
 
     def __init__(self):
+        self.idle_connections: Dict[Tuple[str, int], List[Tuple[socket.socket, int]]] = {}
+        self.num_idle_connections = 0
+        self.lock = allocate_lock()
+
+    def check_out(self, key: Tuple[str, int]) -> Optional[socket.socket]:
+        while True:
+            with self.lock:
+                connections = self.idle_connections.get(key)
+                if not connections:
+                    return None
+
+                connection, last_used = connections.pop()
+                if not connections:
+                    del self.idle_connections[key]
+                self.num_idle_connections -= 1
+
+            if not is_timestamp_older_than_timeout(last_used, CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_IDLE_SEND) and _is_connection_healthy(connection):
+                return connection
+
+            debug('discarding idle mtcp connection to {}'.format(key))
+            connection.close()
+
+    def check_in(self, key: Tuple[str, int], connection: socket.socket):
+        if CONFIGURATION.MTCP.MAX_CONNECTIONS_IDLE_SEND <= 0:
+            connection.close()
+            return
+
+        evicted_connection = None
+
+        with self.lock:
+            if self.num_idle_connections >= CONFIGURATION.MTCP.MAX_CONNECTIONS_IDLE_SEND:
+                evicted_connection = self._pop_least_recently_used()
+
+            self.idle_connections.setdefault(key, []).append((connection, get_current_clock_millis()))
+            self.num_idle_connections += 1
+
+        if evicted_connection is not None:
+            evicted_connection.close()
+
+    def _pop_least_recently_used(self) -> socket.socket:
+        oldest_key, oldest_idx, oldest_last_used = None, 0, None
+
+        for key, connections in self.idle_connections.items():
+            for idx, (_, last_used) in enumerate(connections):
+                if oldest_last_used is None or last_used < oldest_last_used:
+                    oldest_key, oldest_idx, oldest_last_used = key, idx, last_used
+
+        connections = self.idle_connections[oldest_key]
+        connection, _ = connections.pop(oldest_idx)
+        if not connections:
+            del self.idle_connections[oldest_key]
+        self.num_idle_connections -= 1
+
+        return connection
+
+    def close_expired(self):
+        expired_connections = []
+
+        with self.lock:
+            for key, connections in tuple(self.idle_connections.items()):
+                for connection, last_used in connections[:]:
+                    if is_timestamp_older_than_timeout(last_used, CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_IDLE_SEND):
+                        connections.remove((connection, last_used))
+                        expired_connections.append(connection)
+                if not connections:
+                    del self.idle_connections[key]
+            self.num_idle_connections -= len(expired_connections)
+
+        for connection in expired_connections:
+            connection.close()
+
+
+class MTcpCLA(PushBasedCLA):
+
+    def __init__(self, reuse_port: bool = False):
+        """
+        reuse_port -> share the listening port with other processes (SO_REUSEPORT, the kernel distributes the incoming
+                      connections), used by the sharded deployment mode (see dtn7zero/sharding.py)
+        """
         # a standard ipv4 stream socket
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
         # allow immediate rebind to a floating socket (last app crashed or otherwise non fully closed server socket)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            if not hasattr(socket, 'SO_REUSEPORT'):
+                raise Exception('SO_REUSEPORT is not supported on this platform')
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         # bind to all interfaces available
         self.socket.bind(('0.0.0.0', CONFIGURATION.PORT.MTCP))
         # We will accept a maximum of x connect requests into our connect queue before we are busy
@@ -183,94 +451,218 @@ class MTcpCLA(PushBasedCLA):
         # MicroPython supports only one thread/process, and therefore we need to implement everything synchronous
         self.socket.settimeout(0)
 
-        self.open_receive_connections: Dict[str, (socket.socket, int)] = {}
-        self.gracefully_shutdown_connections: Dict[str, socket.socket] = {}
+        # the incoming connections with the state of their partially received messages
+        self.open_receive_connections: Dict[str, _MessageReader] = {}
+        self.gracefully_shutdown_connections: Dict[str, _MessageReader] = {}
+
+        self.wakeup_poller: Optional[SocketPoller] = None
+
+        # only the ready connections are serviced on a poll (data -> address tuple, None for the listening socket)
+        self.receive_poller = SocketPoller()
+        self.receive_poller.register(self.socket)
+        self.last_inactivity_check = get_current_clock_millis()
+
+        # the received parts of interrupted bundle transfers (reactive fragments), with the address of the sender
+        self.reactive_fragments: List[Tuple[Bundle, str]] = []
+
+        # outgoing connections are kept open for further bundles to the same node (several messages per connection)
+        self.send_connections = _SendConnectionPool()
+
+        # outgoing connections with buffered messages (asynchronous sends), their sent callbacks are called on poll
+        self.outbound_connections: Dict[Tuple[str, int], _OutboundConnection] = {}
+        self.sent_callbacks: List[Tuple[Callable[[bool], None], bool]] = []
+
+    def get_ipnd_service(self) -> Optional[Tuple[str, int]]:
+        return CONFIGURATION.IPND.IDENTIFIER_MTCP, CONFIGURATION.PORT.MTCP
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        self.wakeup_poller = poller
+
+        poller.register(self.socket)
+        for reader in self.open_receive_connections.values():
+            poller.register(reader.connection)
+        for reader in self.gracefully_shutdown_connections.values():
+            poller.register(reader.connection)
+        for outbound in self.outbound_connections.values():
+            poller.register(outbound.connection, writable=True)
+        return True
+
+    def _unregister_connection(self, connection: socket.socket):
+        self.receive_poller.unregister(connection)
+        if self.wakeup_poller is not None:
+            self.wakeup_poller.unregister(connection)
+
+    def _close_connection(self, connection: socket.socket, shutdown: bool = False):
+        if shutdown and not RUNNING_MICROPYTHON:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # already reset by the remote
+        # a closed socket cannot be unregistered anymore
+        self._unregister_connection(connection)
+        connection.close()
 
     def poll(self, bundle_id: str = None, node: Node = None) -> Tuple[Optional[Bundle], Optional[str]]:
         if bundle_id is not None or node is not None:
             raise Exception('cannot poll specific bundle from specific node with mtcp cla')
 
-        # check for new incoming connections
-        self._check_for_new_connections()
+        bundles = self.poll_many(1)
+        if bundles:
+            return bundles[0]
+        return None, None
 
-        # try to receive one bundle
-        serialized_bundle, from_node_address = self._poll_from_open_receive_connections()
+    def poll_many(self, max_items: int, max_bytes: Optional[int] = None) -> List[Tuple[Bundle, Optional[str]]]:
+        ready_open_address_tuples, ready_gracefully_shutdown_address_tuples = self._process_socket_events()
 
-        if serialized_bundle is None:
-            serialized_bundle, from_node_address = self._poll_from_gracefully_shutdown_connections()
+        # the ready connections are read until they have no complete message left or a budget is spent,
+        # the remaining ready connections stay ready for the next poll
+        bundles = []
+        received_bytes = 0
 
-        if serialized_bundle is None:
-            return None, None
+        while len(bundles) < max_items and (max_bytes is None or received_bytes < max_bytes):
+            serialized_bundle, from_node_address = self._poll_from_open_receive_connections(ready_open_address_tuples)
 
-        try:
-            return Bundle.from_cbor(serialized_bundle), from_node_address
-        except Exception as e:
-            warning('error during mtcp bundle deserialization, ignoring bundle. error: {}'.format(e))
-        return None, None
+            if serialized_bundle is None:
+                serialized_bundle, from_node_address = self._poll_from_gracefully_shutdown_connections(ready_gracefully_shutdown_address_tuples)
 
-    def _poll_from_open_receive_connections(self):
-        serialized_bundle, from_node_address = None, None
+            if serialized_bundle is None:
+                if not self.reactive_fragments:
+                    break
+                bundles.append(self.reactive_fragments.pop(0))
+                continue
+
+            received_bytes += len(serialized_bundle)
 
-        for address_tuple, (connection, last_received) in tuple(self.open_receive_connections.items()):
             try:
-                serialized_bundle = _read_full_message_or_none(connection)
-            except RemoteClosedConnectionException:
+                bundles.append((deserialize_bundle(serialized_bundle, zero_copy=True), from_node_address))
+            except Exception as e:
+                warning('error during mtcp bundle deserialization, ignoring bundle. error: {}'.format(e))
+
+        return bundles
+
+    def _process_socket_events(self) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """
+        accepts the new connections, flushes the outbound connections and calls the sent callbacks
+
+        returns the address tuples of the readable open and gracefully shutdown connections
+        """
+        ready_open_address_tuples, ready_gracefully_shutdown_address_tuples = [], []
+
+        for _, data, readable, writable in self.receive_poller.poll(0):
+            if data is None:
+                # new connections may already carry messages
+                ready_open_address_tuples.extend(self._check_for_new_connections())
+            elif isinstance(data, _OutboundConnection):
+                # writable, or readable on a remote close
+                self._flush_outbound_connection(data)
+            elif readable:
+                if data in self.open_receive_connections:
+                    ready_open_address_tuples.append(data)
+                elif data in self.gracefully_shutdown_connections:
+                    ready_gracefully_shutdown_address_tuples.append(data)
+
+        self.send_connections.close_expired()
+
+        if is_timestamp_older_than_timeout(self.last_inactivity_check, _INACTIVITY_CHECK_INTERVAL_MILLISECONDS):
+            self._close_inactive_connections()
+            # detects the stalled outbound connections, which never become writable again
+            for outbound in tuple(self.outbound_connections.values()):
+                self._flush_outbound_connection(outbound)
+            self.last_inactivity_check = get_current_clock_millis()
+
+        sent_callbacks, self.sent_callbacks = self.sent_callbacks, []
+        for on_sent, success in sent_callbacks:
+            on_sent(success)
+
+        return ready_open_address_tuples, ready_gracefully_shutdown_address_tuples
+
+    def _poll_from_open_receive_connections(self, ready_address_tuples: List[Tuple[str, int]]):
+        # a ready connection is removed from the list once it has no complete message left
+        while ready_address_tuples:
+            address_tuple = ready_address_tuples[0]
+            reader = self.open_receive_connections.get(address_tuple)
+            if reader is None:
+                ready_address_tuples.pop(0)
+                continue
+            try:
+                serialized_bundle = reader.read_message_or_none()
+            except RemoteClosedConnectionException as e:
                 debug('remote closed down incoming mtcp connection {}'.format(address_tuple))
-                if not RUNNING_MICROPYTHON:
-                    connection.shutdown(socket.SHUT_RDWR)
-                connection.close()
+                self._add_reactive_fragment(e, address_tuple)
+                self._close_connection(reader.connection, shutdown=True)
                 del self.open_receive_connections[address_tuple]
             except ReceivedInvalidDataOnSocketException as e:
                 warning('incoming mtcp connection {} sent invalid data, discarding connection, error: {}'.format(address_tuple, e))
-                if not RUNNING_MICROPYTHON:
-                    connection.shutdown(socket.SHUT_RDWR)
-                connection.close()
+                self._close_connection(reader.connection, shutdown=True)
                 del self.open_receive_connections[address_tuple]
             else:
                 if serialized_bundle is not None:
-                    from_node_address = address_tuple[0]
-                    self.open_receive_connections[address_tuple] = (connection, get_current_clock_millis())
-                    break
-                elif is_timestamp_older_than_timeout(last_received, CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_INACTIVE_RECEIVE):
-                    if not RUNNING_MICROPYTHON:
-                        debug('gracefully closing incoming mtcp connection {} due to inactivity timeout'.format(address_tuple))
-                        connection.shutdown(socket.SHUT_WR)
-                        self.gracefully_shutdown_connections[address_tuple] = connection
-                    else:
-                        debug('forcefully closing incoming mtcp connection {} due to inactivity timeout (no shutdown support on micropython)'.format(address_tuple))
-                        connection.close()
-                    del self.open_receive_connections[address_tuple]
+                    return serialized_bundle, address_tuple[0]
+            ready_address_tuples.pop(0)
 
-        return serialized_bundle, from_node_address
+        return None, None
 
-    def _poll_from_gracefully_shutdown_connections(self):
-        serialized_bundle, from_node_address = None, None
+    def _close_inactive_connections(self):
+        for address_tuple, reader in tuple(self.open_receive_connections.items()):
+            if is_timestamp_older_than_timeout(reader.last_received, CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_INACTIVE_RECEIVE):
+                if not RUNNING_MICROPYTHON:
+                    debug('gracefully closing incoming mtcp connection {} due to inactivity timeout'.format(address_tuple))
+                    try:
+                        reader.connection.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        self._close_connection(reader.connection)
+                    else:
+                        self.gracefully_shutdown_connections[address_tuple] = reader
+                else:
+                    debug('forcefully closing incoming mtcp connection {} due to inactivity timeout (no shutdown support on micropython)'.format(address_tuple))
+                    self._close_connection(reader.connection)
+                del self.open_receive_connections[address_tuple]
 
-        for address_tuple, connection in tuple(self.gracefully_shutdown_connections.items()):
+    def _poll_from_gracefully_shutdown_connections(self, ready_address_tuples: List[Tuple[str, int]]):
+        while ready_address_tuples:
+            address_tuple = ready_address_tuples[0]
+            reader = self.gracefully_shutdown_connections.get(address_tuple)
+            if reader is None:
+                ready_address_tuples.pop(0)
+                continue
             try:
-                serialized_bundle = _read_full_message_or_none(connection)
-            except RemoteClosedConnectionException:
+                serialized_bundle = reader.read_message_or_none()
+            except RemoteClosedConnectionException as e:
                 debug('gracefully shutdown mtcp connection closed by remote {}'.format(address_tuple))
-                connection.close()
+                self._add_reactive_fragment(e, address_tuple)
+                self._close_connection(reader.connection)
                 del self.gracefully_shutdown_connections[address_tuple]
             except ReceivedInvalidDataOnSocketException as e:
                 debug('gracefully shutdown mtcp connection {} sent invalid data, discarding connection, error: {}'.format(address_tuple, e))
-                connection.close()
+                self._close_connection(reader.connection)
                 del self.gracefully_shutdown_connections[address_tuple]
             else:
                 if serialized_bundle is not None:
-                    from_node_address = address_tuple[0]
-                    break
+                    return serialized_bundle, address_tuple[0]
+            ready_address_tuples.pop(0)
 
-        return serialized_bundle, from_node_address
+        return None, None
+
+    def _add_reactive_fragment(self, exception: RemoteClosedConnectionException, address_tuple):
+        # reactive fragmentation: the received part of an interrupted transfer is kept as fragment, the sender retries
+        # the whole bundle later and the reassembly at the destination merges the overlapping parts
+        if not isinstance(exception, RemoteClosedMidMessageException) or not exception.args[0]:
+            return
+
+        fragment = create_reactive_fragment(exception.args[0])
+        if fragment is not None:
+            self.reactive_fragments.append((fragment, address_tuple[0]))
 
-    def _check_for_new_connections(self):
-        if len(self.open_receive_connections) < CONFIGURATION.MTCP.MAX_CONNECTIONS_STATE_OPEN_RECEIVE:
+    def _check_for_new_connections(self) -> List[Tuple[str, int]]:
+        # all waiting connect requests are accepted (up to the limit of open receive connections)
+        accepted_address_tuples = []
+
+        while len(self.open_receive_connections) < CONFIGURATION.MTCP.MAX_CONNECTIONS_STATE_OPEN_RECEIVE:
             try:
                 client_socket, address_tuple = self.socket.accept()
             except OSError:
                 # no new connect request waiting
-                pass
+                break
             else:
                 # change to non-blocking mode to be able to poll without blocking
                 client_socket.settimeout(0)
@@ -280,7 +672,102 @@ class MTcpCLA(PushBasedCLA):
                 #  -> would lead to false positive on the sender side
                 # next best thing: limit number of open-receive-connections
                 # print('new mtcp receive connection opened from address {}'.format(address_tuple))
-                self.open_receive_connections[address_tuple] = (client_socket, get_current_clock_millis())
+                self.open_receive_connections[address_tuple] = _MessageReader(client_socket)
+
+                self.receive_poller.register(client_socket, address_tuple)
+
+                if self.wakeup_poller is not None:
+                    self.wakeup_poller.register(client_socket)
+
+                accepted_address_tuples.append(address_tuple)
+
+        return accepted_address_tuples
+
+    def send_to_async(self, node: Optional[Node], serialized_bundle: bytes, on_sent: Callable[[bool], None]) -> bool:
+        if node is None:
+            raise Exception('cannot send bundle to unspecified node with mtcp cla')
+
+        if CONFIGURATION.IPND.IDENTIFIER_MTCP not in node.clas:
+            return False
+
+        message = dumps(serialized_bundle)
+        key = (node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_MTCP])
+        outbound = self.outbound_connections.get(key)
+
+        if outbound is None:
+            connection = self.send_connections.check_out(key)
+            if connection is None:
+                outbound = _OutboundConnection(key, _connect(*key), False)
+            else:
+                outbound = _OutboundConnection(key, connection, True)
+            self.outbound_connections[key] = outbound
+            self._register_outbound_connection(outbound)
+        elif outbound.buffered_bytes + len(message) > CONFIGURATION.MTCP.MAX_BYTES_BUFFERED_SEND:
+            return False
+
+        outbound.append(message, node, on_sent)
+        self._flush_outbound_connection(outbound)
+        return True
+
+    def _register_outbound_connection(self, outbound: _OutboundConnection):
+        self.receive_poller.register(outbound.connection, outbound, writable=True)
+        if self.wakeup_poller is not None:
+            self.wakeup_poller.register(outbound.connection, writable=True)
+
+    def _flush_outbound_connection(self, outbound: _OutboundConnection):
+        if self.outbound_connections.get(outbound.key) is not outbound:
+            return  # already finished in this poll
+
+        try:
+            completed = outbound.flush()
+        except (RemoteClosedConnectionException, RemoteStalledConnectionException) as e:
+            self._close_connection(outbound.connection)
+
+            if outbound.is_reused and isinstance(e, RemoteClosedConnectionException):
+                # e.g. closed by the receiver after its inactivity timeout or a reboot -> reconnect
+                debug('pooled mtcp connection to {} failed, reconnecting. error: {}'.format(outbound.key, e))
+                outbound.reconnect(_connect(*outbound.key))
+                self._register_outbound_connection(outbound)
+                self._flush_outbound_connection(outbound)
+                return
+
+            del self.outbound_connections[outbound.key]
+            for _, node, on_sent in outbound.messages:
+                node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP).record_failure()
+                self.sent_callbacks.append((on_sent, False))
+            return
+
+        for message, node, on_sent, milliseconds in completed:
+            node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP).record_success(len(message), milliseconds)
+            self.sent_callbacks.append((on_sent, True))
+
+        if not outbound.messages:
+            del self.outbound_connections[outbound.key]
+            self._unregister_connection(outbound.connection)
+            self.send_connections.check_in(outbound.key, outbound.connection)
+
+    def _send_message(self, address: str, port: int, message: bytes):
+        key = (address, port)
+        connection = self.send_connections.check_out(key)
+
+        if connection is not None:
+            try:
+                _send_all(connection, message, True)
+            except (RemoteClosedConnectionException, RemoteStalledConnectionException) as e:
+                # e.g. closed by the receiver after its inactivity timeout or a reboot -> reconnect
+                debug('pooled mtcp connection to {} failed, reconnecting. error: {}'.format(key, e))
+                connection.close()
+            else:
+                self.send_connections.check_in(key, connection)
+                return
+
+        connection = _connect(address, port)
+        try:
+            _send_all(connection, message, False)
+        except (RemoteClosedConnectionException, RemoteStalledConnectionException):
+            connection.close()
+            raise
+        self.send_connections.check_in(key, connection)
 
     def send_to(self, node: Optional[Node], serialized_bundle: bytes) -> bool:
         if node is None:
@@ -289,11 +776,14 @@ class MTcpCLA(PushBasedCLA):
         message = dumps(serialized_bundle)
 
         if CONFIGURATION.IPND.IDENTIFIER_MTCP in node.clas:
+            link_quality = node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP)
+            send_start = get_current_clock_millis()
             try:
                 port = node.clas[CONFIGURATION.IPND.IDENTIFIER_MTCP]
-                _send_message(node.address, port, message)
+                self._send_message(node.address, port, message)
             except (RemoteClosedConnectionException, RemoteStalledConnectionException):
-                del node.clas[CONFIGURATION.IPND.IDENTIFIER_MTCP]  # the node can re-announce it, but currently we cannot connect
+                link_quality.record_failure()  # the link is backed off, but stays known to not flap until the next beacon
                 return False
+            link_quality.record_success(len(message), get_current_clock_millis() - send_start)
             return True
         return False
@@ -13,9 +13,12 @@ from typing import Tuple, Optional
 from machine import SoftSPI, Pin
 
 from py_dtn7 import Bundle
+from dtn7zero.broadcast_scheduler import AirtimeBudget
+from dtn7zero.configuration import CONFIGURATION
 from dtn7zero.convergence_layer_adapters import PushBasedCLA
 from dtn7zero.data import Node
-from dtn7zero.utility import warning, debug
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.utility import warning, debug, get_current_clock_millis
 from sx127x import SX127x, DEVICE_CONFIG_ESP32_TTGO, LORA_PARAMETERS_RH_RF95_bw125cr45sf128, \
     LORA_PARAMETERS_RH_RF95_bw125cr45sf2048, LORA_PARAMETERS_RH_RF95_bw125cr48sf4096, \
     LORA_PARAMETERS_RH_RF95_bw31_25cr48sf512, LORA_PARAMETERS_RH_RF95_bw500cr45sf128
@@ -23,10 +26,18 @@ from sx127x import SX127x, DEVICE_CONFIG_ESP32_TTGO, LORA_PARAMETERS_RH_RF95_bw1
 
 BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
 
+# the sx127x fifo holds 255 bytes, minus the rh_rf95 header
+LORA_MAX_BUNDLE_SIZE = 251
+
 
 class RF95LoRaCLA(PushBasedCLA):
+    mtu = LORA_MAX_BUNDLE_SIZE
+
+    def __init__(self, device_config=DEVICE_CONFIG_ESP32_TTGO, lora_parameters=LORA_PARAMETERS_RH_RF95_bw125cr45sf128, duty_cycle: float = None):
+        if duty_cycle is None:
+            duty_cycle = CONFIGURATION.BROADCAST.DUTY_CYCLE_RF95_LORA
+        self.airtime_budget = AirtimeBudget(duty_cycle)
 
-    def __init__(self, device_config=DEVICE_CONFIG_ESP32_TTGO, lora_parameters=LORA_PARAMETERS_RH_RF95_bw125cr45sf128):
         device_spi = SoftSPI(baudrate=10000000,
                              polarity=0, phase=0, bits=8, firstbit=SoftSPI.MSB,
                              sck=Pin(device_config['sck'], Pin.OUT, Pin.PULL_DOWN),
@@ -47,7 +58,7 @@ class RF95LoRaCLA(PushBasedCLA):
                 # removing rh_rf95 header (TO, FROM, ID, FLAGS)
                 serialized_bundle = serialized_message[4:]
                 from_node_address = serialized_message[1]
-                return Bundle.from_cbor(serialized_bundle), from_node_address
+                return deserialize_bundle(serialized_bundle), from_node_address
             except Exception as e:
                 warning('error during lora bundle deserialization, ignoring bundle. error: {}'.format(e))
 
@@ -57,10 +68,21 @@ class RF95LoRaCLA(PushBasedCLA):
         if node is not None:
             raise Exception('cannot send bundle to specific node with lora cla')
 
+        if len(serialized_bundle) > LORA_MAX_BUNDLE_SIZE:
+            warning('cannot forward bundle through LoRa cla because it is longer than {} bytes: {}'.format(LORA_MAX_BUNDLE_SIZE, len(serialized_bundle)))
+            return False
+
         # adding default rh_rf95 broadcast header (TO, FROM, ID, FLAGS)
         serialized_message = b'\xff\xff\x00\x00' + serialized_bundle
 
+        if not self.airtime_budget.has_budget():
+            debug('LoRa cla airtime budget depleted, not sending bundle')
+            return False
+
         debug('started sending bundle via LoRa')
+        # sending blocks until the transmission is done, so the measured time is an upper bound of the airtime
+        send_start = get_current_clock_millis()
         self.lora.send(serialized_message)
+        self.airtime_budget.consume(get_current_clock_millis() - send_start)
         debug('finished sending bundle via LoRa')
         return True
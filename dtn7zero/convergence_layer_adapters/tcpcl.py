@@ -0,0 +1,818 @@
+"""
+RFC 9174 -> TCP Convergence-Layer Protocol Version 4 (TCPCLv4)
+
+Sessions are bidirectional and persistent: the contact headers and the SESS_INIT messages are exchanged once per
+connection, then bundles are sent as transfers of one or more XFER_SEGMENT messages, each segment is acknowledged by
+an XFER_ACK of the cumulative received length. A transfer counts as sent once its last segment was acknowledged.
+
+Outgoing sessions are reused for all transfers to the same (address, port) and closed after an idle timeout.
+Received bundles are sent over the sessions opened by the peer as well.
+
+Not supported: TLS (CAN_TLS is never set), session and transfer extension items (only the Transfer Length extension
+is sent and parsed, unknown critical items refuse the transfer or terminate the session).
+"""
+import socket
+import struct
+import time
+from typing import Optional, Dict, Tuple, List, Callable
+
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.convergence_layer_adapters import PushBasedCLA
+from dtn7zero.data import Node
+from dtn7zero.fragmentation import create_reactive_fragment
+from dtn7zero.serialization import deserialize_bundle
+from dtn7zero.utility import get_current_clock_millis, is_timestamp_older_than_timeout, debug, warning, SocketPoller
+from py_dtn7 import Bundle
+
+try:
+    from errno import ENOTCONN
+except ImportError:
+    from uerrno import ENOTCONN
+
+
+CONTACT_HEADER_MAGIC = b'dtn!'
+CONTACT_HEADER_VERSION = 4
+_CONTACT_HEADER_LENGTH = 6
+
+MESSAGE_TYPE_XFER_SEGMENT = 0x01
+MESSAGE_TYPE_XFER_ACK = 0x02
+MESSAGE_TYPE_XFER_REFUSE = 0x03
+MESSAGE_TYPE_KEEPALIVE = 0x04
+MESSAGE_TYPE_SESS_TERM = 0x05
+MESSAGE_TYPE_MSG_REJECT = 0x06
+MESSAGE_TYPE_SESS_INIT = 0x07
+
+XFER_SEGMENT_FLAG_END = 0x01
+XFER_SEGMENT_FLAG_START = 0x02
+
+SESS_TERM_FLAG_REPLY = 0x01
+
+EXTENSION_ITEM_FLAG_CRITICAL = 0x01
+TRANSFER_EXTENSION_TRANSFER_LENGTH = 0x0001
+
+
+class XferRefuseReasonCodes:
+    UNKNOWN = 0x00
+    COMPLETED = 0x01
+    NO_RESOURCES = 0x02
+    RETRANSMIT = 0x03
+    NOT_ACCEPTABLE = 0x04
+    EXTENSION_FAILURE = 0x05
+    SESSION_TERMINATING = 0x06
+
+
+class SessTermReasonCodes:
+    UNKNOWN = 0x00
+    IDLE_TIMEOUT = 0x01
+    VERSION_MISMATCH = 0x02
+    BUSY = 0x03
+    CONTACT_FAILURE = 0x04
+    RESOURCE_EXHAUSTION = 0x05
+
+
+class MsgRejectReasonCodes:
+    MESSAGE_TYPE_UNKNOWN = 0x01
+    MESSAGE_UNSUPPORTED = 0x02
+    MESSAGE_UNEXPECTED = 0x03
+
+
+_STATE_CONTACT = 0  # waiting for the contact header of the peer
+_STATE_SESS_INIT = 1  # waiting for the SESS_INIT of the peer
+_STATE_ESTABLISHED = 2
+_STATE_TERMINATING = 3  # SESS_TERM sent or received, no new transfers, closed once the outbound buffer is flushed
+_STATE_CLOSED = 4
+
+# the segment mru limits the data of a segment, the message header and the transfer extension items come on top
+_MAX_MESSAGE_OVERHEAD = 1024
+
+# the timeouts and keepalives of the sessions are checked periodically instead of on every poll
+_CHECK_INTERVAL_MILLISECONDS = 1000
+
+
+class TcpclProtocolException(Exception):
+    # args[1] -> the SESS_TERM reason code, args[2] (optional) -> the MSG_REJECT reason code
+    pass
+
+
+def _is_would_block_error(e: OSError) -> bool:
+    if RUNNING_MICROPYTHON:
+        return bool(e.args) and e.args[0] == 11  # EAGAIN
+    return isinstance(e, BlockingIOError)
+
+
+def _is_not_yet_connected_error(e: OSError) -> bool:
+    # a non-blocking connect is still in progress
+    return bool(e.args) and e.args[0] == ENOTCONN
+
+
+def encode_contact_header() -> bytes:
+    # magic, version, flags (CAN_TLS is not set)
+    return CONTACT_HEADER_MAGIC + struct.pack('!BB', CONTACT_HEADER_VERSION, 0)
+
+
+def encode_sess_init(keepalive_interval: int, segment_mru: int, transfer_mru: int, full_node_uri: str) -> bytes:
+    node_id = full_node_uri.encode(CONFIGURATION.ENCODING)
+    # no session extension items
+    return struct.pack('!BHQQH', MESSAGE_TYPE_SESS_INIT, keepalive_interval, segment_mru, transfer_mru, len(node_id)) + node_id + struct.pack('!I', 0)
+
+
+def encode_xfer_segment(flags: int, transfer_id: int, data, total_length: Optional[int] = None) -> bytes:
+    header = struct.pack('!BBQ', MESSAGE_TYPE_XFER_SEGMENT, flags, transfer_id)
+
+    if flags & XFER_SEGMENT_FLAG_START:
+        if total_length is None:
+            header += struct.pack('!I', 0)
+        else:
+            # the Transfer Length extension item, not critical
+            header += struct.pack('!IBHHQ', 13, 0, TRANSFER_EXTENSION_TRANSFER_LENGTH, 8, total_length)
+
+    return header + struct.pack('!Q', len(data)) + bytes(data)
+
+
+def encode_xfer_ack(flags: int, transfer_id: int, acknowledged_length: int) -> bytes:
+    return struct.pack('!BBQQ', MESSAGE_TYPE_XFER_ACK, flags, transfer_id, acknowledged_length)
+
+
+def encode_xfer_refuse(reason: int, transfer_id: int) -> bytes:
+    return struct.pack('!BBQ', MESSAGE_TYPE_XFER_REFUSE, reason, transfer_id)
+
+
+def encode_keepalive() -> bytes:
+    return struct.pack('!B', MESSAGE_TYPE_KEEPALIVE)
+
+
+def encode_sess_term(flags: int, reason: int) -> bytes:
+    return struct.pack('!BBB', MESSAGE_TYPE_SESS_TERM, flags, reason)
+
+
+def encode_msg_reject(reason: int, rejected_message_header: int) -> bytes:
+    return struct.pack('!BBB', MESSAGE_TYPE_MSG_REJECT, reason, rejected_message_header)
+
+
+def _parse_extension_items(data, offset: int, end: int) -> List[Tuple[int, int, bytes]]:
+    """
+    returns the (flags, type, value) of the extension items in data[offset:end]
+    """
+    items = []
+    while offset < end:
+        if end - offset < 5:
+            raise TcpclProtocolException('truncated extension item', SessTermReasonCodes.CONTACT_FAILURE)
+        flags, item_type, length = struct.unpack_from('!BHH', data, offset)
+        offset += 5
+        if end - offset < length:
+            raise TcpclProtocolException('truncated extension item', SessTermReasonCodes.CONTACT_FAILURE)
+        items.append((flags, item_type, bytes(data[offset:offset + length])))
+        offset += length
+    return items
+
+
+def _get_message_length(data, offset: int, available: int) -> Optional[int]:
+    """
+    returns the length of the message at data[offset:], None if more bytes are needed to determine it
+    """
+    message_type = data[offset]
+
+    if message_type == MESSAGE_TYPE_KEEPALIVE:
+        return 1
+    elif message_type in (MESSAGE_TYPE_SESS_TERM, MESSAGE_TYPE_MSG_REJECT):
+        return 3
+    elif message_type == MESSAGE_TYPE_XFER_REFUSE:
+        return 10
+    elif message_type == MESSAGE_TYPE_XFER_ACK:
+        return 18
+    elif message_type == MESSAGE_TYPE_SESS_INIT:
+        # type, keepalive, segment mru, transfer mru, node id length
+        if available < 21:
+            return None
+        node_id_length = struct.unpack_from('!H', data, offset + 19)[0]
+        if available < 21 + node_id_length + 4:
+            return None
+        extensions_length = struct.unpack_from('!I', data, offset + 21 + node_id_length)[0]
+        return 21 + node_id_length + 4 + extensions_length
+    elif message_type == MESSAGE_TYPE_XFER_SEGMENT:
+        # type, flags, transfer id
+        if available < 10:
+            return None
+        length = 10
+        if data[offset + 1] & XFER_SEGMENT_FLAG_START:
+            if available < length + 4:
+                return None
+            length += 4 + struct.unpack_from('!I', data, offset + length)[0]
+        if available < length + 8:
+            return None
+        return length + 8 + struct.unpack_from('!Q', data, offset + length)[0]
+
+    raise TcpclProtocolException('unknown message type: {}'.format(message_type), SessTermReasonCodes.UNKNOWN, MsgRejectReasonCodes.MESSAGE_TYPE_UNKNOWN)
+
+
+class _OutgoingTransfer:
+
+    def __init__(self, transfer_id: int, data: bytes, node: Optional[Node], on_sent: Callable[[bool], None]):
+        self.transfer_id = transfer_id
+        self.data = data
+        self.node = node
+        self.on_sent = on_sent
+        self.segmented = 0  # bytes put into segments
+        self.acknowledged = 0
+        self.started = get_current_clock_millis()
+        self.last_progress = get_current_clock_millis()
+
+
+class _IncomingTransfer:
+
+    def __init__(self, transfer_id: int):
+        self.transfer_id = transfer_id
+        self.data = bytearray()
+
+
+class _TcpclSession:
+    """
+    the state of one tcpcl session (active -> opened by us, passive -> accepted)
+    """
+
+    def __init__(self, cla, connection: socket.socket, address_tuple: Tuple[str, int], active: bool):
+        self.cla = cla
+        self.connection = connection
+        self.address_tuple = address_tuple
+        self.active = active
+        self.state = _STATE_CONTACT
+
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+
+        self.created = get_current_clock_millis()
+        self.last_sent = get_current_clock_millis()
+        self.last_received = get_current_clock_millis()
+        self.last_used = get_current_clock_millis()
+
+        # negotiated on SESS_INIT
+        self.peer_node_id: Optional[str] = None
+        self.keepalive_interval = 0
+        self.peer_transfer_mru = 0
+        self.segment_size = 0  # the minimum of both segment mrus
+
+        self.next_transfer_id = 0
+        # not completely acknowledged transfers in sending order, the first ones may be fully segmented already
+        self.outgoing_transfers: List[_OutgoingTransfer] = []
+        self.buffered_bytes = 0
+        self.incoming_transfer: Optional[_IncomingTransfer] = None
+
+        if active:
+            # the active entity sends its contact header first
+            self._queue(encode_contact_header())
+
+    @property
+    def is_usable(self) -> bool:
+        return self.state in (_STATE_CONTACT, _STATE_SESS_INIT, _STATE_ESTABLISHED)
+
+    def _queue(self, message: bytes):
+        self.outbound += message
+
+    def start_transfer(self, data: bytes, node: Optional[Node], on_sent: Callable[[bool], None]) -> bool:
+        if not self.is_usable:
+            return False
+        if self.state == _STATE_ESTABLISHED and len(data) > self.peer_transfer_mru:
+            return False
+
+        self.outgoing_transfers.append(_OutgoingTransfer(self.next_transfer_id, data, node, on_sent))
+        self.next_transfer_id += 1
+        self.buffered_bytes += len(data)
+        self.last_used = get_current_clock_millis()
+
+        self._segment_transfers()
+        return True
+
+    def terminate(self, reason: int, reply: bool = False):
+        if self.state in (_STATE_TERMINATING, _STATE_CLOSED):
+            return
+        if self.state == _STATE_CONTACT:
+            # no session messages before the contact headers were exchanged
+            self.state = _STATE_TERMINATING
+            return
+        debug('terminating tcpcl session {}, reason: {}'.format(self.address_tuple, reason))
+        self._queue(encode_sess_term(SESS_TERM_FLAG_REPLY if reply else 0, reason))
+        self.state = _STATE_TERMINATING
+
+    def _segment_transfers(self):
+        # segments are created when the outbound buffer runs low, so large bundles are not buffered twice
+        if self.state != _STATE_ESTABLISHED:
+            return
+
+        for transfer in self.outgoing_transfers:
+            while transfer.segmented < len(transfer.data):
+                if len(self.outbound) >= self.segment_size:
+                    return
+
+                start = transfer.segmented
+                end = min(len(transfer.data), start + self.segment_size)
+
+                flags = 0
+                if start == 0:
+                    flags |= XFER_SEGMENT_FLAG_START
+                if end == len(transfer.data):
+                    flags |= XFER_SEGMENT_FLAG_END
+
+                self._queue(encode_xfer_segment(flags, transfer.transfer_id, memoryview(transfer.data)[start:end], len(transfer.data) if start == 0 else None))
+                transfer.segmented = end
+
+    def flush(self) -> bool:
+        """
+        sends as much of the outbound buffer as possible without blocking, returns False if the connection broke
+        """
+        while self.outbound:
+            try:
+                bytes_sent = self.connection.send(self.outbound)
+            except OSError as e:
+                if _is_would_block_error(e):
+                    return True
+                if _is_not_yet_connected_error(e):
+                    return True
+                debug('tcpcl session {} broke on send: {}'.format(self.address_tuple, e))
+                return False
+
+            if bytes_sent == 0:
+                return False
+
+            del self.outbound[:bytes_sent]
+            self.last_sent = get_current_clock_millis()
+
+            if not self.outbound:
+                self._segment_transfers()
+
+        return True
+
+    def receive(self) -> bool:
+        """
+        receives what is available without blocking and processes the complete messages, returns False if the
+        connection was closed
+        """
+        while True:
+            try:
+                data = self.connection.recv(CONFIGURATION.TCPCL.RECEIVE_BUFFER_SIZE)
+            except OSError as e:
+                if _is_would_block_error(e) or _is_not_yet_connected_error(e):
+                    break
+                debug('tcpcl session {} broke on receive: {}'.format(self.address_tuple, e))
+                return False
+
+            if data is None:  # micropython, no data available
+                break
+            if len(data) == 0:
+                self._process_inbound()
+                return False
+
+            self.inbound += data
+            self.last_received = get_current_clock_millis()
+
+            if len(data) < CONFIGURATION.TCPCL.RECEIVE_BUFFER_SIZE:
+                break
+
+        self._process_inbound()
+        return True
+
+    def _process_inbound(self):
+        offset = 0
+
+        try:
+            while self.state != _STATE_CLOSED and offset < len(self.inbound):
+                available = len(self.inbound) - offset
+
+                if self.state == _STATE_CONTACT:
+                    if available < _CONTACT_HEADER_LENGTH:
+                        break
+                    self._on_contact_header(offset)
+                    offset += _CONTACT_HEADER_LENGTH
+                    continue
+
+                length = _get_message_length(self.inbound, offset, available)
+                if length is not None and length > self.cla.segment_mru + _MAX_MESSAGE_OVERHEAD:
+                    raise TcpclProtocolException('message exceeds the segment mru', SessTermReasonCodes.RESOURCE_EXHAUSTION)
+                if length is None or available < length:
+                    break
+
+                self._on_message(memoryview(self.inbound)[offset:offset + length])
+                offset += length
+        except TcpclProtocolException as e:
+            warning('tcpcl session {} protocol error: {}'.format(self.address_tuple, e.args[0]))
+            if len(e.args) > 2:
+                self._queue(encode_msg_reject(e.args[2], self.inbound[offset]))
+            self.terminate(e.args[1])
+            offset = len(self.inbound)
+
+        if offset > 0:
+            del self.inbound[:offset]
+
+    def _on_contact_header(self, offset: int):
+        if bytes(self.inbound[offset:offset + 4]) != CONTACT_HEADER_MAGIC:
+            self.state = _STATE_TERMINATING  # not a tcpcl peer, no session messages
+            raise TcpclProtocolException('invalid contact header magic', SessTermReasonCodes.CONTACT_FAILURE)
+
+        version = self.inbound[offset + 4]
+        if version != CONTACT_HEADER_VERSION:
+            self.state = _STATE_SESS_INIT  # allows the SESS_TERM
+            raise TcpclProtocolException('unsupported tcpcl version: {}'.format(version), SessTermReasonCodes.VERSION_MISMATCH)
+
+        self.state = _STATE_SESS_INIT
+
+        if self.active:
+            self._queue(self.cla.encoded_sess_init)
+        else:
+            self._queue(encode_contact_header())
+
+    def _on_message(self, message: memoryview):
+        message_type = message[0]
+
+        if self.state == _STATE_SESS_INIT:
+            if message_type == MESSAGE_TYPE_SESS_INIT:
+                self._on_sess_init(message)
+            elif message_type == MESSAGE_TYPE_SESS_TERM:
+                self._on_sess_term(message)
+            else:
+                raise TcpclProtocolException('message before SESS_INIT', SessTermReasonCodes.CONTACT_FAILURE, MsgRejectReasonCodes.MESSAGE_UNEXPECTED)
+        elif message_type == MESSAGE_TYPE_XFER_SEGMENT:
+            self._on_xfer_segment(message)
+        elif message_type == MESSAGE_TYPE_XFER_ACK:
+            self._on_xfer_ack(message)
+        elif message_type == MESSAGE_TYPE_XFER_REFUSE:
+            self._on_xfer_refuse(message)
+        elif message_type == MESSAGE_TYPE_KEEPALIVE:
+            pass  # last_received is updated on every reception
+        elif message_type == MESSAGE_TYPE_SESS_TERM:
+            self._on_sess_term(message)
+        elif message_type == MESSAGE_TYPE_MSG_REJECT:
+            reason, rejected_message_header = struct.unpack_from('!BB', message, 1)
+            warning('tcpcl session {} rejected message type {}, reason: {}'.format(self.address_tuple, rejected_message_header, reason))
+        else:
+            raise TcpclProtocolException('unexpected second SESS_INIT', SessTermReasonCodes.CONTACT_FAILURE, MsgRejectReasonCodes.MESSAGE_UNEXPECTED)
+
+    def _on_sess_init(self, message: memoryview):
+        keepalive_interval, segment_mru, transfer_mru, node_id_length = struct.unpack_from('!HQQH', message, 1)
+        self.peer_node_id = bytes(message[21:21 + node_id_length]).decode(CONFIGURATION.ENCODING)
+
+        extensions_offset = 21 + node_id_length + 4
+        for flags, item_type, _ in _parse_extension_items(message, extensions_offset, len(message)):
+            if flags & EXTENSION_ITEM_FLAG_CRITICAL:
+                raise TcpclProtocolException('unsupported critical session extension: {}'.format(item_type), SessTermReasonCodes.CONTACT_FAILURE)
+
+        # the session keepalive is the minimum of both keepalive intervals, 0 disables keepalives
+        self.keepalive_interval = min(keepalive_interval, self.cla.keepalive_interval)
+        self.peer_transfer_mru = transfer_mru
+        self.segment_size = max(1, min(segment_mru, self.cla.segment_mru))
+
+        if not self.active:
+            # the passive entity answers the SESS_INIT of the active entity
+            self._queue(self.cla.encoded_sess_init)
+
+        self.state = _STATE_ESTABLISHED
+        debug('tcpcl session {} established with {}, keepalive: {}s'.format(self.address_tuple, self.peer_node_id, self.keepalive_interval))
+
+        # transfers queued before the session was established
+        for transfer in tuple(self.outgoing_transfers):
+            if len(transfer.data) > self.peer_transfer_mru:
+                self._complete_transfer(transfer, False)
+        self._segment_transfers()
+
+    def _on_xfer_segment(self, message: memoryview):
+        flags, transfer_id = struct.unpack_from('!BQ', message, 1)
+        offset = 10
+
+        if flags & XFER_SEGMENT_FLAG_START:
+            extensions_length = struct.unpack_from('!I', message, offset)[0]
+            offset += 4
+            items = _parse_extension_items(message, offset, offset + extensions_length)
+            offset += extensions_length
+
+            if self.incoming_transfer is not None:
+                warning('tcpcl session {} started a new transfer before ending transfer {}'.format(self.address_tuple, self.incoming_transfer.transfer_id))
+            self.incoming_transfer = _IncomingTransfer(transfer_id)
+
+            for item_flags, item_type, value in items:
+                if item_type == TRANSFER_EXTENSION_TRANSFER_LENGTH and len(value) == 8:
+                    if struct.unpack('!Q', value)[0] > self.cla.transfer_mru:
+                        self._refuse_incoming_transfer(XferRefuseReasonCodes.NO_RESOURCES)
+                        return
+                elif item_flags & EXTENSION_ITEM_FLAG_CRITICAL:
+                    self._refuse_incoming_transfer(XferRefuseReasonCodes.EXTENSION_FAILURE)
+                    return
+
+        data_length = struct.unpack_from('!Q', message, offset)[0]
+        offset += 8
+
+        transfer = self.incoming_transfer
+        if transfer is None or transfer.transfer_id != transfer_id:
+            return  # refused before, the remaining segments are ignored
+
+        if len(transfer.data) + data_length > self.cla.transfer_mru:
+            self._refuse_incoming_transfer(XferRefuseReasonCodes.NO_RESOURCES)
+            return
+
+        transfer.data += message[offset:offset + data_length]
+        self._queue(encode_xfer_ack(flags, transfer_id, len(transfer.data)))
+
+        if flags & XFER_SEGMENT_FLAG_END:
+            self.incoming_transfer = None
+            self.cla.bundle_received(transfer.data, self.address_tuple[0])
+
+    def _refuse_incoming_transfer(self, reason: int):
+        self._queue(encode_xfer_refuse(reason, self.incoming_transfer.transfer_id))
+        self.incoming_transfer = None
+
+    def _get_outgoing_transfer(self, transfer_id: int) -> Optional[_OutgoingTransfer]:
+        for transfer in self.outgoing_transfers:
+            if transfer.transfer_id == transfer_id:
+                return transfer
+        return None
+
+    def _on_xfer_ack(self, message: memoryview):
+        flags, transfer_id, acknowledged_length = struct.unpack_from('!BQQ', message, 1)
+
+        transfer = self._get_outgoing_transfer(transfer_id)
+        if transfer is None:
+            return
+
+        transfer.acknowledged = acknowledged_length
+        transfer.last_progress = get_current_clock_millis()
+
+        if flags & XFER_SEGMENT_FLAG_END and acknowledged_length == len(transfer.data):
+            self._complete_transfer(transfer, True)
+
+    def _on_xfer_refuse(self, message: memoryview):
+        reason, transfer_id = struct.unpack_from('!BQ', message, 1)
+
+        transfer = self._get_outgoing_transfer(transfer_id)
+        if transfer is None:
+            return
+
+        debug('tcpcl transfer {} refused by {}, reason: {}'.format(transfer_id, self.address_tuple, reason))
+        # the receiver already has the whole bundle
+        self._complete_transfer(transfer, reason == XferRefuseReasonCodes.COMPLETED)
+
+    def _on_sess_term(self, message: memoryview):
+        flags, reason = struct.unpack_from('!BB', message, 1)
+        debug('tcpcl session {} terminated by peer, reason: {}'.format(self.address_tuple, reason))
+
+        if not flags & SESS_TERM_FLAG_REPLY and self.state != _STATE_TERMINATING:
+            self.terminate(reason, reply=True)
+        self.state = _STATE_TERMINATING
+
+        # the unsent transfers are not started anymore
+        for transfer in tuple(self.outgoing_transfers):
+            if transfer.segmented == 0:
+                self._complete_transfer(transfer, False)
+
+    def _complete_transfer(self, transfer: _OutgoingTransfer, success: bool):
+        self.outgoing_transfers.remove(transfer)
+        self.buffered_bytes -= len(transfer.data)
+        self.last_used = get_current_clock_millis()
+        self.cla.transfer_completed(transfer, success)
+
+    def check_timeouts(self):
+        if self.state == _STATE_CONTACT or self.state == _STATE_SESS_INIT:
+            if is_timestamp_older_than_timeout(self.created, CONFIGURATION.TCPCL.TIMEOUT_MILLISECONDS_CONTACT):
+                debug('tcpcl session {} establishment timed out'.format(self.address_tuple))
+                self.terminate(SessTermReasonCodes.CONTACT_FAILURE)
+            return
+
+        if self.state != _STATE_ESTABLISHED:
+            return
+
+        if self.outgoing_transfers and is_timestamp_older_than_timeout(self.outgoing_transfers[0].last_progress, CONFIGURATION.TCPCL.TIMEOUT_MILLISECONDS_TRANSFER):
+            debug('tcpcl session {} transfer {} was not acknowledged in time'.format(self.address_tuple, self.outgoing_transfers[0].transfer_id))
+            self.terminate(SessTermReasonCodes.UNKNOWN)
+            return
+
+        if self.keepalive_interval > 0:
+            # a missing keepalive (or other message) of the peer terminates the session
+            if is_timestamp_older_than_timeout(self.last_received, 2 * self.keepalive_interval * 1000):
+                self.terminate(SessTermReasonCodes.IDLE_TIMEOUT)
+                return
+            if is_timestamp_older_than_timeout(self.last_sent, self.keepalive_interval * 1000) and not self.outbound:
+                self._queue(encode_keepalive())
+
+        if self.active and not self.outgoing_transfers and is_timestamp_older_than_timeout(self.last_used, CONFIGURATION.TCPCL.TIMEOUT_MILLISECONDS_IDLE_SESSION):
+            self.terminate(SessTermReasonCodes.IDLE_TIMEOUT)
+
+    def close(self) -> List[_OutgoingTransfer]:
+        """
+        returns the not acknowledged transfers, the part of a not ended incoming transfer is kept as reactive fragment
+        """
+        self.state = _STATE_CLOSED
+        self.connection.close()
+
+        if self.incoming_transfer is not None and self.incoming_transfer.data:
+            fragment = create_reactive_fragment(bytes(self.incoming_transfer.data))
+            if fragment is not None:
+                self.cla.received_bundles.append((fragment, self.address_tuple[0], len(self.incoming_transfer.data)))
+            self.incoming_transfer = None
+
+        transfers, self.outgoing_transfers = self.outgoing_transfers, []
+        self.buffered_bytes = 0
+        return transfers
+
+
+class TcpclCLA(PushBasedCLA):
+
+    def __init__(self, full_node_uri: str, port: int = None):
+        """
+        full_node_uri -> the node id sent in the SESS_INIT message, e.g. "dtn://node1/"
+        port          -> the listening port, defaults to CONFIGURATION.PORT.TCPCL
+        """
+        self.port = CONFIGURATION.PORT.TCPCL if port is None else port
+
+        # the session parameters offered to the peers
+        self.keepalive_interval = CONFIGURATION.TCPCL.KEEPALIVE_INTERVAL_SECONDS
+        self.segment_mru = CONFIGURATION.TCPCL.SEGMENT_MRU
+        self.transfer_mru = CONFIGURATION.TCPCL.TRANSFER_MRU
+        self.encoded_sess_init = encode_sess_init(self.keepalive_interval, self.segment_mru, self.transfer_mru, full_node_uri)
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(('0.0.0.0', self.port))
+        self.socket.listen(CONFIGURATION.TCPCL.MAX_CONNECTIONS_STATE_WAITING)
+        self.socket.settimeout(0)
+
+        # the outgoing sessions are reused per (address, port), the incoming ones are kept per address tuple
+        self.active_sessions: Dict[Tuple[str, int], _TcpclSession] = {}
+        self.passive_sessions: Dict[Tuple[str, int], _TcpclSession] = {}
+
+        self.wakeup_poller: Optional[SocketPoller] = None
+        self.session_poller = SocketPoller()
+        self.session_poller.register(self.socket)
+        self.last_check = get_current_clock_millis()
+
+        # (bundle, sender address, serialized length) and the callbacks, both delivered on poll
+        self.received_bundles: List[Tuple[Bundle, str, int]] = []
+        self.sent_callbacks: List[Tuple[Callable[[bool], None], bool]] = []
+
+    def get_ipnd_service(self) -> Optional[Tuple[str, int]]:
+        return CONFIGURATION.IPND.IDENTIFIER_TCPCL, self.port
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        self.wakeup_poller = poller
+
+        poller.register(self.socket)
+        for session in self._get_sessions():
+            poller.register(session.connection, writable=bool(session.outbound))
+        return True
+
+    def _get_sessions(self) -> List[_TcpclSession]:
+        return list(self.active_sessions.values()) + list(self.passive_sessions.values())
+
+    def bundle_received(self, serialized_bundle: bytearray, address: str):
+        try:
+            self.received_bundles.append((deserialize_bundle(serialized_bundle, zero_copy=True), address, len(serialized_bundle)))
+        except Exception as e:
+            warning('error during tcpcl bundle deserialization, ignoring bundle. error: {}'.format(e))
+
+    def transfer_completed(self, transfer: _OutgoingTransfer, success: bool):
+        if transfer.node is not None:
+            link_quality = transfer.node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_TCPCL)
+            if success:
+                link_quality.record_success(len(transfer.data), get_current_clock_millis() - transfer.started)
+            else:
+                link_quality.record_failure()
+        self.sent_callbacks.append((transfer.on_sent, success))
+
+    def poll(self, bundle_id: str = None, node: Node = None) -> Tuple[Optional[Bundle], Optional[str]]:
+        if bundle_id is not None or node is not None:
+            raise Exception('cannot poll specific bundle from specific node with tcpcl cla')
+
+        bundles = self.poll_many(1)
+        if bundles:
+            return bundles[0]
+        return None, None
+
+    def poll_many(self, max_items: int, max_bytes: Optional[int] = None) -> List[Tuple[Bundle, Optional[str]]]:
+        for _, session, readable, writable in self.session_poller.poll(0):
+            if session is None:
+                self._check_for_new_connections()
+            else:
+                self._service_session(session, readable, writable)
+
+        if is_timestamp_older_than_timeout(self.last_check, _CHECK_INTERVAL_MILLISECONDS):
+            for session in self._get_sessions():
+                session.check_timeouts()
+                self._service_session(session, False, True)
+            self.last_check = get_current_clock_millis()
+
+        sent_callbacks, self.sent_callbacks = self.sent_callbacks, []
+        for on_sent, success in sent_callbacks:
+            on_sent(success)
+
+        bundles = []
+        received_bytes = 0
+        while self.received_bundles and len(bundles) < max_items and (max_bytes is None or received_bytes < max_bytes):
+            bundle, address, length = self.received_bundles.pop(0)
+            bundles.append((bundle, address))
+            received_bytes += length
+        return bundles
+
+    def _check_for_new_connections(self):
+        while len(self.passive_sessions) < CONFIGURATION.TCPCL.MAX_SESSIONS:
+            try:
+                client_socket, address_tuple = self.socket.accept()
+            except OSError:
+                return
+
+            client_socket.settimeout(0)
+            self._add_session(self.passive_sessions, address_tuple, _TcpclSession(self, client_socket, address_tuple, False))
+
+    def _add_session(self, sessions: Dict[Tuple[str, int], _TcpclSession], key: Tuple[str, int], session: _TcpclSession):
+        sessions[key] = session
+        self.session_poller.register(session.connection, session, writable=bool(session.outbound))
+        if self.wakeup_poller is not None:
+            self.wakeup_poller.register(session.connection, writable=bool(session.outbound))
+
+    def _service_session(self, session: _TcpclSession, readable: bool, writable: bool):
+        if session.state == _STATE_CLOSED:
+            return
+
+        connected = True
+        if readable:
+            connected = session.receive()
+        if connected and (writable or session.outbound):
+            connected = session.flush()
+
+        if not connected or (session.state == _STATE_TERMINATING and not session.outbound):
+            self._close_session(session)
+            return
+
+        # writability is only of interest while there is something to send
+        self.session_poller.modify(session.connection, session, writable=bool(session.outbound))
+        if self.wakeup_poller is not None:
+            self.wakeup_poller.modify(session.connection, writable=bool(session.outbound))
+
+    def _close_session(self, session: _TcpclSession):
+        self.session_poller.unregister(session.connection)
+        if self.wakeup_poller is not None:
+            self.wakeup_poller.unregister(session.connection)
+
+        for transfer in session.close():
+            self.transfer_completed(transfer, False)
+
+        sessions = self.active_sessions if session.active else self.passive_sessions
+        if sessions.get(session.address_tuple) is session:
+            del sessions[session.address_tuple]
+
+    def _get_session_to(self, node: Node) -> Optional[_TcpclSession]:
+        if CONFIGURATION.IPND.IDENTIFIER_TCPCL not in node.clas:
+            return None
+
+        key = (node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_TCPCL])
+        session = self.active_sessions.get(key)
+
+        if session is not None and not session.is_usable:
+            return None  # terminating, a new session is opened after it closed
+
+        if session is None:
+            connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            connection.settimeout(0)
+            try:
+                connection.connect(key)
+            except OSError:
+                pass  # non-blocking connect, a failure shows on the first send or receive
+            session = _TcpclSession(self, connection, key, True)
+            self._add_session(self.active_sessions, key, session)
+
+        return session
+
+    def send_to_async(self, node: Optional[Node], serialized_bundle: bytes, on_sent: Callable[[bool], None]) -> bool:
+        if node is None:
+            raise Exception('cannot send bundle to unspecified node with tcpcl cla')
+
+        session = self._get_session_to(node)
+        if session is None or session.buffered_bytes + len(serialized_bundle) > CONFIGURATION.TCPCL.MAX_BYTES_BUFFERED_SEND:
+            return False
+
+        if not session.start_transfer(serialized_bundle, node, on_sent):
+            return False
+
+        self._service_session(session, False, True)
+        return True
+
+    def send_to(self, node: Optional[Node], serialized_bundle: bytes) -> bool:
+        """
+        blocks until the transfer was acknowledged completely, bundles received in the meantime are kept for poll
+        """
+        results = []
+        if not self.send_to_async(node, serialized_bundle, results.append):
+            return False
+
+        # the session may be closed already (e.g. connection refused), the failure is reported by the callback
+        session = self.active_sessions.get((node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_TCPCL]))
+        start = get_current_clock_millis()
+
+        while not results and not is_timestamp_older_than_timeout(start, CONFIGURATION.TCPCL.TIMEOUT_MILLISECONDS_TRANSFER):
+            if session is not None and session.state != _STATE_CLOSED:
+                self._service_session(session, True, True)
+                session.check_timeouts()
+
+            # the callbacks of this transfer and of others completed in the meantime
+            sent_callbacks, self.sent_callbacks = self.sent_callbacks, []
+            for callback, success in sent_callbacks:
+                callback(success)
+
+            if not results:
+                time.sleep(0.001)
+
+        return bool(results) and results[0]
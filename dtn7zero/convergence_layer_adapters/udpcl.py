@@ -0,0 +1,207 @@
+"""
+UDP convergence layer -> one bundle per datagram (like the udp cla of dtn7-rs), bundles larger than a datagram are
+fragmented by the router (mtu), there is no acknowledgement and no retransmission.
+
+Optionally (CONFIGURATION.UDPCL.PACK_BUNDLES) several small bundles to the same node are packed into one datagram as
+a cbor sequence (RFC 8742) of bundles. The packed bundles are sent on the next poll, a datagram is sent earlier once
+the next bundle does not fit anymore. Only dtn7zero nodes unpack these datagrams, enable it for dtn7zero networks only.
+"""
+import socket
+from typing import Optional, Dict, Tuple, List, Callable
+
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.convergence_layer_adapters import PushBasedCLA
+from dtn7zero.data import Node
+from dtn7zero.serialization import deserialize_bundle, skip_cbor_item
+from dtn7zero.utility import get_current_clock_millis, debug, warning, SocketPoller
+from py_dtn7 import Bundle
+
+
+def _is_would_block_error(e: OSError) -> bool:
+    if RUNNING_MICROPYTHON:
+        return bool(e.args) and e.args[0] == 11  # EAGAIN
+    return isinstance(e, BlockingIOError)
+
+
+def split_datagram(datagram: bytes) -> List[bytes]:
+    """
+    returns the serialized bundles of a datagram (a single bundle or a cbor sequence of bundles)
+    """
+    end = skip_cbor_item(datagram, 0)
+    if end == len(datagram):
+        return [datagram]
+
+    serialized_bundles = [datagram[:end]]
+    while end < len(datagram):
+        start, end = end, skip_cbor_item(datagram, end)
+        serialized_bundles.append(datagram[start:end])
+    return serialized_bundles
+
+
+class _PackedDatagram:
+
+    def __init__(self, node: Node):
+        self.node = node
+        self.data = bytearray()
+        self.callbacks: List[Callable[[bool], None]] = []
+
+
+class UdpCLA(PushBasedCLA):
+
+    def __init__(self, port: int = None):
+        """
+        port -> the listening port, defaults to CONFIGURATION.PORT.UDPCL
+        """
+        self.port = CONFIGURATION.PORT.UDPCL if port is None else port
+        self.mtu = CONFIGURATION.UDPCL.MAX_DATAGRAM_SIZE
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(('0.0.0.0', self.port))
+        self.socket.settimeout(0)
+
+        self.wakeup_poller: Optional[SocketPoller] = None
+        self.wakeup_writable = False
+
+        # the bundles unpacked from a datagram that exceeded the poll budgets, with the address of the sender
+        self.received_bundles: List[Tuple[bytes, str]] = []
+
+        # the datagrams being packed per (address, port), sent on the next poll, the sent callbacks are called on poll
+        self.packed_datagrams: Dict[Tuple[str, int], _PackedDatagram] = {}
+        self.sent_callbacks: List[Tuple[Callable[[bool], None], bool]] = []
+
+    def get_ipnd_service(self) -> Optional[Tuple[str, int]]:
+        return CONFIGURATION.IPND.IDENTIFIER_UDPCL, self.port
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        self.wakeup_poller = poller
+
+        poller.register(self.socket, writable=self.wakeup_writable)
+        return True
+
+    def _update_wakeup_registration(self):
+        # a writable registration wakes the bpa up to send the packed datagrams and to call the sent callbacks
+        writable = bool(self.packed_datagrams or self.sent_callbacks)
+        if writable != self.wakeup_writable:
+            self.wakeup_writable = writable
+            if self.wakeup_poller is not None:
+                self.wakeup_poller.modify(self.socket, writable=writable)
+
+    def poll(self, bundle_id: str = None, node: Node = None) -> Tuple[Optional[Bundle], Optional[str]]:
+        if bundle_id is not None or node is not None:
+            raise Exception('cannot poll specific bundle from specific node with udp cla')
+
+        bundles = self.poll_many(1)
+        if bundles:
+            return bundles[0]
+        return None, None
+
+    def poll_many(self, max_items: int, max_bytes: Optional[int] = None) -> List[Tuple[Bundle, Optional[str]]]:
+        for key in tuple(self.packed_datagrams.keys()):
+            self._send_packed_datagram(key)
+
+        sent_callbacks, self.sent_callbacks = self.sent_callbacks, []
+        for on_sent, success in sent_callbacks:
+            on_sent(success)
+        self._update_wakeup_registration()
+
+        # the socket is drained until it is empty or a budget is spent
+        bundles = []
+        received_bytes = 0
+
+        while len(bundles) < max_items and (max_bytes is None or received_bytes < max_bytes):
+            if not self.received_bundles and not self._receive_datagram():
+                break
+
+            serialized_bundle, from_node_address = self.received_bundles.pop(0)
+            received_bytes += len(serialized_bundle)
+
+            try:
+                bundles.append((deserialize_bundle(serialized_bundle, zero_copy=True), from_node_address))
+            except Exception as e:
+                warning('error during udp bundle deserialization, ignoring bundle. error: {}'.format(e))
+
+        return bundles
+
+    def _receive_datagram(self) -> bool:
+        """
+        returns False if no datagram is available
+        """
+        try:
+            datagram, address_tuple = self.socket.recvfrom(CONFIGURATION.UDPCL.MAX_DATAGRAM_SIZE)
+        except OSError as e:
+            if not _is_would_block_error(e):
+                debug('udp cla receive failed: {}'.format(e))
+            return False
+
+        try:
+            serialized_bundles = split_datagram(datagram)
+        except (IndexError, ValueError) as e:
+            warning('udp cla received invalid datagram from {}, ignoring datagram. error: {}'.format(address_tuple, e))
+            return True
+
+        for serialized_bundle in serialized_bundles:
+            self.received_bundles.append((serialized_bundle, address_tuple[0]))
+        return True
+
+    def _send_datagram(self, node: Node, datagram) -> bool:
+        link_quality = node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_UDPCL)
+        start = get_current_clock_millis()
+
+        try:
+            self.socket.sendto(datagram, (node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_UDPCL]))
+        except OSError as e:
+            # a full send buffer counts as failure as well, udp is not retransmitted anyway
+            debug('udp cla could not send datagram to {}: {}'.format(node.address, e))
+            link_quality.record_failure()
+            return False
+
+        link_quality.record_success(len(datagram), get_current_clock_millis() - start)
+        return True
+
+    def _send_packed_datagram(self, key: Tuple[str, int]):
+        packed_datagram = self.packed_datagrams.pop(key)
+        success = self._send_datagram(packed_datagram.node, packed_datagram.data)
+
+        for on_sent in packed_datagram.callbacks:
+            self.sent_callbacks.append((on_sent, success))
+
+    def send_to_async(self, node: Optional[Node], serialized_bundle: bytes, on_sent: Callable[[bool], None]) -> bool:
+        if not CONFIGURATION.UDPCL.PACK_BUNDLES or node is None or CONFIGURATION.IPND.IDENTIFIER_UDPCL not in node.clas:
+            return False
+        if len(serialized_bundle) > self.mtu:
+            return False
+
+        key = (node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_UDPCL])
+
+        packed_datagram = self.packed_datagrams.get(key)
+        if packed_datagram is not None and len(packed_datagram.data) + len(serialized_bundle) > self.mtu:
+            self._send_packed_datagram(key)
+            packed_datagram = None
+
+        if packed_datagram is None:
+            packed_datagram = self.packed_datagrams[key] = _PackedDatagram(node)
+
+        packed_datagram.data += serialized_bundle
+        packed_datagram.callbacks.append(on_sent)
+        self._update_wakeup_registration()
+        return True
+
+    def send_to(self, node: Optional[Node], serialized_bundle: bytes) -> bool:
+        if node is None:
+            raise Exception('cannot send bundle to unspecified node with udp cla')
+
+        if CONFIGURATION.IPND.IDENTIFIER_UDPCL not in node.clas:
+            return False
+
+        if len(serialized_bundle) > self.mtu:
+            warning('cannot forward bundle through udp cla because it is longer than {} bytes: {}'.format(self.mtu, len(serialized_bundle)))
+            return False
+
+        # the packed bundles to the node are sent first to keep the order
+        key = (node.address, node.clas[CONFIGURATION.IPND.IDENTIFIER_UDPCL])
+        if key in self.packed_datagrams:
+            self._send_packed_datagram(key)
+            self._update_wakeup_registration()
+
+        return self._send_datagram(node, serialized_bundle)
@@ -0,0 +1,103 @@
+"""
+RFC 9171, 4.2.1 CRC -> CRC-16/X.25 (crc type 1) and CRC-32C (crc type 2)
+
+The functions continue a previous result like zlib.crc32(data, value), so a crc can be computed over the encoded
+parts of a block as they are produced:  crc(b, crc(a)) == crc(a + b)
+
+CPython    -> CRC-16/X.25 via binascii.crc_hqx (the non-reflected variant, on bit-reversed bytes),
+              CRC-32C via the optional crc32c package (pip install crc32c), otherwise table-driven
+MicroPython -> table-driven viper functions (native code)
+"""
+from dtn7zero.configuration import RUNNING_MICROPYTHON
+from py_dtn7.bundle import CRC_TYPE_NOCRC, CRC_TYPE_X25, CRC_TYPE_CRC32C
+
+try:
+    from array import array
+except ImportError:
+    from uarray import array
+
+
+_CRC16_X25_REFLECTED_POLYNOMIAL = 0x8408
+_CRC32C_REFLECTED_POLYNOMIAL = 0x82F63B78
+
+
+def _build_table(reflected_polynomial: int, type_code: str) -> array:
+    table = array(type_code, [0] * 256)
+    for idx in range(256):
+        value = idx
+        for _ in range(8):
+            value = (value >> 1) ^ reflected_polynomial if value & 1 else value >> 1
+        table[idx] = value
+    return table
+
+
+_CRC16_X25_TABLE = _build_table(_CRC16_X25_REFLECTED_POLYNOMIAL, 'H')
+_CRC32C_TABLE = _build_table(_CRC32C_REFLECTED_POLYNOMIAL, 'I')
+
+
+if RUNNING_MICROPYTHON:
+    import micropython
+
+    @micropython.viper
+    def _crc16_x25_update(crc: uint, data, length: int) -> uint:
+        buffer = ptr8(data)
+        table = ptr16(_CRC16_X25_TABLE)
+        for idx in range(length):
+            crc = uint(table[(crc ^ uint(buffer[idx])) & 0xff]) ^ (crc >> 8)
+        return crc
+
+    @micropython.viper
+    def _crc32c_update(crc: uint, data, length: int) -> uint:
+        buffer = ptr8(data)
+        table = ptr32(_CRC32C_TABLE)
+        for idx in range(length):
+            crc = uint(table[(crc ^ uint(buffer[idx])) & 0xff]) ^ (crc >> 8)
+        return crc
+
+    def crc16_x25(data, value: int = 0) -> int:
+        return _crc16_x25_update(value ^ 0xffff, data, len(data)) ^ 0xffff
+
+    def crc32c(data, value: int = 0) -> int:
+        return _crc32c_update(value ^ 0xffffffff, data, len(data)) ^ 0xffffffff
+
+else:
+    from binascii import crc_hqx
+
+    # crc_hqx is the non-reflected CRC-16/CCITT, X.25 is its reflected variant -> reflect the input bytes and the crc
+    _REVERSED_BITS = bytes(int('{:08b}'.format(idx)[::-1], 2) for idx in range(256))
+
+    def _reflect_16(value: int) -> int:
+        return (_REVERSED_BITS[value & 0xff] << 8) | _REVERSED_BITS[value >> 8]
+
+    def crc16_x25(data, value: int = 0) -> int:
+        crc = crc_hqx(bytes(data).translate(_REVERSED_BITS), _reflect_16(value ^ 0xffff))
+        return _reflect_16(crc) ^ 0xffff
+
+    try:
+        from crc32c import crc32c
+    except ImportError:
+        def crc32c(data, value: int = 0) -> int:
+            table = _CRC32C_TABLE
+            crc = value ^ 0xffffffff
+            for byte in data:
+                crc = table[(crc ^ byte) & 0xff] ^ (crc >> 8)
+            return crc ^ 0xffffffff
+
+
+def get_crc_size(crc_type: int) -> int:
+    """ returns the number of bytes of the crc field """
+    if crc_type == CRC_TYPE_X25:
+        return 2
+    elif crc_type == CRC_TYPE_CRC32C:
+        return 4
+    elif crc_type == CRC_TYPE_NOCRC:
+        return 0
+    raise ValueError('unknown crc type: {}'.format(crc_type))
+
+
+def calculate_crc(crc_type: int, data, value: int = 0) -> int:
+    if crc_type == CRC_TYPE_X25:
+        return crc16_x25(data, value)
+    elif crc_type == CRC_TYPE_CRC32C:
+        return crc32c(data, value)
+    raise ValueError('unknown crc type: {}'.format(crc_type))
@@ -1,6 +1,8 @@
-from typing import List, Tuple, Dict
+from typing import Tuple, Dict, Optional, List, Callable
 
-from dtn7zero.utility import get_current_clock_millis
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.extension_blocks import BundlePriority, get_bundle_priority
+from dtn7zero.utility import get_current_clock_millis, allocate_lock
 from py_dtn7 import Bundle
 
 
@@ -22,6 +24,63 @@ class BundleStatusReportReasonCodes:
     BLOCK_UNSUPPORTED = 11
 
 
+class LinkQuality:
+    """
+    exponentially weighted moving averages of the send outcomes to one neighbor over one cla
+
+    A failed send does not remove the cla from the node anymore, instead the link is backed off exponentially,
+    which stops the node from flapping between beacons.
+    """
+
+    def __init__(self):
+        self.latency_milliseconds: Optional[float] = None
+        self.bytes_per_second: Optional[float] = None
+        self.reliability: float = 1.0  # success ratio, optimistic until the first failure
+
+        self.consecutive_failures = 0
+        self.backoff_until = 0
+
+    def __repr__(self) -> str:
+        return '<LinkQuality: latency: {}ms, throughput: {}B/s, reliability: {}, failures: {}>'.format(
+            self.latency_milliseconds, self.bytes_per_second, self.reliability, self.consecutive_failures)
+
+    def record_success(self, num_bytes: int, duration_milliseconds: int):
+        alpha = CONFIGURATION.LINK_QUALITY.EWMA_ALPHA
+        # clock resolution on micropython may report 0 milliseconds for fast sends
+        duration_milliseconds = max(duration_milliseconds, 1)
+        bytes_per_second = num_bytes * 1000 / duration_milliseconds
+
+        if self.latency_milliseconds is None:
+            self.latency_milliseconds = duration_milliseconds
+            self.bytes_per_second = bytes_per_second
+        else:
+            self.latency_milliseconds += alpha * (duration_milliseconds - self.latency_milliseconds)
+            self.bytes_per_second += alpha * (bytes_per_second - self.bytes_per_second)
+
+        self.reliability += alpha * (1.0 - self.reliability)
+        self.consecutive_failures = 0
+        self.backoff_until = 0
+
+    def record_failure(self):
+        self.reliability -= CONFIGURATION.LINK_QUALITY.EWMA_ALPHA * self.reliability
+        self.consecutive_failures += 1
+
+        backoff = min(CONFIGURATION.LINK_QUALITY.BACKOFF_MIN_MILLISECONDS << (self.consecutive_failures - 1), CONFIGURATION.LINK_QUALITY.BACKOFF_MAX_MILLISECONDS)
+        self.backoff_until = get_current_clock_millis() + backoff
+
+    def is_backed_off(self) -> bool:
+        return self.consecutive_failures > 0 and get_current_clock_millis() < self.backoff_until
+
+    @property
+    def score(self) -> float:
+        """
+        higher is better: reliable links first, then fast links (unknown links count as fast)
+        """
+        if self.latency_milliseconds is None:
+            return self.reliability
+        return self.reliability / (1.0 + self.latency_milliseconds / 1000)
+
+
 class Node:
 
     def __init__(self, address: str, eid: Tuple[int, str], clas: Dict[str, int], sequence_number: int):
@@ -33,6 +92,12 @@ class Node:
         self.clas = clas  # a list of tuples, consisting of the ipnd-cla-identifier + application port
         self.sequence_number = sequence_number
 
+        # the small integer index of this node in the neighbor table, assigned by the storage on add_node(...)
+        # bundles use it as the bit position in their forwarding ledger (see BundleInformation.forwarded_to_nodes)
+        self.index: Optional[int] = None
+
+        self.link_qualities: Dict[str, LinkQuality] = {}  # cla-identifier -> link quality
+
         self.latest_discovery = get_current_clock_millis()
 
     def merge_new_info(self, eid_scheme: int, eid_specific_part: str, clas: Dict[str, int]):
@@ -42,6 +107,26 @@ class Node:
 
         self.latest_discovery = get_current_clock_millis()
 
+    def get_link_quality(self, cla_identifier: str) -> LinkQuality:
+        link_quality = self.link_qualities.get(cla_identifier)
+
+        if link_quality is None:
+            link_quality = self.link_qualities[cla_identifier] = LinkQuality()
+
+        return link_quality
+
+    @property
+    def link_score(self) -> float:
+        """
+        the score of the best link to this node, unused links are optimistic
+        """
+        best = None
+        for cla_identifier in self.clas:
+            score = self.get_link_quality(cla_identifier).score
+            if best is None or score > best:
+                best = score
+        return 1.0 if best is None else best
+
     def advance_sequence_number(self, new_sequence_number: int) -> bool:
         old_sequence_number = self.sequence_number
         self.sequence_number = new_sequence_number
@@ -51,10 +136,141 @@ class Node:
 class BundleInformation:
     RETENTION_CONSTRAINT_DISPATCH_PENDING = 'Dispatch pending'
     RETENTION_CONSTRAINT_FORWARD_PENDING = 'Forward pending'
+    RETENTION_CONSTRAINT_REASSEMBLY_PENDING = 'Reassembly pending'
 
     def __init__(self, bundle: Bundle):
         self.bundle = bundle
         self.retention_constraint = None
         self.locally_delivered = False
         self.received_at_ms = get_current_clock_millis()
-        self.forwarded_to_nodes: List[Node] = []
+        self.priority = get_bundle_priority(bundle)
+
+        # compact forwarding ledger: bit n is set if the bundle was forwarded to the node with index n
+        self.forwarded_to_nodes: int = 0
+        self.forwarded_to_nodes_count: int = 0
+        # bit n is set while an asynchronous transmission to the node with index n is in progress
+        self.forwarding_to_nodes: int = 0
+
+    def was_forwarded_to(self, node: Node) -> bool:
+        return bool(self.forwarded_to_nodes >> node.index & 1)
+
+    def mark_forwarded_to(self, node: Node):
+        if not self.forwarded_to_nodes >> node.index & 1:
+            self.forwarded_to_nodes |= 1 << node.index
+            self.forwarded_to_nodes_count += 1
+
+    def is_forwarding_to(self, node: Node) -> bool:
+        return bool(self.forwarding_to_nodes >> node.index & 1)
+
+    def mark_forwarding_to(self, node: Node):
+        self.forwarding_to_nodes |= 1 << node.index
+
+    def complete_forwarding_to(self, node: Node, success: bool):
+        self.forwarding_to_nodes &= ~(1 << node.index)
+        if success:
+            self.mark_forwarded_to(node)
+
+
+class _RingBuffer:
+    """
+    fixed capacity FIFO with O(1) append and popleft
+    """
+
+    def __init__(self, capacity: int):
+        self.items: List[Optional[BundleInformation]] = [None] * capacity
+        self.head = 0
+        self.count = 0
+
+    def append(self, item: BundleInformation):
+        self.items[(self.head + self.count) % len(self.items)] = item
+        self.count += 1
+
+    def popleft(self) -> BundleInformation:
+        item = self.items[self.head]
+        self.items[self.head] = None  # do not keep the bundle alive
+        self.head = (self.head + 1) % len(self.items)
+        self.count -= 1
+        return item
+
+
+class BundleDispatchQueue:
+    """
+    bounded FIFO queue per priority class, pop() serves the highest priority class first
+
+    the capacity is shared by all priority classes, append() refuses bundles while the queue is full
+    """
+
+    def __init__(self, capacity: int = None):
+        if capacity is None:
+            capacity = CONFIGURATION.LOCAL_DISPATCH_QUEUE_SIZE
+
+        self.capacity = capacity
+        self.length = 0
+        self.queues: Dict[int, _RingBuffer] = {priority: _RingBuffer(capacity) for priority in BundlePriority.ALL}
+
+        # one-shot callbacks, called as soon as the queue has capacity again
+        self.capacity_callbacks: List[Callable[[], None]] = []
+
+        # producers (endpoints) and the consumer (bpa update) may run in different threads
+        self.lock = allocate_lock()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __bool__(self) -> bool:
+        return self.length > 0
+
+    def is_full(self) -> bool:
+        return self.length >= self.capacity
+
+    def append(self, bundle_information: BundleInformation) -> bool:
+        """
+        returns False if the queue is full (the bundle was not queued)
+        """
+        with self.lock:
+            if self.length >= self.capacity:
+                return False
+            self.queues[bundle_information.priority].append(bundle_information)
+            self.length += 1
+        return True
+
+    def extend(self, bundle_informations: List[BundleInformation]) -> int:
+        """
+        appends the bundles in order until the queue is full, returns the number of queued bundles
+        """
+        with self.lock:
+            num_queued = max(0, min(len(bundle_informations), self.capacity - self.length))
+            for bundle_information in bundle_informations[:num_queued]:
+                self.queues[bundle_information.priority].append(bundle_information)
+            self.length += num_queued
+        return num_queued
+
+    def pop(self) -> Optional[BundleInformation]:
+        bundle_information = None
+
+        with self.lock:
+            for priority in BundlePriority.ALL:
+                queue = self.queues[priority]
+                if queue.count:
+                    bundle_information = queue.popleft()
+                    self.length -= 1
+                    break
+
+            callbacks = self.capacity_callbacks
+            if callbacks:
+                self.capacity_callbacks = []
+
+        for callback in callbacks:
+            callback()
+
+        return bundle_information
+
+    def add_capacity_callback(self, callback: Callable[[], None]):
+        """
+        calls the callback once, as soon as the queue is not full (immediately if it is not full now)
+        """
+        with self.lock:
+            if self.length >= self.capacity:
+                self.capacity_callbacks.append(callback)
+                return
+        callback()
@@ -1,7 +1,8 @@
-from typing import Callable
+from typing import Callable, Optional, List
 
 from dtn7zero.configuration import RUNNING_MICROPYTHON, CONFIGURATION
 from dtn7zero.data import BundleInformation
+from dtn7zero.extension_blocks import BundlePriority, create_bundle_priority_block
 from dtn7zero.utility import debug
 from py_dtn7 import Bundle, DTNRESTClient, to_dtn_timestamp
 from py_dtn7.bundle import BundleProcessingControlFlags, PrimaryBlock, HopCountBlock, PayloadBlock, BundleAgeBlock, \
@@ -10,14 +11,23 @@ from py_dtn7.bundle import BundleProcessingControlFlags, PrimaryBlock, HopCountB
 
 class _LocalEndpoint:
 
-    def __init__(self, receive_callback: Callable[[Bundle], None] = None):
+    def __init__(self, receive_callback: Callable[[Bundle], None] = None, zero_copy: bool = False):
         self.bpa = None
         self.receive_callback = receive_callback
+        self.zero_copy = zero_copy
 
         if receive_callback is None:
             self.bundle_buffer: list[Bundle] = []
 
+    def _prepare_payload(self, bundle: Bundle):
+        # bundles received over some clas carry their payload as memoryview into the receive buffer (zero-copy),
+        # endpoints without zero-copy opt-in receive bytes (the copy is then shared with all following endpoints)
+        if not self.zero_copy and isinstance(bundle.payload_block.data, memoryview):
+            bundle.payload_block.data = bytes(bundle.payload_block.data)
+
     def bpa_local_bundle_delivery(self, bundle: Bundle):
+        self._prepare_payload(bundle)
+
         if self.receive_callback is None:
             self.bundle_buffer.append(bundle)
         else:
@@ -42,7 +52,7 @@ class _LocalEndpoint:
 
 
 class LocalEndpoint(_LocalEndpoint):
-    def __init__(self, endpoint_identifier: str, receive_callback: Callable[[Bundle], None] = None):
+    def __init__(self, endpoint_identifier: str, receive_callback: Callable[[Bundle], None] = None, zero_copy: bool = False):
         """ The LocalEndpoint is the entry-point for the application to send/receive bundles.
 
         endpoint_identifier examples:
@@ -50,8 +60,10 @@ class LocalEndpoint(_LocalEndpoint):
             ipn addressing scheme -> "12", "24.15.16"
 
         receive_callback may be None, but then the endpoint should be regularly polled for new bundles.
+
+        zero_copy -> received payloads may be a memoryview instead of bytes, see deserialize_bundle(...)
         """
-        super().__init__(receive_callback)
+        super().__init__(receive_callback, zero_copy)
 
         self.endpoint_identifier = endpoint_identifier
 
@@ -67,58 +79,106 @@ class LocalEndpoint(_LocalEndpoint):
         else:
             return '{}.{}'.format(self.bpa.full_node_uri, self.endpoint_identifier)
 
-    def start_transmission(self, payload: bytes, full_destination_uri: str, lifetime: int = 3600 * 24 * 1000, anonymous=False) -> str:
+    def start_transmission(self, payload: bytes, full_destination_uri: str, lifetime: int = 3600 * 24 * 1000, anonymous=False, priority: int = BundlePriority.NORMAL, timeout_milliseconds: int = None, status_report_requests: int = 0) -> Optional[str]:
+        """
+        priority               -> one of BundlePriority.BULK, BundlePriority.NORMAL, BundlePriority.EXPEDITED
+                                  (non-normal priorities are carried in a dtn7zero specific extension block)
+        timeout_milliseconds   -> how long to block while the local dispatch queue of the bpa is full,
+                                  None blocks as long as needed, 0 never blocks
+        status_report_requests -> StatusReportRequest flags (or-ed), the reports are sent to the node of this endpoint
+                                  and can be received with an AdministrativeEndpoint (ignored if anonymous)
+
+        returns the bundle id, or None if the queue stayed full (would block). blocking is impossible inside a
+        receive-callback, then None is returned immediately. see notify_when_writable(...) for non-blocking producers.
+        """
         if self.bpa is None:
             raise Exception('cannot start transmission on unregistered LocalEndpoint {}'.format(self.endpoint_identifier))
 
-        bundle_processing_control_flags = BundleProcessingControlFlags(0)
-        bundle_processing_control_flags.set_flag(2)  # do not fragment bundle
+        if not self.bpa.wait_for_dispatch_capacity(timeout_milliseconds):
+            return None
+
+        # bundles may be fragmented on the way, e.g. to fit through espnow or lora
+        bundle_processing_control_flags = BundleProcessingControlFlags(0 if anonymous else status_report_requests)
+
+        bundle = self._create_bundle(payload, full_destination_uri, lifetime, anonymous, priority, bundle_processing_control_flags)
 
-        bundle_age_block = None
+        debug('starting transmission of bundle: {}'.format(bundle.bundle_id))
+
+        if not self.bpa.local_bundle_dispatch_queue.append(BundleInformation(bundle)):
+            return None  # another producer took the capacity in between
+        self.bpa.wakeup()
+
+        return bundle.bundle_id
 
+    def _create_bundle(self, payload: bytes, full_destination_uri: str, lifetime: int, anonymous: bool, priority: int, bundle_processing_control_flags: BundleProcessingControlFlags) -> Bundle:
+        return BundleTemplate(self, full_destination_uri, lifetime, anonymous, priority, bundle_processing_control_flags.flags).create_bundle(payload)
+
+    def _next_creation_timestamp(self) -> Optional[BundleAgeBlock]:
+        # advances the creation timestamp (creation time + sequence number) for a new bundle,
+        # without accurate clock the bundle needs a bundle age block
         if RUNNING_MICROPYTHON:
             self.last_sequence_number += 1
 
-            bundle_age_block = BundleAgeBlock.from_objects()
-        else:
-            current_time = to_dtn_timestamp()
-            if current_time == self.last_bundle_creation_time:
-                self.last_sequence_number += 1
-            else:
-                self.last_bundle_creation_time = current_time
-                self.last_sequence_number = 0
+            return BundleAgeBlock.from_objects()
 
-        if full_destination_uri.startswith(URI_SCHEME_DTN_NAME):
-            anonymous_uri = 'dtn:{}'.format(NONE_ENDPOINT_SPECIFIC_PART_NAME)
+        current_time = to_dtn_timestamp()
+        if current_time == self.last_bundle_creation_time:
+            self.last_sequence_number += 1
         else:
-            anonymous_uri = 'ipn:{}'.format(NONE_ENDPOINT_SPECIFIC_PART_NAME)
+            self.last_bundle_creation_time = current_time
+            self.last_sequence_number = 0
+        return None
 
-        primary_block = PrimaryBlock.from_objects(
-            full_destination_uri=full_destination_uri,
-            full_source_uri=anonymous_uri if anonymous else self.full_endpoint_uri,
-            full_report_to_uri=anonymous_uri if anonymous else self.bpa.full_node_uri,
-            bundle_processing_control_flags=bundle_processing_control_flags,
-            bundle_creation_time=self.last_bundle_creation_time,
-            sequence_number=self.last_sequence_number,
-            lifetime=lifetime
-        )
+    def create_bundle_template(self, full_destination_uri: str, lifetime: int = 3600 * 24 * 1000, anonymous=False, priority: int = BundlePriority.NORMAL, status_report_requests: int = 0) -> 'BundleTemplate':
+        """ returns a template for many bundles from this endpoint to one destination, see start_transmissions(...) """
+        if self.bpa is None:
+            raise Exception('cannot create bundle template on unregistered LocalEndpoint {}'.format(self.endpoint_identifier))
 
-        hop_count_block = HopCountBlock.from_objects(hop_limit=32, hop_count=0)
+        return BundleTemplate(self, full_destination_uri, lifetime, anonymous, priority, 0 if anonymous else status_report_requests)
 
-        payload_block = PayloadBlock.from_objects(data=payload)
+    def start_transmissions(self, payloads: List[bytes], template: 'BundleTemplate', timeout_milliseconds: int = None) -> List[str]:
+        """
+        queues one bundle per payload, built from the template (see create_bundle_template(...)), in order
 
-        bundle = Bundle(
-            primary_block=primary_block,
-            bundle_age_block=bundle_age_block,
-            hop_count_block=hop_count_block,
-            payload_block=payload_block
-        )
+        the free capacity of the local dispatch queue is filled at once, with one wakeup of the bpa per fill.
+        timeout_milliseconds -> how long to block each time the local dispatch queue is full (see start_transmission)
 
-        debug('starting transmission of bundle: {}'.format(bundle.bundle_id))
+        returns the bundle ids of the queued bundles, fewer than payloads if the queue stayed full (would block)
+        """
+        if self.bpa is None:
+            raise Exception('cannot start transmission on unregistered LocalEndpoint {}'.format(self.endpoint_identifier))
 
-        self.bpa.local_bundle_dispatch_queue.append(BundleInformation(bundle))
+        queue = self.bpa.local_bundle_dispatch_queue
+        bundle_ids = []
 
-        return bundle.bundle_id
+        while len(bundle_ids) < len(payloads):
+            if not self.bpa.wait_for_dispatch_capacity(timeout_milliseconds):
+                break
+
+            num_bundles = max(1, min(queue.capacity - len(queue), len(payloads) - len(bundle_ids)))
+            payload_offset = len(bundle_ids)
+
+            bundle_informations = [BundleInformation(template.create_bundle(payload)) for payload in payloads[payload_offset:payload_offset + num_bundles]]
+
+            # another producer may have taken capacity in between, the rest is rebuilt after the next wait
+            num_queued = queue.extend(bundle_informations)
+            bundle_ids.extend(bundle_information.bundle.bundle_id for bundle_information in bundle_informations[:num_queued])
+
+            if num_queued:
+                self.bpa.wakeup()
+
+        debug('started transmission of {} bundles to {}'.format(len(bundle_ids), template.full_destination_uri))
+
+        return bundle_ids
+
+    def notify_when_writable(self, callback: Callable[[], None]):
+        """
+        calls the callback once, as soon as start_transmission(...) would not block (immediately if possible now)
+        """
+        if self.bpa is None:
+            raise Exception('cannot wait for capacity on unregistered LocalEndpoint {}'.format(self.endpoint_identifier))
+
+        self.bpa.local_bundle_dispatch_queue.add_capacity_callback(callback)
 
     def cancel_transmission(self, bundle_id: str) -> bool:
         if self.bpa is None:
@@ -129,18 +189,22 @@ class LocalEndpoint(_LocalEndpoint):
 
 class LocalGroupEndpoint(_LocalEndpoint):
 
-    def __init__(self, full_group_uri: str, receive_callback: Callable[[Bundle], None] = None):
+    def __init__(self, full_group_uri: str, receive_callback: Callable[[Bundle], None] = None, zero_copy: bool = False):
         """ The LocalGroupEndpoint can be used to receive bundles which are addressed to groups.
 
         full_group_uri examples:
             "dtn://news/~sport", "dtn://my-group/interesting/new/~topics"
 
-        Like the with unicast-endpoint (LocalEndpoint), an uri is matched in full.
-        There is no subgroup matching functionality.
+        full_group_uri pattern examples (see group_matching.py):
+            "dtn://news/~*"            -> any group directly below "dtn://news/"
+            "dtn://*/~alerts"          -> the "~alerts" group of any node name
+            "dtn://sensors/building1/" -> any uri below "dtn://sensors/building1/"
 
         receive_callback may be None, but then the endpoint should be regularly polled for new bundles.
+
+        zero_copy -> received payloads may be a memoryview instead of bytes, see deserialize_bundle(...)
         """
-        super().__init__(receive_callback)
+        super().__init__(receive_callback, zero_copy)
 
         self.full_group_uri = full_group_uri
 
@@ -149,6 +213,61 @@ class LocalGroupEndpoint(_LocalEndpoint):
         return self.full_group_uri
 
 
+class BundleTemplate:
+
+    def __init__(self, endpoint: LocalEndpoint, full_destination_uri: str, lifetime: int, anonymous: bool, priority: int, bundle_processing_control_flags: int):
+        """ The constant parts of the bundles from one endpoint to one destination.
+
+        The uris are parsed once on creation, each bundle only gets a new creation timestamp (from the endpoint) and
+        its payload. Bundles are handled as objects by the bpa and encoded per hop, so the blocks are not pre-encoded.
+        """
+        self.endpoint = endpoint
+        self.full_destination_uri = full_destination_uri
+        self.priority = priority
+        self.bundle_processing_control_flags = bundle_processing_control_flags
+
+        if full_destination_uri.startswith(URI_SCHEME_DTN_NAME):
+            anonymous_uri = 'dtn:{}'.format(NONE_ENDPOINT_SPECIFIC_PART_NAME)
+        else:
+            anonymous_uri = 'ipn:{}'.format(NONE_ENDPOINT_SPECIFIC_PART_NAME)
+
+        # the uri fields of this primary block are copied into the primary block of each bundle
+        self.primary_block = PrimaryBlock.from_objects(
+            full_destination_uri=full_destination_uri,
+            full_source_uri=anonymous_uri if anonymous else endpoint.full_endpoint_uri,
+            full_report_to_uri=anonymous_uri if anonymous else endpoint.bpa.full_node_uri,
+            lifetime=lifetime
+        )
+        self.primary_block.crc_type = CONFIGURATION.PRIMARY_BLOCK_CRC_TYPE
+
+    def create_bundle(self, payload: bytes) -> Bundle:
+        bundle_age_block = self.endpoint._next_creation_timestamp()
+        template = self.primary_block
+
+        primary_block = PrimaryBlock(
+            template.version,
+            BundleProcessingControlFlags(self.bundle_processing_control_flags),
+            template.crc_type,
+            template.destination_scheme,
+            template.destination_specific_part,
+            template.source_scheme,
+            template.source_specific_part,
+            template.report_to_scheme,
+            template.report_to_specific_part,
+            self.endpoint.last_bundle_creation_time,
+            self.endpoint.last_sequence_number,
+            template.lifetime
+        )
+
+        return Bundle(
+            primary_block=primary_block,
+            bundle_age_block=bundle_age_block,
+            hop_count_block=HopCountBlock.from_objects(hop_limit=32, hop_count=0),
+            payload_block=PayloadBlock.from_objects(data=payload),
+            other_blocks=[create_bundle_priority_block(self.priority)] if self.priority != BundlePriority.NORMAL else []
+        )
+
+
 class ExternalEndpoint:
 
     def __init__(self, dtn7rs_ip: str, endpoint_identifier: str):
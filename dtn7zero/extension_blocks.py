@@ -0,0 +1,154 @@
+"""
+dtn7zero specific extension blocks.
+
+The block type codes are taken from the experimental range (RFC 9171, 9.1 Bundle Block Types -> 192 to 255).
+Peers that do not know these blocks simply forward them, as the block processing control flags are left empty.
+
+Extension blocks are processed by handlers registered per block type (register_extension_block_handler(...)).
+Blocks without handler are unknown to the bpa: their block-type-specific data is never decoded, they are forwarded
+as they are (or discarded/deleted, as requested by their block processing control flags).
+"""
+from typing import Optional, Dict, Any
+
+from py_dtn7 import Bundle
+from py_dtn7.bundle import CanonicalBlock, BlockProcessingControlFlags
+
+try:
+    from cbor2 import dumps, loads
+except ImportError:
+    from cbor import dumps, loads
+
+
+BLOCK_TYPE_BUNDLE_PRIORITY = 192
+
+# the blocks defined by RFC 9171 are processed by the bpa itself (payload, previous node, bundle age, hop count)
+_BUNDLE_PROTOCOL_BLOCK_TYPES = (1, 6, 7, 10)
+
+
+class ExtensionBlockHandler:
+    """
+    processing of one extension block type, subclasses override the needed methods
+
+    decode            -> block-type-specific data (bytes) to value, raises an exception on malformed data
+    encode            -> value to block-type-specific data (bytes)
+    validate          -> called on bundle reception with the decoded value, False deletes the bundle for the reason
+                         "Block unintelligible"
+    update_on_forward -> called with the decoded value on the copy of the bundle that is forwarded (only if
+                         updates_on_forward is True), returns the new value or None if the block stays unchanged
+    """
+    updates_on_forward = False
+
+    def decode(self, data: bytes) -> Any:
+        return loads(data)
+
+    def encode(self, value: Any) -> bytes:
+        return dumps(value)
+
+    def validate(self, bundle: Bundle, value: Any) -> bool:
+        return True
+
+    def update_on_forward(self, full_node_uri: str, bundle: Bundle, value: Any) -> Any:
+        return None
+
+
+_EXTENSION_BLOCK_HANDLERS: Dict[int, ExtensionBlockHandler] = {}
+
+
+def register_extension_block_handler(block_type_code: int, handler: ExtensionBlockHandler):
+    if block_type_code in _BUNDLE_PROTOCOL_BLOCK_TYPES:
+        raise Exception('block type {} is processed by the bundle protocol agent'.format(block_type_code))
+
+    _EXTENSION_BLOCK_HANDLERS[block_type_code] = handler
+
+
+def unregister_extension_block_handler(block_type_code: int):
+    if block_type_code not in _EXTENSION_BLOCK_HANDLERS:
+        raise Exception('tried to unregister non-existent extension block handler {}'.format(block_type_code))
+
+    del _EXTENSION_BLOCK_HANDLERS[block_type_code]
+
+
+def get_extension_block_handler(block_type_code: int) -> Optional[ExtensionBlockHandler]:
+    return _EXTENSION_BLOCK_HANDLERS.get(block_type_code)
+
+
+def create_extension_block(block_type_code: int, value: Any, block_processing_control_flags: BlockProcessingControlFlags = None) -> CanonicalBlock:
+    handler = _EXTENSION_BLOCK_HANDLERS.get(block_type_code)
+
+    if handler is None:
+        raise Exception('no extension block handler registered for block type {}'.format(block_type_code))
+
+    return CanonicalBlock(
+        block_type_code=block_type_code,
+        block_number=1,  # will be overwritten on insertion into the bundle
+        block_processing_control_flags=block_processing_control_flags if block_processing_control_flags is not None else BlockProcessingControlFlags(0),
+        crc_type=0,
+        data=handler.encode(value)
+    )
+
+
+def update_extension_blocks_on_forward(full_node_uri: str, bundle: Bundle):
+    """ lets the handlers update their blocks in the copy of the bundle that is forwarded, see Router.prepare_bundle """
+    for block in bundle.other_blocks:
+        handler = _EXTENSION_BLOCK_HANDLERS.get(block.block_type_code)
+
+        if handler is None or not handler.updates_on_forward:
+            continue
+
+        value = handler.update_on_forward(full_node_uri, bundle, handler.decode(block.data))
+        if value is not None:
+            block.data = handler.encode(value)
+
+
+class BundlePriority:
+    """
+    priority classes, higher values are served first
+
+    BPv7 removed the class of service from the primary block, so it is carried in an extension block.
+    A bundle without that block is handled as NORMAL.
+    """
+    BULK = 0
+    NORMAL = 1
+    EXPEDITED = 2
+
+    ALL = (EXPEDITED, NORMAL, BULK)  # in serving order
+
+
+class _BundlePriorityBlockHandler(ExtensionBlockHandler):
+
+    def decode(self, data: bytes) -> int:
+        priority = loads(data)
+
+        # unknown (future) priority values are clamped into the known range
+        if not isinstance(priority, int):
+            return BundlePriority.NORMAL
+        return max(BundlePriority.BULK, min(BundlePriority.EXPEDITED, priority))
+
+
+register_extension_block_handler(BLOCK_TYPE_BUNDLE_PRIORITY, _BundlePriorityBlockHandler())
+
+
+def create_bundle_priority_block(priority: int) -> CanonicalBlock:
+    if priority not in BundlePriority.ALL:
+        raise ValueError('unknown bundle priority: {}'.format(priority))
+
+    return create_extension_block(BLOCK_TYPE_BUNDLE_PRIORITY, priority)
+
+
+def get_bundle_priority_block(bundle: Bundle) -> Optional[CanonicalBlock]:
+    for block in bundle.other_blocks:
+        if block.block_type_code == BLOCK_TYPE_BUNDLE_PRIORITY:
+            return block
+    return None
+
+
+def get_bundle_priority(bundle: Bundle) -> int:
+    block = get_bundle_priority_block(bundle)
+
+    if block is None:
+        return BundlePriority.NORMAL
+
+    try:
+        return _EXTENSION_BLOCK_HANDLERS[BLOCK_TYPE_BUNDLE_PRIORITY].decode(block.data)
+    except Exception:
+        return BundlePriority.NORMAL
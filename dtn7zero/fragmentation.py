@@ -0,0 +1,378 @@
+"""
+RFC 9171, 5.8 Bundle Fragmentation and 5.9 Application Data Unit Reassembly
+
+fragment_bundle          -> proactive fragmentation, splits a bundle into fragments that fit the mtu of a cla
+create_reactive_fragment -> reactive fragmentation, turns the received part of an interrupted transfer into a fragment
+Reassembler              -> reassembles the fragments of bundles destined for this node in bounded, preallocated
+                            buffers, large application data units are spilled to files (e.g. the flash of a
+                            microcontroller), see CONFIGURATION.FRAGMENTATION
+"""
+import os
+from typing import Dict, List, Optional
+
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.serialization import FragmentPrimaryBlock, FragmentBundle, copy_canonical_block, build_bundle, \
+    primary_block_from_block_data, canonical_block_from_block_data, read_cbor_argument, skip_cbor_item, \
+    verify_block_crc, serialize_bundle
+from dtn7zero.utility import get_current_clock_millis, is_timestamp_older_than_timeout, debug, warning
+from py_dtn7 import Bundle
+from py_dtn7.bundle import CanonicalBlock, PayloadBlock, BlockProcessingControlFlags
+
+try:
+    from cbor2 import loads
+except ImportError:
+    from cbor import loads
+
+
+# blocks needed for the per-hop processing of every fragment are always replicated (previous node, bundle age ->
+# mandatory if the creation time is zero, hop count), regardless of their "must be replicated" flag
+_PER_HOP_BLOCK_TYPES = (6, 7, 10)
+
+_CBOR_BREAK = 0xff
+_CBOR_INDEFINITE_ARRAY = 0x9f
+_CBOR_ARRAY_OF_5 = 0x85
+_CBOR_MAJOR_TYPE_BYTES = 2
+_CBOR_MAJOR_TYPE_ARRAY = 4
+
+# the spilled buffers are preallocated in chunks of this size
+_SPILL_CHUNK_SIZE = 512
+
+
+def _get_extension_blocks(bundle: Bundle) -> List[CanonicalBlock]:
+    blocks = [block for block in (bundle.previous_node_block, bundle.bundle_age_block, bundle.hop_count_block) if block is not None]
+    return blocks + list(bundle.other_blocks)
+
+
+def _byte_string_header_size(length: int) -> int:
+    if length < 24:
+        return 1
+    elif length < 0x100:
+        return 2
+    elif length < 0x10000:
+        return 3
+    elif length < 0x100000000:
+        return 5
+    return 9
+
+
+def _build_fragment(bundle: Bundle, fragment_offset: int, total_length: int, blocks: List[CanonicalBlock], payload_data: bytes) -> Bundle:
+    primary_block = FragmentPrimaryBlock.from_primary_block(bundle.primary_block, fragment_offset, total_length)
+    payload_block = PayloadBlock.from_objects(payload_data, BlockProcessingControlFlags(bundle.payload_block.block_processing_control_flags.flags))
+
+    return build_bundle(primary_block, [copy_canonical_block(block) for block in blocks] + [payload_block])
+
+
+def fragment_bundle(bundle: Bundle, max_serialized_size: int) -> Optional[List[Bundle]]:
+    """
+    splits the bundle into fragments with a serialized size of at most max_serialized_size bytes,
+    a fragment is split into fragments of its original bundle
+
+    returns None if the bundle must not be fragmented, or if not even the blocks fit into max_serialized_size
+    """
+    primary_block = bundle.primary_block
+
+    if primary_block.bundle_processing_control_flags.do_not_fragment:
+        return None
+
+    payload = bundle.payload_block.data
+
+    if isinstance(primary_block, FragmentPrimaryBlock):
+        base_offset, total_length = primary_block.fragment_offset, primary_block.total_application_data_unit_length
+    else:
+        base_offset, total_length = 0, len(payload)
+
+    """ RFC 9171, 5.8 Bundle Fragmentation
+    […] * If the fragmentary bundle is not a fragment or is the fragment with offset zero, then all extension blocks
+    of the fragmentary bundle MUST be replicated in the fragment whose offset is zero.
+    * Each of the fragmentary bundle's extension blocks whose "block must be replicated in every fragment" flag is set
+    to 1 MUST be replicated in every fragment. […]
+    """
+    all_blocks = _get_extension_blocks(bundle)
+    replicated_blocks = [block for block in all_blocks if block.block_processing_control_flags.block_must_be_replicated or block.block_type_code in _PER_HOP_BLOCK_TYPES]
+
+    fragments = []
+    offset = 0
+
+    while offset < len(payload):
+        blocks = all_blocks if offset == 0 else replicated_blocks
+
+        # the empty payload is encoded in one byte, the byte string header grows with the payload length
+        empty_size = len(serialize_bundle(_build_fragment(bundle, base_offset + offset, total_length, blocks, b'')))
+
+        length = min(len(payload) - offset, max_serialized_size - empty_size)
+        while length > 0 and empty_size - 1 + _byte_string_header_size(length) + length > max_serialized_size:
+            length -= 1
+
+        if length <= 0:
+            return None
+
+        fragments.append(_build_fragment(bundle, base_offset + offset, total_length, blocks, payload[offset:offset + length]))
+        offset += length
+
+    return fragments
+
+
+def create_reactive_fragment(partial_data: bytes) -> Optional[Bundle]:
+    """
+    RFC 9171, 5.8 -> reactive fragmentation of a bundle transfer interrupted after partial_data was received
+
+    returns the received part as fragment, or None if the blocks before the payload or the first payload byte are
+    missing (or the bundle must not be fragmented)
+    """
+    try:
+        return _create_reactive_fragment(partial_data)
+    except Exception as e:
+        debug('could not create reactive fragment from {} received bytes, error: {}'.format(len(partial_data), e))
+        return None
+
+
+def _load_verified_block(data: bytes, start: int, end: int, is_primary_block: bool) -> list:
+    block = loads(data[start:end])
+    crc_type = block[2] if is_primary_block else block[3]
+    if crc_type:
+        verify_block_crc(data, start, end, crc_type, block[-1])
+    return block
+
+
+def _create_reactive_fragment(partial_data: bytes) -> Optional[Bundle]:
+    if not partial_data or partial_data[0] >> 5 != _CBOR_MAJOR_TYPE_ARRAY:
+        return None
+
+    if partial_data[0] == _CBOR_INDEFINITE_ARRAY:
+        position = 1
+    else:
+        _, position = read_cbor_argument(partial_data, 0)
+
+    end = skip_cbor_item(partial_data, position)
+    primary_block = primary_block_from_block_data(_load_verified_block(partial_data, position, end, True))
+    position = end
+
+    if primary_block.bundle_processing_control_flags.do_not_fragment:
+        return None
+
+    # all complete blocks, the payload block is the last block and thereby the truncated one
+    blocks = []
+    while True:
+        if position < len(partial_data) and partial_data[position] == _CBOR_BREAK:
+            return None  # the bundle is complete
+
+        try:
+            end = skip_cbor_item(partial_data, position)
+        except IndexError:
+            break
+
+        blocks.append(canonical_block_from_block_data(_load_verified_block(partial_data, position, end, False)))
+        position = end
+
+    # truncated payload block -> [block type, block number, flags, crc type, data...
+    if partial_data[position] != _CBOR_ARRAY_OF_5:
+        return None  # no payload byte received or a crc (which covers the whole block)
+    position += 1
+
+    header = []
+    for _ in range(4):
+        end = skip_cbor_item(partial_data, position)
+        header.append(loads(partial_data[position:end]))
+        position = end
+
+    block_type_code, block_number, block_flags, crc_type = header
+    if block_type_code != 1 or crc_type != 0 or partial_data[position] >> 5 != _CBOR_MAJOR_TYPE_BYTES:
+        return None
+
+    length, position = read_cbor_argument(partial_data, position)
+    payload_data = partial_data[position:position + length]
+
+    if not payload_data:
+        return None
+
+    if not isinstance(primary_block, FragmentPrimaryBlock):
+        primary_block = FragmentPrimaryBlock.from_primary_block(primary_block, 0, length)
+
+    payload_block = PayloadBlock(1, block_number, BlockProcessingControlFlags(block_flags), 0, payload_data)
+
+    debug('created reactive fragment with {} of {} payload bytes'.format(len(payload_data), length))
+    return build_bundle(primary_block, blocks + [payload_block])
+
+
+class _ReassemblyBuffer:
+
+    def __init__(self, total_length: int, spill_path: Optional[str] = None):
+        """
+        preallocated buffer for one application data unit, in memory or in the file at spill_path
+        """
+        self.total_length = total_length
+        self.spill_path = spill_path
+
+        # sorted and merged [start, end) offset ranges of the received data
+        self.ranges: List[List[int]] = []
+
+        # the extension blocks of the bundle only arrive (complete) with the fragment at offset zero
+        self.first_fragment_blocks: Optional[List[CanonicalBlock]] = None
+        self.payload_block_flags = 0
+
+        self.last_activity = get_current_clock_millis()
+
+        if spill_path is None:
+            self.data = bytearray(total_length)
+            self.file = None
+        else:
+            self.data = None
+            self.file = open(spill_path, 'w+b')
+
+            zeros = bytes(min(total_length, _SPILL_CHUNK_SIZE))
+            remaining = total_length
+            while remaining > len(zeros):
+                self.file.write(zeros)
+                remaining -= len(zeros)
+            self.file.write(zeros[:remaining])
+
+    def write(self, offset: int, data: bytes):
+        if self.file is None:
+            self.data[offset:offset + len(data)] = data
+        else:
+            self.file.seek(offset)
+            self.file.write(data)
+
+        self._add_range(offset, offset + len(data))
+        self.last_activity = get_current_clock_millis()
+
+    def _add_range(self, start: int, end: int):
+        ranges = []
+
+        for received_range in self.ranges:
+            if received_range[1] < start or received_range[0] > end:
+                ranges.append(received_range)
+            else:
+                # overlapping or adjacent -> merge into the new range
+                start = min(start, received_range[0])
+                end = max(end, received_range[1])
+
+        ranges.append([start, end])
+        ranges.sort()
+        self.ranges = ranges
+
+    @property
+    def is_complete(self) -> bool:
+        return self.first_fragment_blocks is not None and self.ranges == [[0, self.total_length]]
+
+    def read(self) -> bytes:
+        if self.file is None:
+            return bytes(self.data)
+
+        self.file.seek(0)
+        return self.file.read(self.total_length)
+
+    def close(self):
+        self.data = None
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+
+
+class Reassembler:
+
+    def __init__(self):
+        self.buffers: Dict[str, _ReassemblyBuffer] = {}  # original bundle id -> reassembly buffer
+        self.memory_bytes = 0
+        self.spill_counter = 0
+
+    def add(self, fragment: FragmentBundle) -> Optional[Bundle]:
+        """ RFC 9171, 5.9 Application Data Unit Reassembly
+
+        returns the reassembled bundle if the fragment completed it, None otherwise
+        """
+        self._drop_expired()
+
+        primary_block = fragment.primary_block
+        bundle_id = fragment.original_bundle_id
+        offset, data = primary_block.fragment_offset, fragment.payload_block.data
+
+        buffer = self.buffers.get(bundle_id)
+
+        if buffer is None:
+            buffer = self._create_buffer(bundle_id, primary_block.total_application_data_unit_length)
+            if buffer is None:
+                return None
+
+        if primary_block.total_application_data_unit_length != buffer.total_length or offset + len(data) > buffer.total_length:
+            warning('fragment does not match the application data unit length, ignoring fragment: {}'.format(fragment.bundle_id))
+            return None
+
+        buffer.write(offset, data)
+
+        if offset == 0 and buffer.first_fragment_blocks is None:
+            buffer.first_fragment_blocks = [copy_canonical_block(block) for block in _get_extension_blocks(fragment)]
+            buffer.payload_block_flags = fragment.payload_block.block_processing_control_flags.flags
+
+        if not buffer.is_complete:
+            return None
+
+        """ RFC 9171, 5.9 Application Data Unit Reassembly
+        […] If the concatenation -- as informed by fragment offsets and payload lengths -- of the payloads of all
+        previously received fragments with the same source node ID and creation timestamp as this fragment, together
+        with the payload of this fragment, forms a byte array whose length is equal to the total application data unit
+        length in the fragment's primary block, then:
+
+        * This byte array -- the reassembled application data unit -- MUST replace the payload of this fragment.
+        * The BPA MUST delete from the node's storage all previously received fragments […]
+        """
+        payload = buffer.read()
+        first_fragment_blocks, payload_block_flags = buffer.first_fragment_blocks, buffer.payload_block_flags
+        self._remove(bundle_id)
+
+        debug('reassembled bundle {} from fragments'.format(bundle_id))
+
+        payload_block = PayloadBlock.from_objects(payload, BlockProcessingControlFlags(payload_block_flags))
+        return Bundle(primary_block.to_whole_primary_block(), other_blocks=first_fragment_blocks + [payload_block])
+
+    def _create_buffer(self, bundle_id: str, total_length: int) -> Optional[_ReassemblyBuffer]:
+        if total_length > CONFIGURATION.FRAGMENTATION.MAX_APPLICATION_DATA_UNIT_BYTES:
+            warning('application data unit of bundle {} is too large to reassemble: {} bytes'.format(bundle_id, total_length))
+            return None
+
+        if len(self.buffers) >= CONFIGURATION.FRAGMENTATION.MAX_REASSEMBLY_BUFFERS:
+            oldest_bundle_id = min(self.buffers, key=lambda key: self.buffers[key].last_activity)
+            debug('dropping the incomplete reassembly of bundle {}'.format(oldest_bundle_id))
+            self._remove(oldest_bundle_id)
+
+        if self.memory_bytes + total_length <= CONFIGURATION.FRAGMENTATION.MAX_REASSEMBLY_MEMORY_BYTES:
+            buffer = _ReassemblyBuffer(total_length)
+            self.memory_bytes += total_length
+        elif CONFIGURATION.FRAGMENTATION.SPILL_DIRECTORY is not None:
+            try:
+                os.mkdir(CONFIGURATION.FRAGMENTATION.SPILL_DIRECTORY)
+            except OSError:
+                pass  # already exists
+
+            self.spill_counter += 1
+            spill_path = '{}/{}.bin'.format(CONFIGURATION.FRAGMENTATION.SPILL_DIRECTORY, self.spill_counter)
+
+            try:
+                buffer = _ReassemblyBuffer(total_length, spill_path)
+            except OSError as e:
+                warning('cannot spill the reassembly of bundle {} to {}, error: {}'.format(bundle_id, spill_path, e))
+                return None
+        else:
+            warning('not enough reassembly memory for bundle {} ({} bytes), ignoring fragment'.format(bundle_id, total_length))
+            return None
+
+        self.buffers[bundle_id] = buffer
+        return buffer
+
+    def _remove(self, bundle_id: str):
+        buffer = self.buffers.pop(bundle_id)
+
+        if buffer.spill_path is None:
+            self.memory_bytes -= buffer.total_length
+        buffer.close()
+
+    def _drop_expired(self):
+        for bundle_id, buffer in tuple(self.buffers.items()):
+            if is_timestamp_older_than_timeout(buffer.last_activity, CONFIGURATION.FRAGMENTATION.REASSEMBLY_TIMEOUT_MILLISECONDS):
+                debug('reassembly of bundle {} timed out'.format(bundle_id))
+                self._remove(bundle_id)
@@ -0,0 +1,138 @@
+"""
+Hierarchical group endpoint matching.
+
+Group registrations are stored in a trie over the uri segments ("dtn://news/~sport" -> "news", "~sport"), so the
+matching of a destination uri takes O(path length) steps, independent of the number of registrations.
+
+group uri patterns:
+    "dtn://news/~sport"        -> exact match
+    "dtn://news/~*"            -> "~*" matches any one group segment ("dtn://news/~sport", "dtn://news/~weather")
+    "dtn://*/~alerts"          -> "*" matches any one segment ("dtn://city1/~alerts", "dtn://city2/~alerts")
+    "dtn://sensors/building1/" -> trailing "/" matches all uris below the prefix ("dtn://sensors/building1/~temp",
+                                  "dtn://sensors/building1/floor2/~humidity")
+
+GroupEndpointTrie -> registration and matching of group endpoints
+"""
+from typing import List, Any
+
+_DTN_URI_PREFIX = 'dtn://'
+
+_ANY_SEGMENT = '*'
+_ANY_GROUP_SEGMENT = '~*'
+
+
+class _TrieNode:
+
+    def __init__(self):
+        self.children = {}
+        # endpoints registered on exactly this uri (pattern)
+        self.endpoints = []
+        # endpoints registered on this uri prefix (pattern ending with "/")
+        self.prefix_endpoints = []
+
+
+def _split_uri(full_uri: str) -> List[str]:
+    return full_uri[len(_DTN_URI_PREFIX):].split('/')
+
+
+class GroupEndpointTrie:
+
+    def __init__(self):
+        self.root = _TrieNode()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def insert(self, full_group_uri: str, endpoint: Any):
+        segments = _split_uri(full_group_uri)
+        is_prefix = segments[-1] == ''
+
+        if is_prefix:
+            segments.pop()
+
+        node = self.root
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                child = _TrieNode()
+                node.children[segment] = child
+            node = child
+
+        if is_prefix:
+            node.prefix_endpoints.append(endpoint)
+        else:
+            node.endpoints.append(endpoint)
+        self.size += 1
+
+    def remove(self, full_group_uri: str, endpoint: Any) -> bool:
+        """ returns False if the endpoint is not registered on the group uri """
+        segments = _split_uri(full_group_uri)
+        is_prefix = segments[-1] == ''
+
+        if is_prefix:
+            segments.pop()
+
+        path = [self.root]
+        for segment in segments:
+            child = path[-1].children.get(segment)
+            if child is None:
+                return False
+            path.append(child)
+
+        try:
+            if is_prefix:
+                path[-1].prefix_endpoints.remove(endpoint)
+            else:
+                path[-1].endpoints.remove(endpoint)
+        except ValueError:
+            return False
+        self.size -= 1
+
+        # prune the branch of empty nodes, to keep the trie as small as the set of registrations
+        for idx in range(len(segments), 0, -1):
+            node = path[idx]
+            if node.children or node.endpoints or node.prefix_endpoints:
+                break
+            del path[idx - 1].children[segments[idx - 1]]
+
+        return True
+
+    def match(self, full_destination_uri: str) -> List[Any]:
+        """ returns all endpoints with a group uri (pattern) matching the destination uri """
+        if not self.size or not full_destination_uri.startswith(_DTN_URI_PREFIX):
+            return []
+
+        segments = _split_uri(full_destination_uri)
+        last_idx = len(segments)
+        matches = []
+
+        # depth-first over all branches matching the segments so far, wildcards open additional branches
+        stack = [(self.root, 0)]
+        while stack:
+            node, idx = stack.pop()
+
+            if idx == last_idx:
+                matches.extend(node.endpoints)
+                continue
+
+            if node.prefix_endpoints:
+                matches.extend(node.prefix_endpoints)
+
+            segment = segments[idx]
+
+            child = node.children.get(segment)
+            if child is not None:
+                stack.append((child, idx + 1))
+
+            if segment != _ANY_SEGMENT:
+                child = node.children.get(_ANY_SEGMENT)
+                if child is not None:
+                    stack.append((child, idx + 1))
+
+            if segment.startswith('~') and segment != _ANY_GROUP_SEGMENT:
+                child = node.children.get(_ANY_GROUP_SEGMENT)
+                if child is not None:
+                    stack.append((child, idx + 1))
+
+        return matches
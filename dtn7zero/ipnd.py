@@ -174,7 +174,10 @@ class IPND:
     todo: extend functionality to support IPv6
     todo: extend functionality to delete nodes after a beacon timeout
     """
-    def __init__(self, eid_scheme: int, eid_specific_part: str, storage: Storage):
+    def __init__(self, eid_scheme: int, eid_specific_part: str, storage: Storage, services: Optional[List[Tuple[str, int]]] = None):
+        """
+        services -> the (cla identifier, port) announced in the service block, defaults to the mtcp cla
+        """
         self.storage = storage
 
         # todo: check dynamically for new networks -> also test with changing networks
@@ -205,60 +208,78 @@ class IPND:
             beacon_sequence_number=0,
             eid_scheme=eid_scheme,
             eid_specific_part=eid_specific_part,
-            service_block=([(CONFIGURATION.IPND.IDENTIFIER_MTCP, CONFIGURATION.PORT.MTCP)], {})  # todo: extend for all and active clas'
+            service_block=([(CONFIGURATION.IPND.IDENTIFIER_MTCP, CONFIGURATION.PORT.MTCP)] if services is None else list(services), {})
         )
 
         self.last_beacon_broadcast = 0
 
     def update(self):
-        if not CONFIGURATION.IPND.ENABLED:
+        if not self.check_enabled():
             return
+
+        self.receive_beacon()
+        self.broadcast_beacon_if_due()
+
+    def check_enabled(self) -> bool:
+        if not CONFIGURATION.IPND.ENABLED:
+            return False
         elif not self._was_enabled_once:
             self._was_enabled_once = True
             self.sock.bind(('', 3003))
+        return True
 
+    def receive_beacon(self) -> bool:
+        """
+        receives and processes at most one beacon, returns False if no datagram was waiting
+        """
         try:
             # todo: for now it seems one full datagram is returned here, as long as the datagram is smaller than bytes-trying-to-receive
             raw_data, (address, port) = self.sock.recvfrom(CONFIGURATION.IPND.BEACON_MAX_SIZE)
         except OSError:
-            pass
+            return False
         except MemoryError:
             warning('MEMORY ERROR DURING BEACON RECEIVE, PASS')
+            return True
+
+        self.process_beacon(raw_data, address)
+        return True
+
+    def process_beacon(self, raw_data: bytes, address: str):
+        try:
+            # eid_scheme, eid_specific_part, clas, services = extract_beacon_information_from(raw_data)
+            beacon = Beacon.from_cbor(raw_data)
+        except Exception as e:
+            warning('could not decode beacon. error: {}'.format(e))
         else:
-            try:
-                # eid_scheme, eid_specific_part, clas, services = extract_beacon_information_from(raw_data)
-                beacon = Beacon.from_cbor(raw_data)
-            except Exception as e:
-                warning('could not decode beacon. error: {}'.format(e))
-            else:
-                if address not in self.own_addresses:
-                    existing_node = self.storage.get_node(address)
-
-                    if existing_node is None:
-                        debug('received beacon from new node: {}, {}'.format(address, beacon))
-
-                        new_node = Node(address, (beacon.eid_scheme, beacon.eid_specific_part), dict(beacon.service_block[0]), beacon.beacon_sequence_number)
-                        self.storage.add_node(new_node)
-
-                        sequence_number_matches = False
-                    else:
-                        debug('received beacon from known node: {}, {}'.format(address, beacon))
-                        # existing_node.merge_new_info(eid_scheme, eid_specific_part, dict(clas))
-                        existing_node.merge_new_info(beacon.eid_scheme, beacon.eid_specific_part, dict(beacon.service_block[0]))
-
-                        sequence_number_matches = existing_node.advance_sequence_number(beacon.beacon_sequence_number)
-
-                    if not sequence_number_matches:
-                        # send back a uni-cast beacon to a previously unknown node for faster knowledge spread
-                        # ideal case: it never received a beacon from us -> current state (sequence number) is new to the node
-                        # not ideal case: beacons were exchanged concurrently -> state (sequence number) is duplicate, which is unspecified and ideally ignored
-                        # dtn7zero specific detail: we add unicast information to the beacon, so there is no second unicast beacon sent back to us
-
-                        if not (42 in beacon.service_block[1] and beacon.service_block[1][42] == b'unicast'):
-                            self.own_beacon.service_block[1][42] = b'unicast'
-                            self.send_own_beacon_to(address)
-                            del self.own_beacon.service_block[1][42]
+            if address not in self.own_addresses:
+                existing_node = self.storage.get_node(address)
 
+                if existing_node is None:
+                    debug('received beacon from new node: {}, {}'.format(address, beacon))
+
+                    new_node = Node(address, (beacon.eid_scheme, beacon.eid_specific_part), dict(beacon.service_block[0]), beacon.beacon_sequence_number)
+                    self.storage.add_node(new_node)
+
+                    sequence_number_matches = False
+                else:
+                    debug('received beacon from known node: {}, {}'.format(address, beacon))
+                    # existing_node.merge_new_info(eid_scheme, eid_specific_part, dict(clas))
+                    existing_node.merge_new_info(beacon.eid_scheme, beacon.eid_specific_part, dict(beacon.service_block[0]))
+
+                    sequence_number_matches = existing_node.advance_sequence_number(beacon.beacon_sequence_number)
+
+                if not sequence_number_matches:
+                    # send back a uni-cast beacon to a previously unknown node for faster knowledge spread
+                    # ideal case: it never received a beacon from us -> current state (sequence number) is new to the node
+                    # not ideal case: beacons were exchanged concurrently -> state (sequence number) is duplicate, which is unspecified and ideally ignored
+                    # dtn7zero specific detail: we add unicast information to the beacon, so there is no second unicast beacon sent back to us
+
+                    if not (42 in beacon.service_block[1] and beacon.service_block[1][42] == b'unicast'):
+                        self.own_beacon.service_block[1][42] = b'unicast'
+                        self.send_own_beacon_to(address)
+                        del self.own_beacon.service_block[1][42]
+
+    def broadcast_beacon_if_due(self):
         if is_timestamp_older_than_timeout(self.last_beacon_broadcast, CONFIGURATION.IPND.SEND_INTERVAL_MILLISECONDS):
             # Increase before sending because it might happen that a unicast-reply with that number was already sent
             self.own_beacon.increment_beacon_sequence_number_by_one()
@@ -266,6 +287,14 @@ class IPND:
                 self.send_own_beacon_to(address)
             self.last_beacon_broadcast = get_current_clock_millis()
 
+    def milliseconds_until_next_beacon(self) -> Optional[int]:
+        """
+        returns the time until the next beacon broadcast is due, or None if discovery is disabled
+        """
+        if not CONFIGURATION.IPND.ENABLED:
+            return None
+        return max(0, CONFIGURATION.IPND.SEND_INTERVAL_MILLISECONDS - (get_current_clock_millis() - self.last_beacon_broadcast))
+
     def send_own_beacon_to(self, address: str):
         message = self.own_beacon.to_cbor()
 
@@ -0,0 +1,183 @@
+"""
+Optional multi-stage threaded pipeline for the bundle protocol agent (CPython only).
+
+receive stage    -> one thread polling the clas (receive + cbor decoding) and ipnd, blocks on the sockets when idle
+processing stage -> the thread calling update(), runs bundle reception, dispatching and local delivery
+forwarding stage -> CONFIGURATION.PIPELINE.FORWARDING_WORKERS threads sending bundles over the clas
+
+The stages are connected by bounded queues, a full queue blocks the previous stage (backpressure).
+The storage (including the node table) is wrapped in a LockedStorage.
+
+The clas must allow concurrent send_to calls from the forwarding workers, the mtcp cla does (a pooled connection
+is used by one send at a time). The forwarding workers send synchronously (no outbound buffers, see Router.async_send).
+"""
+import queue
+import threading
+from typing import Set
+
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.data import BundleInformation
+from dtn7zero.routers import Router
+from dtn7zero.storage import Storage
+from dtn7zero.storage.locked_storage import LockedStorage
+from dtn7zero.utility import get_current_clock_millis, warning
+
+if RUNNING_MICROPYTHON:
+    raise ImportError('the pipelined bundle protocol agent is not supported on micropython')
+
+
+# how often blocked stages check whether the pipeline was stopped
+_STOP_CHECK_SECONDS = 0.1
+
+
+class PipelinedBundleProtocolAgent(BundleProtocolAgent):
+
+    def __init__(self, full_node_uri: str, storage: Storage, router: Router, poll_interval_milliseconds: int = 10):
+        """ see BundleProtocolAgent, the receive and forwarding stages run after start() was called
+
+        poll_interval_milliseconds -> upper bound for the idle wait of the receive stage if a cla cannot signal new
+                                      bundles via sockets (pull based clas, espnow, lora)
+        """
+        locked_storage = LockedStorage(storage)
+
+        # the router shares the storage and must go through the same lock
+        if getattr(router, 'storage', None) is storage:
+            router.storage = locked_storage
+
+        # the sent callbacks of asynchronous sends would update the forwarding ledgers from the receive stage
+        router.async_send = False
+
+        super().__init__(full_node_uri, locked_storage, router)
+
+        self.poll_interval_milliseconds = poll_interval_milliseconds
+
+        self.reception_queue: queue.Queue = queue.Queue(CONFIGURATION.PIPELINE.QUEUE_SIZE)
+        self.forwarding_queue: queue.Queue = queue.Queue(CONFIGURATION.PIPELINE.QUEUE_SIZE)
+
+        # bundles that are queued or sent by a forwarding worker are not dispatched a second time by a retry sweep
+        self.bundles_in_forwarding: Set[str] = set()
+        self.bundles_in_forwarding_lock = threading.Lock()
+
+        self.work_available = threading.Event()
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        if self.running:
+            raise Exception('PipelinedBundleProtocolAgent.start() should only be called once!')
+
+        self.running = True
+        self.threads.append(threading.Thread(target=self._run_receive_stage, name='dtn7zero-receive', daemon=True))
+        for idx in range(CONFIGURATION.PIPELINE.FORWARDING_WORKERS):
+            self.threads.append(threading.Thread(target=self._run_forwarding_stage, name='dtn7zero-forward-{}'.format(idx), daemon=True))
+
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        self.work_available.set()
+
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def wakeup(self):
+        self.work_available.set()
+
+    def wait(self, max_wait_milliseconds: int = None, poll_interval_milliseconds: int = 10):
+        """ blocks until the receive stage or an endpoint queued a bundle, or the next storage retry sweep (or status report batch) is due """
+        timeout = CONFIGURATION.STORAGE_RETRY_INTERVAL_MILLISECONDS - (get_current_clock_millis() - self.last_storage_retry_sweep)
+        batch_timeout = self.status_reports.milliseconds_until_next_batch()
+        if batch_timeout is not None:
+            timeout = min(timeout, batch_timeout)
+        if max_wait_milliseconds is not None:
+            timeout = min(timeout, max_wait_milliseconds)
+
+        # cleared before the queue checks, so a bundle queued in between still ends the wait
+        self.work_available.clear()
+
+        if timeout <= 0 or self.local_bundle_dispatch_queue or not self.reception_queue.empty():
+            return
+
+        self.work_available.wait(timeout / 1000)
+
+    def _update_discovery(self):
+        pass  # the receive stage handles ipnd
+
+    def _process_remote_bundle(self) -> bool:
+        try:
+            bundle_information = self.reception_queue.get_nowait()
+        except queue.Empty:
+            return False
+
+        self.bundle_reception(bundle_information)
+        return True
+
+    def bundle_forwarding(self, bundle_information: BundleInformation):
+        bundle_id = bundle_information.bundle.bundle_id
+
+        with self.bundles_in_forwarding_lock:
+            if bundle_id in self.bundles_in_forwarding:
+                return
+            self.bundles_in_forwarding.add(bundle_id)
+
+        while self.running:
+            try:
+                self.forwarding_queue.put(bundle_information, timeout=_STOP_CHECK_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+        # not started (or stopped) -> forward in the processing stage
+        try:
+            super().bundle_forwarding(bundle_information)
+        finally:
+            self._forwarding_done(bundle_id)
+
+    def _forwarding_done(self, bundle_id: str):
+        with self.bundles_in_forwarding_lock:
+            self.bundles_in_forwarding.discard(bundle_id)
+
+    def _run_forwarding_stage(self):
+        while self.running:
+            try:
+                bundle_information = self.forwarding_queue.get(timeout=_STOP_CHECK_SECONDS)
+            except queue.Empty:
+                continue
+
+            try:
+                super().bundle_forwarding(bundle_information)
+            except Exception as e:
+                warning('error in forwarding stage, bundle: {}, error: {}'.format(bundle_information.bundle.bundle_id, e))
+            finally:
+                self._forwarding_done(bundle_information.bundle.bundle_id)
+
+    def _run_receive_stage(self):
+        while self.running:
+            self.ipnd.update()
+
+            received = False
+            for bundle_information in self.router.generator_poll_bundles():
+                received = True
+                while self.running:
+                    try:
+                        self.reception_queue.put(bundle_information, timeout=_STOP_CHECK_SECONDS)
+                        break
+                    except queue.Full:
+                        self.work_available.set()
+                self.work_available.set()
+
+                if not self.running:
+                    return
+
+            if received:
+                continue
+
+            timeout = self.ipnd.milliseconds_until_next_beacon()
+            if timeout is None:
+                timeout = CONFIGURATION.IPND.SEND_INTERVAL_MILLISECONDS
+            if not self.poller_covers_all_clas:
+                timeout = min(timeout, self.poll_interval_milliseconds)
+            self.poller.poll(min(timeout, _STOP_CHECK_SECONDS * 1000))
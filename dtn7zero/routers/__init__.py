@@ -1,16 +1,23 @@
 import time
 from abc import ABC
-from typing import Iterable
+from typing import Iterable, List, Optional, Tuple
 
 from dtn7zero.configuration import CONFIGURATION
 from dtn7zero.data import BundleInformation
+from dtn7zero.fragmentation import fragment_bundle
+from dtn7zero.extension_blocks import update_extension_blocks_on_forward
+from dtn7zero.serialization import serialize_bundle, build_bundle, copy_canonical_block
+from dtn7zero.utility import SocketPoller
 from py_dtn7 import Bundle
 from py_dtn7.bundle import PreviousNodeBlock, BlockProcessingControlFlags
 
 
 class Router(ABC):
+    # hand unfragmented bundles to clas with outbound buffers (send_to_async), the forwarding ledger of the bundle is
+    # updated on completion -> disabled by the pipeline, its forwarding workers send synchronously
+    async_send: bool = True
 
-    def prepare_and_serialize_bundle(self, full_node_uri: str, bundle_information: BundleInformation) -> bytes:
+    def prepare_bundle(self, full_node_uri: str, bundle_information: BundleInformation) -> Bundle:
         """ RFC 9171, 5.4 Bundle Forwarding
         […]
         Step 4: For each node selected for forwarding, the BPA MUST invoke the services of the selected CLA(s) in order
@@ -28,11 +35,14 @@ class Router(ABC):
         the source of the bundle, created).
         """
 
-        # copy bundle to not alter the storage instance
-        bundle = Bundle.from_cbor(bundle_information.bundle.to_cbor())
-
-        if bundle.previous_node_block:
-            bundle.remove_block(bundle.previous_node_block)
+        # copy bundle to not alter the storage instance, the primary block and the block data are shared
+        # (the data of unknown extension blocks is never decoded and re-encoded)
+        original_bundle = bundle_information.bundle
+        bundle = build_bundle(original_bundle.primary_block, [copy_canonical_block(block) for block in (
+            original_bundle.bundle_age_block,
+            original_bundle.hop_count_block,
+            original_bundle.payload_block
+        ) + tuple(original_bundle.other_blocks) if block is not None])
 
         if CONFIGURATION.ATTACH_PREVIOUS_NODE_BLOCK:
             flags = BlockProcessingControlFlags(0)
@@ -52,7 +62,23 @@ class Router(ABC):
         if bundle.hop_count_block:
             bundle.hop_count_block.hop_count += 1
 
-        return bundle.to_cbor()
+        update_extension_blocks_on_forward(full_node_uri, bundle)
+
+        return bundle
+
+    def prepare_and_serialize_bundle(self, full_node_uri: str, bundle_information: BundleInformation) -> bytes:
+        return serialize_bundle(self.prepare_bundle(full_node_uri, bundle_information))
+
+    def prepare_and_serialize_fragments(self, full_node_uri: str, bundle_information: BundleInformation, mtu: int) -> Optional[List[bytes]]:
+        """ RFC 9171, 5.8 Bundle Fragmentation (proactive)
+
+        returns the serialized fragments of the prepared bundle that fit the mtu, None if the bundle cannot be fragmented
+        """
+        fragments = fragment_bundle(self.prepare_bundle(full_node_uri, bundle_information), mtu)
+
+        if fragments is None:
+            return None
+        return [serialize_bundle(fragment) for fragment in fragments]
 
     def generator_poll_bundles(self) -> Iterable[BundleInformation]:
         raise NotImplementedError('do not instantiate Router class directly')
@@ -62,3 +88,24 @@ class Router(ABC):
 
     def send_to_previous_node(self, full_node_uri: str, bundle_information: BundleInformation) -> bool:
         raise NotImplementedError('do not instantiate Router class directly')
+
+    def forget_bundle(self, bundle_id: str):
+        """
+        optional: called once a bundle left the storage (forwarded, delivered, deleted or expired), drops the per-bundle
+        state of the router
+        """
+        pass
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        """
+        optional: register the sockets of all clas with the poller
+
+        returns False if at least one cla must still be polled periodically
+        """
+        return False
+
+    def get_ipnd_services(self) -> List[Tuple[str, int]]:
+        """
+        optional: the (cla identifier, port) of all clas to be announced in the ipnd service block
+        """
+        return []
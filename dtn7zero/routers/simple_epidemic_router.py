@@ -1,11 +1,12 @@
-from typing import Dict, Iterable, Union
+from typing import Dict, Iterable, Union, List, Optional, Tuple
 
+from dtn7zero.broadcast_scheduler import BroadcastScheduler
 from dtn7zero.configuration import CONFIGURATION
 from dtn7zero.convergence_layer_adapters import PullBasedCLA, PushBasedCLA
 from dtn7zero.data import BundleInformation, Node, BundleStatusReportReasonCodes
 from dtn7zero.routers import Router
 from dtn7zero.storage import Storage
-from dtn7zero.utility import warning
+from dtn7zero.utility import warning, SocketPoller
 
 
 class SimpleEpidemicRouter(Router):
@@ -14,32 +15,42 @@ class SimpleEpidemicRouter(Router):
         self.clas = convergence_layer_adapters
         self.storage = storage
 
+        # the espnow and rf95_lora clas broadcast, their rebroadcasts are paced per bundle
+        self.broadcast_schedulers: Dict[str, BroadcastScheduler] = {
+            cla_id: BroadcastScheduler() for cla_id in (CONFIGURATION.IPND.IDENTIFIER_ESPNOW, CONFIGURATION.IPND.IDENTIFIER_RF95_LORA)
+        }
+
     def generator_poll_bundles(self) -> Iterable[BundleInformation]:
-        for cla in self.clas.values():
+        for cla_id, cla in self.clas.items():
             if isinstance(cla, PullBasedCLA):
                 for node in self.storage.get_nodes():
                     for bundle_information in self._generator_poll_pull_based(node, cla):
                         yield bundle_information
 
             if isinstance(cla, PushBasedCLA):
-                for bundle_information in self._generator_poll_push_based(cla):
+                for bundle_information in self._generator_poll_push_based(cla_id, cla):
                     yield bundle_information
 
-    def _generator_poll_push_based(self, cla: PushBasedCLA):
-        # push based clas send/receive whole bundles
-        bundle, node_address = cla.poll()
-        while bundle is not None:
-            if not self.storage.was_seen(bundle.bundle_id):
-                self.storage.store_seen(bundle.bundle_id, node_address)
+    def _generator_poll_push_based(self, cla_id: str, cla: PushBasedCLA):
+        # push based clas send/receive whole bundles, they are drained in batches
+        bundles = cla.poll_many(CONFIGURATION.POLL_MAX_ITEMS, CONFIGURATION.POLL_MAX_BYTES)
+        while bundles:
+            for bundle, node_address in bundles:
+                if self.storage.was_seen(bundle.bundle_id):
+                    if cla_id in self.broadcast_schedulers:
+                        # a neighbor (re-)broadcast a bundle we know -> trickle suppression of our own rebroadcast
+                        self.broadcast_schedulers[cla_id].heard_duplicate(bundle.bundle_id)
+                else:
+                    self.storage.store_seen(bundle.bundle_id, node_address)
 
-                bundle_information = BundleInformation(bundle)
+                    bundle_information = BundleInformation(bundle)
 
-                node = self.storage.get_node(node_address)
-                if node is not None:  # if node is known, prevent the bundle from being sent back to that same node
-                    bundle_information.forwarded_to_nodes.append(node)
+                    node = self.storage.get_node(node_address)
+                    if node is not None:  # if node is known, prevent the bundle from being sent back to that same node
+                        bundle_information.mark_forwarded_to(node)
 
-                yield bundle_information
-            bundle, node_address = cla.poll()
+                    yield bundle_information
+            bundles = cla.poll_many(CONFIGURATION.POLL_MAX_ITEMS, CONFIGURATION.POLL_MAX_BYTES)
 
     def _generator_poll_pull_based(self, node: Node, cla: PullBasedCLA):
         # pull based clas can pull bundle-ids first, before pulling specific bundles
@@ -55,43 +66,53 @@ class SimpleEpidemicRouter(Router):
 
                     node = self.storage.get_node(node_polled_address)
                     if node is not None:  # if node is known, prevent the bundle from being sent back to that same node
-                        bundle_information.forwarded_to_nodes.append(node)
+                        bundle_information.mark_forwarded_to(node)
 
                     yield bundle_information
                     break
 
     def immediate_forwarding_attempt(self, full_node_uri: str, bundle_information: BundleInformation) -> (bool, int):
         serialized_bundle: bytes = self.prepare_and_serialize_bundle(full_node_uri, bundle_information)
+        serialized_fragments: Dict[int, Optional[List[bytes]]] = {}  # mtu -> fragments, created once per mtu
 
         reason = BundleStatusReportReasonCodes.NO_TIMELY_CONTACT_WITH_NEXT_NODE_ON_ROUTE
 
-        for node in self.storage.get_nodes():
-            if node in bundle_information.forwarded_to_nodes:
+        # prefer fast and reliable neighbors
+        for node in sorted(self.storage.get_nodes(), key=lambda n: -n.link_score):
+            if bundle_information.was_forwarded_to(node) or bundle_information.is_forwarding_to(node):
                 continue
 
-            for cla_id, cla in self.clas.items():
-                if cla_id in (CONFIGURATION.IPND.IDENTIFIER_ESPNOW, CONFIGURATION.IPND.IDENTIFIER_RF95_LORA):
+            for cla_id in self._get_cla_ids_by_link_quality(node):
+                if node.get_link_quality(cla_id).is_backed_off():
+                    reason = BundleStatusReportReasonCodes.TRAFFIC_PARED
                     continue
 
-                success = cla.send_to(node, serialized_bundle)
-                if success:
-                    bundle_information.forwarded_to_nodes.append(node)
+                if self.async_send and self._send_to_async(self.clas[cla_id], node, serialized_bundle, bundle_information):
+                    break  # the node counts as forwarded to once the transmission completed (retried by the storage)
+
+                if self._send_to(self.clas[cla_id], node, serialized_bundle, serialized_fragments, full_node_uri, bundle_information):
+                    bundle_information.mark_forwarded_to(node)
+                    break  # one cla per node is enough
                 else:
                     reason = BundleStatusReportReasonCodes.TRAFFIC_PARED
 
         # the espnow and rf95_lora clas are special because they broadcast the bundle
         # we get no information about how many nodes have received the bundle
-        if CONFIGURATION.IPND.IDENTIFIER_ESPNOW in self.clas:
-            self.clas[CONFIGURATION.IPND.IDENTIFIER_ESPNOW].send_to(None, serialized_bundle)
-            # this is non-standard, but, it is a useful distinction
-            reason = BundleStatusReportReasonCodes.FORWARDED_OVER_UNIDIRECTIONAL_LINK
-        if CONFIGURATION.IPND.IDENTIFIER_RF95_LORA in self.clas:
-            self.clas[CONFIGURATION.IPND.IDENTIFIER_RF95_LORA].send_to(None, serialized_bundle)
-            # this is non-standard, but, it is a useful distinction
-            reason = BundleStatusReportReasonCodes.FORWARDED_OVER_UNIDIRECTIONAL_LINK
-            # todo: forwarded_to_nodes is not altered, messages are spammed because retry-wait-time is not set, dirty fix: SIMPLE_EPIDEMIC_ROUTER_MIN_NODES_TO_FORWARD_TO = 0
-
-        return len(bundle_information.forwarded_to_nodes) >= CONFIGURATION.SIMPLE_EPIDEMIC_ROUTER_MIN_NODES_TO_FORWARD_TO, reason
+        # -> forwarded_to_nodes is not altered, the broadcast scheduler paces the rebroadcasts of the stored bundle
+        for cla_id, broadcast_scheduler in self.broadcast_schedulers.items():
+            if cla_id in self.clas:
+                if broadcast_scheduler.should_broadcast(bundle_information.bundle.bundle_id):
+                    # a broadcast refused by the airtime budget of the cla is not counted, it stays due
+                    if self._send_to(self.clas[cla_id], None, serialized_bundle, serialized_fragments, full_node_uri, bundle_information):
+                        broadcast_scheduler.broadcast_sent(bundle_information.bundle.bundle_id)
+                # this is non-standard, but, it is a useful distinction
+                reason = BundleStatusReportReasonCodes.FORWARDED_OVER_UNIDIRECTIONAL_LINK
+
+        return bundle_information.forwarded_to_nodes_count >= CONFIGURATION.SIMPLE_EPIDEMIC_ROUTER_MIN_NODES_TO_FORWARD_TO, reason
+
+    def forget_bundle(self, bundle_id: str):
+        for broadcast_scheduler in self.broadcast_schedulers.values():
+            broadcast_scheduler.forget(bundle_id)
 
     def send_to_previous_node(self, full_node_uri: str, bundle_information: BundleInformation) -> bool:
         previous_node_address = self.storage.get_seen(bundle_information.bundle.bundle_id)
@@ -102,11 +123,65 @@ class SimpleEpidemicRouter(Router):
             return False
 
         bundle: bytes = self.prepare_and_serialize_bundle(full_node_uri, bundle_information)
+        serialized_fragments: Dict[int, Optional[List[bytes]]] = {}
 
-        for cla_id, cla in self.clas.items():
-            if cla_id == CONFIGURATION.IPND.IDENTIFIER_ESPNOW:
-                continue
-
-            if cla.send_to(previous_node, bundle):
+        for cla_id in self._get_cla_ids_by_link_quality(previous_node):
+            if self._send_to(self.clas[cla_id], previous_node, bundle, serialized_fragments, full_node_uri, bundle_information):
                 return True
         return False
+
+    def _send_to(self, cla: Union[PullBasedCLA, PushBasedCLA], node: Optional[Node], serialized_bundle: bytes, serialized_fragments: Dict[int, Optional[List[bytes]]], full_node_uri: str, bundle_information: BundleInformation) -> bool:
+        # bundles larger than the mtu of the cla are sent as fragments (proactive fragmentation)
+        mtu = cla.get_mtu(node)
+        if mtu is None or len(serialized_bundle) <= mtu:
+            return cla.send_to(node, serialized_bundle)
+
+        if mtu not in serialized_fragments:
+            serialized_fragments[mtu] = self.prepare_and_serialize_fragments(full_node_uri, bundle_information, mtu)
+
+        fragments = serialized_fragments[mtu]
+        if fragments is None:
+            warning('cannot fragment bundle {} to the cla mtu of {} bytes'.format(bundle_information.bundle.bundle_id, mtu))
+            return False
+
+        for serialized_fragment in fragments:
+            if not cla.send_to(node, serialized_fragment):
+                return False
+        return True
+
+    def _send_to_async(self, cla: Union[PullBasedCLA, PushBasedCLA], node: Node, serialized_bundle: bytes, bundle_information: BundleInformation) -> bool:
+        # fragments are sent synchronously
+        mtu = cla.get_mtu(node)
+        if mtu is not None and len(serialized_bundle) > mtu:
+            return False
+
+        def on_sent(success: bool):
+            bundle_information.complete_forwarding_to(node, success)
+
+        if cla.send_to_async(node, serialized_bundle, on_sent):
+            bundle_information.mark_forwarding_to(node)
+            return True
+        return False
+
+    def register_wakeup_poller(self, poller: SocketPoller) -> bool:
+        registered_all = True
+        for cla in self.clas.values():
+            registered_all = cla.register_wakeup_poller(poller) and registered_all
+        return registered_all
+
+    def get_ipnd_services(self) -> List[Tuple[str, int]]:
+        services = []
+        for cla in self.clas.values():
+            service = cla.get_ipnd_service()
+            if service is not None:
+                services.append(service)
+        return services
+
+    def _get_cla_ids_by_link_quality(self, node: Node):
+        # only unicast clas announce themselves in the node information, the broadcast clas are never included
+        cla_ids = [cla_id for cla_id in node.clas if cla_id in self.clas]
+
+        if len(cla_ids) > 1:
+            cla_ids.sort(key=lambda cla_id: -node.get_link_quality(cla_id).score)
+
+        return cla_ids
@@ -0,0 +1,363 @@
+"""
+Bundle (de)serialization on top of py_dtn7, extended by fragments (RFC 9171, 4.3.1 and 5.8) and crcs.
+
+py_dtn7 rejects primary blocks with the fragment offset and total application data unit length fields, so all
+dtn7zero components deserialize bundles with deserialize_bundle(...) instead of Bundle.from_cbor(...), and serialize
+them with serialize_bundle(...) instead of bundle.to_cbor(), as the payload may be a memoryview (zero-copy decoding).
+
+The crcs of received blocks are verified on deserialization, the ones of blocks with a crc type are computed on
+serialization (RFC 9171, 4.2.1).
+
+FragmentPrimaryBlock -> primary block with the two fragment fields (array of 10 items)
+FragmentBundle       -> bundle with a fragment primary block, its bundle id includes the fragment offset and length
+"""
+from typing import List
+
+from dtn7zero.crc import get_crc_size, calculate_crc
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock, CanonicalBlock, BundleProcessingControlFlags, BlockProcessingControlFlags, \
+    CRC_TYPE_NOCRC
+
+try:
+    from cbor2 import loads, dumps
+except ImportError:
+    from cbor import loads, dumps
+
+
+_CBOR_BREAK = 0xff
+_CBOR_INDEFINITE_ARRAY = 0x9f
+_CBOR_MAJOR_TYPE_BYTES = 2
+
+_PAYLOAD_BLOCK_TYPE = 1
+
+
+class FragmentPrimaryBlock(PrimaryBlock):
+
+    def __init__(self, *args, fragment_offset: int = 0, total_application_data_unit_length: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragment_offset = fragment_offset
+        self.total_application_data_unit_length = total_application_data_unit_length
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FragmentPrimaryBlock):
+            return False
+        return super().__eq__(other) and self.fragment_offset == other.fragment_offset and \
+            self.total_application_data_unit_length == other.total_application_data_unit_length
+
+    def to_block_data(self):
+        return super().to_block_data() + (self.fragment_offset, self.total_application_data_unit_length)
+
+    @staticmethod
+    def from_primary_block(primary_block: PrimaryBlock, fragment_offset: int, total_application_data_unit_length: int):
+        """ returns a copy of the primary block with the fragment flag set and the given fragment fields """
+        bundle_processing_control_flags = BundleProcessingControlFlags(primary_block.bundle_processing_control_flags.flags)
+        bundle_processing_control_flags.set_flag(0)  # bundle is a fragment
+
+        return FragmentPrimaryBlock(
+            primary_block.version,
+            bundle_processing_control_flags,
+            primary_block.crc_type,
+            primary_block.destination_scheme,
+            primary_block.destination_specific_part,
+            primary_block.source_scheme,
+            primary_block.source_specific_part,
+            primary_block.report_to_scheme,
+            primary_block.report_to_specific_part,
+            primary_block.bundle_creation_time,
+            primary_block.sequence_number,
+            primary_block.lifetime,
+            fragment_offset=fragment_offset,
+            total_application_data_unit_length=total_application_data_unit_length
+        )
+
+    def to_whole_primary_block(self) -> PrimaryBlock:
+        """ returns the primary block of the original (reassembled) bundle """
+        bundle_processing_control_flags = BundleProcessingControlFlags(self.bundle_processing_control_flags.flags)
+        bundle_processing_control_flags.unset_flag(0)
+
+        return PrimaryBlock(
+            self.version,
+            bundle_processing_control_flags,
+            self.crc_type,
+            self.destination_scheme,
+            self.destination_specific_part,
+            self.source_scheme,
+            self.source_specific_part,
+            self.report_to_scheme,
+            self.report_to_specific_part,
+            self.bundle_creation_time,
+            self.sequence_number,
+            self.lifetime
+        )
+
+
+class FragmentBundle(Bundle):
+
+    @property
+    def original_bundle_id(self) -> str:
+        """ the bundle id of the bundle this fragment is a part of """
+        return '{}-{}-{}'.format(self.primary_block.full_source_uri, self.primary_block.bundle_creation_time, self.primary_block.sequence_number)
+
+    @property
+    def bundle_id(self) -> str:
+        # all fragments of a bundle share the source and creation timestamp, the offset and length tell them apart
+        # ('+' instead of '-', so the creation timestamp is still the last two '-' separated fields, see utility.py)
+        return '{}+{}+{}'.format(self.original_bundle_id, self.primary_block.fragment_offset, len(self.payload_block.data))
+
+
+def copy_canonical_block(block: CanonicalBlock) -> CanonicalBlock:
+    # the block number is overwritten on insertion into a bundle, so a block cannot be shared between bundles
+    return type(block)(
+        block.block_type_code,
+        block.block_number,
+        BlockProcessingControlFlags(block.block_processing_control_flags.flags),
+        block.crc_type,
+        block.data
+    )
+
+
+def _get_crc_type(block: list, is_primary_block: bool) -> int:
+    return block[2] if is_primary_block else block[3]
+
+
+def primary_block_from_block_data(primary_block: list) -> PrimaryBlock:
+    # the crc (last item) is verified on the encoded block, see verify_block_crc(...)
+    if _get_crc_type(primary_block, True) != CRC_TYPE_NOCRC:
+        crc_type, primary_block = primary_block[2], primary_block[:-1]
+    else:
+        crc_type = CRC_TYPE_NOCRC
+
+    if len(primary_block) == 10:
+        fragment_primary_block = PrimaryBlock.from_block_data(primary_block[:8])
+
+        if not fragment_primary_block.bundle_processing_control_flags.is_fragment:
+            raise ValueError('primary block has fragment fields, but the bundle is not flagged as fragment')
+
+        return FragmentPrimaryBlock.from_primary_block(fragment_primary_block, primary_block[8], primary_block[9])
+
+    if len(primary_block) != 8:
+        raise ValueError('primary block has invalid number of items: {} (crc type {})'.format(len(primary_block), crc_type))
+
+    return PrimaryBlock.from_block_data(primary_block)
+
+
+def canonical_block_from_block_data(block: list) -> CanonicalBlock:
+    # py_dtn7 rejects blocks with crc, the crc (last item) is verified on the encoded block
+    if _get_crc_type(block, False) != CRC_TYPE_NOCRC and len(block) == 6:
+        block = block[:5]
+    return CanonicalBlock.from_block_data(block)
+
+
+def bundle_from_block_data(blocks: list) -> Bundle:
+    return build_bundle(primary_block_from_block_data(blocks[0]), [canonical_block_from_block_data(block) for block in blocks[1:]])
+
+
+def build_bundle(primary_block: PrimaryBlock, canonical_blocks: List[CanonicalBlock]) -> Bundle:
+    """ builds a (fragment) bundle from already parsed blocks, the blocks must not belong to another bundle """
+    if isinstance(primary_block, FragmentPrimaryBlock):
+        return FragmentBundle(primary_block, other_blocks=canonical_blocks)
+    return Bundle(primary_block, other_blocks=canonical_blocks)
+
+
+def read_cbor_argument(data: bytes, position: int):
+    # returns the argument (value or length) of the cbor item header at position, and the position after the header
+    additional_information = data[position] & 0x1f
+    position += 1
+
+    if additional_information < 24:
+        return additional_information, position
+    if additional_information > 27:
+        raise ValueError('unexpected cbor additional information: {}'.format(additional_information))
+
+    num_bytes = 1 << (additional_information - 24)
+    if position + num_bytes > len(data):
+        raise IndexError('truncated cbor item')
+
+    return int.from_bytes(data[position:position + num_bytes], 'big'), position + num_bytes
+
+
+def skip_cbor_item(data: bytes, position: int) -> int:
+    # returns the position after the cbor item at position, raises IndexError if the item is truncated
+    if position >= len(data):
+        raise IndexError('truncated cbor item')
+
+    major_type = data[position] >> 5
+
+    if data[position] & 0x1f == 31:
+        # indefinite length -> items until the break code
+        position += 1
+        while data[position] != _CBOR_BREAK:
+            position = skip_cbor_item(data, position)
+        return position + 1
+
+    argument, position = read_cbor_argument(data, position)
+
+    if major_type == 2 or major_type == 3:
+        position += argument
+    elif major_type == 4:
+        for _ in range(argument):
+            position = skip_cbor_item(data, position)
+    elif major_type == 5:
+        for _ in range(2 * argument):
+            position = skip_cbor_item(data, position)
+    elif major_type == 6:
+        position = skip_cbor_item(data, position)
+
+    if position > len(data):
+        raise IndexError('truncated cbor item')
+    return position
+
+
+def verify_block_crc(data: bytes, start: int, end: int, crc_type: int, crc: bytes):
+    """ RFC 9171, 4.3.1 Primary Bundle Block (likewise 4.3.2 Canonical Bundle Block Format)
+    […] The CRC SHALL be computed over the concatenation of all bytes (including CBOR "break" characters) of the
+    primary block including the CRC field itself, which, for this purpose, SHALL be temporarily populated with all
+    bytes set to zero. […]
+
+    the crc field is the last item of the encoded block (data[start:end]), raises ValueError on mismatch
+    """
+    crc_size = get_crc_size(crc_type)
+
+    if not isinstance(crc, bytes) or len(crc) != crc_size:
+        raise ValueError('invalid crc field for crc type {}: {}'.format(crc_type, crc))
+
+    value = calculate_crc(crc_type, memoryview(data)[start:end - crc_size])
+    value = calculate_crc(crc_type, bytes(crc_size), value)
+
+    if value.to_bytes(crc_size, 'big') != crc:
+        raise ValueError('block crc mismatch (crc type {})'.format(crc_type))
+
+
+def _get_block_positions(data: bytes):
+    # yields the start and end position of each block of the encoded bundle
+    if data[0] == _CBOR_INDEFINITE_ARRAY:
+        num_blocks, position = None, 1
+    else:
+        num_blocks, position = read_cbor_argument(data, 0)
+
+    idx = 0
+    while data[position] != _CBOR_BREAK if num_blocks is None else idx < num_blocks:
+        end = skip_cbor_item(data, position)
+        yield position, end
+        position = end
+        idx += 1
+
+
+def _payload_block_data_from_view(data: bytes, view: memoryview, position: int) -> list:
+    # decodes the payload block at position, its byte string is returned as slice of the view instead of a copy
+    num_items, position = read_cbor_argument(data, position)
+
+    block = []
+    for _ in range(4):
+        end = skip_cbor_item(data, position)
+        block.append(loads(data[position:end]))
+        position = end
+
+    if data[position] >> 5 != _CBOR_MAJOR_TYPE_BYTES or data[position] & 0x1f == 31:
+        raise ValueError('payload block data is not a definite length byte string')
+
+    length, position = read_cbor_argument(data, position)
+    if position + length > len(data):
+        raise IndexError('truncated cbor item')
+    block.append(view[position:position + length])
+    position += length
+
+    for _ in range(num_items - 5):
+        end = skip_cbor_item(data, position)
+        block.append(loads(data[position:end]))
+        position = end
+
+    return block
+
+
+def _deserialize_bundle_zero_copy(data: bytes) -> Bundle:
+    view = memoryview(data)
+
+    blocks = []
+    for start, end in _get_block_positions(data):
+        # the canonical block array starts with its block type code (small unsigned integer -> single byte)
+        if blocks and data[start + 1] == _PAYLOAD_BLOCK_TYPE:
+            block = _payload_block_data_from_view(data, view, start)
+        else:
+            block = loads(data[start:end])
+
+        crc_type = _get_crc_type(block, not blocks)
+        if crc_type != CRC_TYPE_NOCRC:
+            verify_block_crc(data, start, end, crc_type, block[-1])
+
+        blocks.append(block)
+
+    return bundle_from_block_data(blocks)
+
+
+def _verify_crcs(data: bytes, blocks: list):
+    for idx, (start, end) in enumerate(_get_block_positions(data)):
+        crc_type = _get_crc_type(blocks[idx], idx == 0)
+        if crc_type != CRC_TYPE_NOCRC:
+            verify_block_crc(data, start, end, crc_type, blocks[idx][-1])
+
+
+def deserialize_bundle(data: bytes, zero_copy: bool = False) -> Bundle:
+    """ Bundle.from_cbor(...) with support for fragments and crcs (a bundle with a wrong crc raises a ValueError)
+
+    zero_copy -> the payload block data is a memoryview slice of data instead of a bytes copy,
+                 data must not be modified afterwards (e.g. a receive buffer that is reused)
+    """
+    if zero_copy:
+        return _deserialize_bundle_zero_copy(data)
+
+    blocks = loads(data)
+
+    # the crcs are checked on the encoded blocks, only if there are any
+    if any(_get_crc_type(block, idx == 0) != CRC_TYPE_NOCRC for idx, block in enumerate(blocks)):
+        _verify_crcs(data, blocks)
+
+    return bundle_from_block_data(blocks)
+
+
+def _encode_block(block: tuple, crc_type: int, parts: list):
+    # the items are encoded one by one, so the crc is computed over the encoded parts as they are produced,
+    # and a memoryview payload is appended without copy (the cbor encoders cannot serialize memoryviews)
+    crc_size = get_crc_size(crc_type)
+    start = len(parts)
+
+    parts.append(bytes((0x80 | (len(block) + (1 if crc_size else 0)),)))  # array header, less than 24 items
+
+    for item in block:
+        if isinstance(item, memoryview):
+            header = bytearray(dumps(len(item)))
+            header[0] |= _CBOR_MAJOR_TYPE_BYTES << 5
+            parts.append(header)
+        else:
+            item = dumps(item)
+        parts.append(item)
+
+    if crc_size:
+        crc_header = bytes(((_CBOR_MAJOR_TYPE_BYTES << 5) | crc_size,))
+
+        value = 0
+        for part in parts[start:]:
+            value = calculate_crc(crc_type, part, value)
+        value = calculate_crc(crc_type, crc_header + bytes(crc_size), value)
+
+        parts.append(crc_header + value.to_bytes(crc_size, 'big'))
+
+
+def serialize_bundle(bundle: Bundle) -> bytes:
+    """ bundle.to_cbor() with support for memoryview payloads and crcs (computed on serialization) """
+    blocks = bundle.to_block_data()
+    crc_types = [_get_crc_type(block, idx == 0) for idx, block in enumerate(blocks)]
+
+    if not isinstance(bundle.payload_block.data, memoryview) and not any(crc_types):
+        return bundle.to_cbor()
+
+    parts = [bytes((_CBOR_INDEFINITE_ARRAY,))]
+
+    for block, crc_type in zip(blocks, crc_types):
+        if crc_type != CRC_TYPE_NOCRC or any(isinstance(item, memoryview) for item in block):
+            _encode_block(block, crc_type, parts)
+        else:
+            parts.append(dumps(block))
+
+    parts.append(bytes((_CBOR_BREAK,)))
+    return b''.join(parts)
@@ -0,0 +1,326 @@
+"""
+Optional multi-process sharded deployment for multi-core gateways (CPython on linux/bsd only).
+
+ShardCoordinator                 -> runs ipnd and holds the neighbor table, starts the workers and sends them every
+                                    change of the neighbor table
+ShardWorkerBundleProtocolAgent   -> one per worker process, all workers listen on the same mtcp port (SO_REUSEPORT)
+
+Storage is partitioned by a hash of the bundle id: a worker that receives a bundle it does not own hands it over to
+the owning worker, so duplicates of a bundle always meet in the same storage. The receiving worker records the bundle
+id in its own seen-set as well (to drop repeated copies over its connections early), only the seen-set of the owner
+detects duplicates received by different workers.
+
+The workers are forked, so the CONFIGURATION at ShardCoordinator.start() is used by all workers.
+"""
+import multiprocessing
+import os
+import queue
+import socket
+from typing import List, Callable, Optional, Dict, Tuple
+from zlib import crc32
+
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.data import BundleInformation, Node
+from dtn7zero.ipnd import IPND
+from dtn7zero.routers import Router
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.serialization import deserialize_bundle, serialize_bundle, FragmentBundle
+from dtn7zero.storage import Storage
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import SocketPoller, warning, debug
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock
+
+if RUNNING_MICROPYTHON:
+    raise ImportError('the sharded deployment mode is not supported on micropython')
+
+# the wakeup bytes on the waker sockets, a handover byte announces one bundle in the handover queue of the worker
+_WAKEUP_NODE_CHANGE = b'\x00'
+_WAKEUP_HANDOVER = b'\x01'
+
+# a put_nowait() on a multiprocessing queue passes the item to a feeder thread, an announced bundle arrives shortly
+_ANNOUNCED_HANDOVER_TIMEOUT_SECONDS = 1
+
+
+def get_shard_index(bundle_id: str, num_shards: int) -> int:
+    # a stable hash (pythons str hash is randomized per process)
+    return crc32(bundle_id.encode(CONFIGURATION.ENCODING)) % num_shards
+
+
+def _get_shard_key(bundle: Bundle) -> str:
+    # all fragments of a bundle are owned by the same worker, which reassembles them
+    if isinstance(bundle, FragmentBundle):
+        return bundle.original_bundle_id
+    return bundle.bundle_id
+
+
+class ShardWorkerBundleProtocolAgent(BundleProtocolAgent):
+
+    def __init__(
+            self,
+            full_node_uri: str,
+            storage: Storage,
+            router: Router,
+            shard_index: int,
+            handover_queues: List[multiprocessing.Queue],
+            waker_sockets: List[Tuple[socket.socket, socket.socket]],
+            node_queue: multiprocessing.Queue
+    ):
+        """ see BundleProtocolAgent, ipnd must be disabled in the worker (the coordinator runs it)
+
+        handover_queues -> one per worker, bundles (serialized, from-node-address) owned by that worker
+        waker_sockets   -> one (receive, send) socket pair per worker, a byte is sent per handover and node change
+        node_queue      -> neighbor table changes from the coordinator (address, eid, clas, sequence-number)
+        """
+        super().__init__(full_node_uri, storage, router)
+
+        self.shard_index = shard_index
+        self.num_shards = len(handover_queues)
+        self.handover_queues = handover_queues
+        self.waker_sockets = waker_sockets
+        self.node_queue = node_queue
+
+        self.handover_waker = waker_sockets[shard_index][0]
+        self.handover_waker.setblocking(False)
+        self.poller.register(self.handover_waker)
+
+        # handovers announced on the waker minus bundles taken from the handover queue (negative if a bundle was taken
+        # before its wakeup byte was read)
+        self.announced_handovers = 0
+
+    def _is_owner(self, bundle: Bundle) -> bool:
+        return get_shard_index(_get_shard_key(bundle), self.num_shards) == self.shard_index
+
+    def _hand_over(self, bundle: Bundle, from_node_address: Optional[str]) -> bool:
+        owner = get_shard_index(_get_shard_key(bundle), self.num_shards)
+
+        try:
+            self.handover_queues[owner].put_nowait((serialize_bundle(bundle), from_node_address))
+        except queue.Full:
+            return False
+
+        try:
+            self.waker_sockets[owner][1].send(_WAKEUP_HANDOVER)
+        except OSError:
+            pass  # buffer full -> a wakeup is pending anyway
+        return True
+
+    def _update_discovery(self):
+        # the coordinator runs ipnd, apply its neighbor table changes
+        while True:
+            try:
+                address, eid, clas, sequence_number = self.node_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            existing_node = self.storage.get_node(address)
+            if existing_node is None:
+                self.storage.add_node(Node(address, eid, clas, sequence_number))
+            else:
+                existing_node.merge_new_info(eid[0], eid[1], clas)
+                existing_node.sequence_number = sequence_number
+
+    def _process_local_bundle(self) -> bool:
+        if not self.local_bundle_dispatch_queue:
+            return False
+
+        bundle_information = self.local_bundle_dispatch_queue.pop()
+
+        if self._is_owner(bundle_information.bundle) or not self._hand_over(bundle_information.bundle, None):
+            self.bundle_reception(bundle_information)
+        return True
+
+    def _process_remote_bundle(self) -> bool:
+        # first the bundles other workers handed over to us
+        try:
+            serialized_bundle, from_node_address = self._get_handed_over_bundle()
+        except queue.Empty:
+            pass
+        else:
+            self._receive_handed_over_bundle(serialized_bundle, from_node_address)
+            return True
+
+        if self.router_poll_generator is None:
+            self.router_poll_generator = self.router.generator_poll_bundles()
+
+        try:
+            bundle_information = next(self.router_poll_generator)
+        except StopIteration:
+            self.router_poll_generator = None
+            return False
+
+        bundle_id = bundle_information.bundle.bundle_id
+
+        # if the owner's queue is full the bundle is processed here, this only weakens duplicate detection
+        if self._is_owner(bundle_information.bundle) or not self._hand_over(bundle_information.bundle, self.storage.get_seen(bundle_id)):
+            self.bundle_reception(bundle_information)
+        return True
+
+    def _receive_handed_over_bundle(self, serialized_bundle: bytes, from_node_address: Optional[str]):
+        try:
+            bundle = deserialize_bundle(serialized_bundle)
+        except Exception as e:
+            warning('error during deserialization of handed over bundle, ignoring bundle. error: {}'.format(e))
+            return
+
+        # only the owner knows whether a copy of this bundle was received by another worker before
+        if from_node_address is not None:
+            if self.storage.was_seen(bundle.bundle_id):
+                return
+            self.storage.store_seen(bundle.bundle_id, from_node_address)
+
+        bundle_information = BundleInformation(bundle)
+
+        node = self.storage.get_node(from_node_address)
+        if node is not None:  # like the router, prevent the bundle from being sent back to the previous node
+            bundle_information.mark_forwarded_to(node)
+
+        self.bundle_reception(bundle_information)
+
+    def _get_handed_over_bundle(self) -> Tuple[bytes, Optional[str]]:
+        self._drain_handover_waker()
+
+        handover_queue = self.handover_queues[self.shard_index]
+
+        # the wakeup byte is read already, an announced bundle must not be missed until the next timer
+        if self.announced_handovers > 0:
+            try:
+                item = handover_queue.get(timeout=_ANNOUNCED_HANDOVER_TIMEOUT_SECONDS)
+            except queue.Empty:
+                self.announced_handovers = 0
+                raise
+        else:
+            item = handover_queue.get_nowait()
+
+        self.announced_handovers -= 1
+        return item
+
+    def _drain_handover_waker(self):
+        try:
+            while True:
+                data = self.handover_waker.recv(64)
+                if not data:
+                    return
+                self.announced_handovers += data.count(_WAKEUP_HANDOVER)
+        except OSError:
+            pass
+
+
+def _run_worker(full_node_uri, shard_index, handover_queues, waker_sockets, node_queue, setup_worker):
+    # the coordinator runs ipnd, a worker must not read the discovery socket
+    CONFIGURATION.IPND.ENABLED = False
+
+    storage = SimpleInMemoryStorage()
+    router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: MTcpCLA(reuse_port=True)}, storage)
+    bpa = ShardWorkerBundleProtocolAgent(full_node_uri, storage, router, shard_index, handover_queues, waker_sockets, node_queue)
+
+    if setup_worker is not None:
+        setup_worker(bpa)
+
+    debug('shard worker {} started (pid {})'.format(shard_index, os.getpid()))
+
+    try:
+        while True:
+            if not bpa.update():
+                bpa.wait()
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardCoordinator:
+
+    def __init__(self, full_node_uri: str, setup_worker: Callable[[ShardWorkerBundleProtocolAgent], None] = None, num_workers: int = None):
+        """
+        setup_worker -> called in every worker process with its bpa, e.g. to register the local endpoints
+                        (every worker needs the same endpoints, as any worker may own a bundle)
+        num_workers  -> defaults to CONFIGURATION.SHARDING.NUM_WORKERS, or the number of cpu cores
+        """
+        if num_workers is None:
+            num_workers = CONFIGURATION.SHARDING.NUM_WORKERS or os.cpu_count() or 1
+
+        self.full_node_uri = full_node_uri
+        self.setup_worker = setup_worker
+        self.num_workers = num_workers
+
+        self.storage = SimpleInMemoryStorage()  # holds only the neighbor table
+        scheme_encoded, node_encoded = PrimaryBlock.from_full_uri(full_node_uri)
+        self.ipnd = IPND(scheme_encoded, node_encoded, self.storage)
+
+        self.poller = SocketPoller()
+        self.poller.register(self.ipnd.sock)
+
+        self.context = multiprocessing.get_context('fork')
+        self.node_queues: List[multiprocessing.Queue] = []
+        self.waker_sockets: List[Tuple[socket.socket, socket.socket]] = []
+        self.processes = []
+
+        # address -> last published (eid, clas), to only send changes to the workers
+        self.published_nodes: Dict[str, tuple] = {}
+
+    def start(self):
+        if self.processes:
+            raise Exception('ShardCoordinator.start() should only be called once!')
+
+        handover_queues = [self.context.Queue(CONFIGURATION.SHARDING.HANDOVER_QUEUE_SIZE) for _ in range(self.num_workers)]
+        self.waker_sockets = [socket.socketpair() for _ in range(self.num_workers)]
+        for _, waker_send in self.waker_sockets:
+            waker_send.setblocking(False)
+
+        for shard_index in range(self.num_workers):
+            node_queue = self.context.Queue()
+            process = self.context.Process(
+                target=_run_worker,
+                args=(self.full_node_uri, shard_index, handover_queues, self.waker_sockets, node_queue, self.setup_worker),
+                name='dtn7zero-shard-{}'.format(shard_index),
+                daemon=True
+            )
+            process.start()
+
+            self.node_queues.append(node_queue)
+            self.processes.append(process)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def add_node(self, node: Node):
+        """ adds a node manually (e.g. not discoverable via ipnd), it is published to the workers on the next update """
+        self.storage.add_node(node)
+
+    def update(self):
+        self.ipnd.update()
+        self._publish_node_changes()
+
+    def _publish_node_changes(self):
+        for node in self.storage.get_nodes():
+            state = (node.eid, dict(node.clas))
+
+            if self.published_nodes.get(node.address) != state:
+                self.published_nodes[node.address] = state
+                for node_queue, (_, waker_send) in zip(self.node_queues, self.waker_sockets):
+                    node_queue.put((node.address, node.eid, dict(node.clas), node.sequence_number))
+                    try:
+                        waker_send.send(_WAKEUP_NODE_CHANGE)
+                    except OSError:
+                        pass  # buffer full -> a wakeup is pending anyway
+
+    def run_forever(self):
+        """ starts the workers (if not done yet) and runs discovery until KeyboardInterrupt """
+        if not self.processes:
+            self.start()
+
+        try:
+            while True:
+                self.update()
+
+                timeout = self.ipnd.milliseconds_until_next_beacon()
+                self.poller.poll(CONFIGURATION.IPND.SEND_INTERVAL_MILLISECONDS if timeout is None else timeout)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
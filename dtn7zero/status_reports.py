@@ -0,0 +1,350 @@
+"""
+RFC 9171, 6.1 Bundle Status Reports
+
+StatusReportGenerator  -> collects the status reports of the bpa per report-to endpoint and sends them after a short
+                          window (merged per bundle, optionally batched), rate limited, so a flood of bundles does not
+                          create an equal flood of reports
+AdministrativeEndpoint -> receives the status reports (administrative records) addressed to this node
+StatusReport           -> one parsed (or to be sent) status report
+
+By default every report is sent as a standard RFC 9171 status report in its own bundle. With
+CONFIGURATION.STATUS_REPORTS.BATCHING_ENABLED = True a batch of more than one report is sent as a dtn7zero specific
+administrative record type, which other implementations ignore (opt-in for networks of dtn7zero nodes only).
+"""
+from typing import Dict, List, Optional, Callable
+
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+from dtn7zero.data import BundleInformation
+from dtn7zero.endpoints import LocalEndpoint
+from dtn7zero.extension_blocks import BundlePriority
+from dtn7zero.serialization import FragmentPrimaryBlock
+from dtn7zero.utility import get_current_clock_millis, debug, allocate_lock
+from py_dtn7 import Bundle, to_dtn_timestamp
+from py_dtn7.bundle import BundleProcessingControlFlags, PrimaryBlock, NONE_ENDPOINT_SPECIFIC_PART_ENCODED
+
+try:
+    from cbor2 import dumps, loads
+except ImportError:
+    from cbor import dumps, loads
+
+
+ADMINISTRATIVE_RECORD_TYPE_STATUS_REPORT = 1
+ADMINISTRATIVE_RECORD_TYPE_STATUS_REPORT_BATCH = 192  # dtn7zero specific -> [192, [status-report-content, ...]]
+
+
+class StatusReportRequest:
+    """
+    bundle processing control flags requesting status reports (RFC 9171, 4.2.3), to be or-ed together
+    """
+    RECEPTION = 1 << 14
+    FORWARDING = 1 << 16
+    DELIVERY = 1 << 17
+    DELETION = 1 << 18
+
+    ALL = RECEPTION | FORWARDING | DELIVERY | DELETION
+
+
+class StatusReport:
+    # indices into the bundle status information array
+    RECEIVED = 0
+    FORWARDED = 1
+    DELIVERED = 2
+    DELETED = 3
+
+    def __init__(
+            self,
+            source_scheme: int,
+            source_specific_part,
+            creation_time: int,
+            sequence_number: int,
+            reason_code: int = 0,
+            status_information: List[Optional[int]] = None,
+            reporting_node_uri: Optional[str] = None,
+            fragment_offset: Optional[int] = None,
+            fragment_length: Optional[int] = None
+    ):
+        """
+        status_information -> per status: None (not asserted), 0 (asserted without time), or the dtn time of the status
+        reporting_node_uri -> the node that sent the report (only known for received reports)
+        fragment_offset    -> only set if the report is about a fragment, together with the fragment (payload) length
+        """
+        self.source_scheme = source_scheme
+        self.source_specific_part = source_specific_part
+        self.creation_time = creation_time
+        self.sequence_number = sequence_number
+        self.reason_code = reason_code
+        self.status_information: List[Optional[int]] = [None, None, None, None] if status_information is None else status_information
+        self.reporting_node_uri = reporting_node_uri
+        self.fragment_offset = fragment_offset
+        self.fragment_length = fragment_length
+
+    def __repr__(self) -> str:
+        return '<StatusReport: {}, received={}, forwarded={}, delivered={}, deleted={}, reason={}, from={}>'.format(
+            self.bundle_id, self.received, self.forwarded, self.delivered, self.deleted, self.reason_code, self.reporting_node_uri
+        )
+
+    @property
+    def full_source_uri(self) -> str:
+        return PrimaryBlock.to_full_uri(self.source_scheme, self.source_specific_part)
+
+    @property
+    def bundle_id(self) -> str:
+        """ the id of the bundle (or fragment) this report is about """
+        bundle_id = '{}-{}-{}'.format(self.full_source_uri, self.creation_time, self.sequence_number)
+
+        if self.fragment_offset is not None:
+            return '{}+{}+{}'.format(bundle_id, self.fragment_offset, self.fragment_length)  # like FragmentBundle.bundle_id
+        return bundle_id
+
+    @property
+    def received(self) -> bool:
+        return self.status_information[StatusReport.RECEIVED] is not None
+
+    @property
+    def forwarded(self) -> bool:
+        return self.status_information[StatusReport.FORWARDED] is not None
+
+    @property
+    def delivered(self) -> bool:
+        return self.status_information[StatusReport.DELIVERED] is not None
+
+    @property
+    def deleted(self) -> bool:
+        return self.status_information[StatusReport.DELETED] is not None
+
+    @staticmethod
+    def from_bundle(bundle: Bundle):
+        primary_block = bundle.primary_block
+        report = StatusReport(primary_block.source_scheme, primary_block.source_specific_part, primary_block.bundle_creation_time, primary_block.sequence_number)
+
+        if isinstance(primary_block, FragmentPrimaryBlock):
+            report.fragment_offset = primary_block.fragment_offset
+            report.fragment_length = len(bundle.payload_block.data)
+        return report
+
+    def assert_status(self, status: int, reason_code: int, with_time: bool):
+        if with_time and not RUNNING_MICROPYTHON:
+            self.status_information[status] = to_dtn_timestamp()
+        else:
+            self.status_information[status] = 0
+
+        # the deletion reason is the most specific one, other reasons do not overwrite it
+        if reason_code != 0 and (status == StatusReport.DELETED or not self.deleted):
+            self.reason_code = reason_code
+
+    def to_record_content(self) -> list:
+        status_information = [[False] if item is None else ([True, item] if item else [True]) for item in self.status_information]
+        content = [status_information, self.reason_code, [self.source_scheme, self.source_specific_part], [self.creation_time, self.sequence_number]]
+
+        # RFC 9171, 6.1.1 -> reports about fragments carry the fragment offset and length
+        if self.fragment_offset is not None:
+            content += [self.fragment_offset, self.fragment_length]
+        return content
+
+    @staticmethod
+    def from_record_content(content: list, reporting_node_uri: Optional[str] = None):
+        status_information = []
+        for item in content[0]:
+            if not item[0]:
+                status_information.append(None)
+            else:
+                status_information.append(item[1] if len(item) > 1 else 0)
+
+        source_scheme, source_specific_part = content[2]
+        if isinstance(source_specific_part, list):
+            source_specific_part = tuple(source_specific_part)
+        creation_time, sequence_number = content[3]
+        fragment_offset, fragment_length = (content[4], content[5]) if len(content) > 5 else (None, None)
+
+        return StatusReport(source_scheme, source_specific_part, creation_time, sequence_number, content[1], status_information, reporting_node_uri, fragment_offset, fragment_length)
+
+
+def parse_administrative_record(payload: bytes, reporting_node_uri: Optional[str] = None) -> List[StatusReport]:
+    """
+    returns the status reports of the administrative record, unknown record types yield no reports
+    """
+    record_type, record_content = loads(payload)
+
+    if record_type == ADMINISTRATIVE_RECORD_TYPE_STATUS_REPORT:
+        return [StatusReport.from_record_content(record_content, reporting_node_uri)]
+    elif record_type == ADMINISTRATIVE_RECORD_TYPE_STATUS_REPORT_BATCH:
+        return [StatusReport.from_record_content(content, reporting_node_uri) for content in record_content]
+
+    debug('ignoring administrative record of unknown type: {}'.format(record_type))
+    return []
+
+
+class AdministrativeEndpoint:
+
+    def __init__(self, receive_callback: Callable[[StatusReport], None] = None):
+        """ receives the status reports addressed to this node, to be registered with bpa.register_administrative_endpoint(...)
+
+        receive_callback may be None, but then the endpoint should be regularly polled for new reports.
+        """
+        self.receive_callback = receive_callback
+        self.report_buffer: List[StatusReport] = []
+
+    def bpa_status_report_delivery(self, status_report: StatusReport):
+        if self.receive_callback is None:
+            self.report_buffer.append(status_report)
+        else:
+            self.receive_callback(status_report)
+
+    def poll(self) -> Optional[StatusReport]:
+        if self.receive_callback is not None:
+            raise Exception('cannot poll active administrative endpoint with callback')
+        if not self.report_buffer:
+            return None
+        return self.report_buffer.pop(0)
+
+
+class _AdministrativeSourceEndpoint(LocalEndpoint):
+    # administrative records are sent from the node id itself, this endpoint is never registered for reception
+
+    def create_administrative_bundle(self, record: list, full_destination_uri: str) -> Bundle:
+        flags = BundleProcessingControlFlags(0)
+        flags.set_flag(1)  # payload is an administrative record
+        flags.set_flag(2)  # do not fragment bundle
+
+        return self._create_bundle(dumps(record), full_destination_uri, CONFIGURATION.STATUS_REPORTS.LIFETIME_MILLISECONDS, False, BundlePriority.NORMAL, flags)
+
+
+class StatusReportGenerator:
+
+    def __init__(self, bpa):
+        self.bpa = bpa
+        self.source_endpoint = _AdministrativeSourceEndpoint('')
+        self.source_endpoint.bpa_register(bpa)
+
+        # report-to uri -> bundle id -> report, reports on the same bundle are merged into one report
+        self.pending: Dict[str, Dict[str, StatusReport]] = {}
+        self.window_starts: Dict[str, int] = {}
+        self.num_pending = 0
+        self.num_dropped = 0
+
+        # token bucket for the report bundles
+        self.tokens = float(CONFIGURATION.STATUS_REPORTS.MAX_BUNDLES_PER_SECOND)
+        self.last_refill = get_current_clock_millis()
+
+        # the forwarding workers of the pipelined bpa add reports while the processing thread runs update()
+        self.lock = allocate_lock()
+
+    def add(self, bundle: Bundle, status: int, reason_code: int):
+        """
+        RFC 9171, 6.1 -> adds the status assertion to the pending report for the report-to endpoint of the bundle
+        """
+        if not CONFIGURATION.SEND_STATUS_REPORTS_ENABLED:
+            return
+
+        with self.lock:
+            self._add(bundle, status, reason_code)
+
+    def _add(self, bundle: Bundle, status: int, reason_code: int):
+        primary_block = bundle.primary_block
+
+        # no reports about reports, and no reports to the null endpoint
+        if primary_block.bundle_processing_control_flags.payload_is_admin_record:
+            return
+        if primary_block.report_to_specific_part == NONE_ENDPOINT_SPECIFIC_PART_ENCODED:
+            return
+
+        report_to_uri = primary_block.full_report_to_uri
+        reports = self.pending.get(report_to_uri)
+
+        if reports is None:
+            reports = self.pending[report_to_uri] = {}
+            self.window_starts[report_to_uri] = get_current_clock_millis()
+
+        report = reports.get(bundle.bundle_id)
+
+        if report is None:
+            if self.num_pending >= CONFIGURATION.STATUS_REPORTS.MAX_PENDING_REPORTS:
+                self.num_dropped += 1
+                debug('status report dropped (too many pending reports), bundle: {}'.format(bundle.bundle_id))
+                if not reports:
+                    self._forget(report_to_uri)
+                return
+
+            report = reports[bundle.bundle_id] = StatusReport.from_bundle(bundle)
+            self.num_pending += 1
+
+        report.assert_status(status, reason_code, primary_block.bundle_processing_control_flags.status_time_is_requested)
+
+    def _forget(self, report_to_uri: str):
+        del self.pending[report_to_uri]
+        del self.window_starts[report_to_uri]
+
+    def _refill_tokens(self):
+        now = get_current_clock_millis()
+        rate = CONFIGURATION.STATUS_REPORTS.MAX_BUNDLES_PER_SECOND
+        self.tokens = min(float(rate), self.tokens + (now - self.last_refill) * rate / 1000)
+        self.last_refill = now
+
+    def milliseconds_until_next_batch(self) -> Optional[int]:
+        """
+        returns the time until the next batch window closes, or None if no reports are pending
+        """
+        if not self.window_starts:
+            return None
+
+        now = get_current_clock_millis()
+        with self.lock:
+            if not self.window_starts:
+                return None
+            oldest_window_start = min(self.window_starts.values())
+        return max(0, CONFIGURATION.STATUS_REPORTS.BATCH_WINDOW_MILLISECONDS - (now - oldest_window_start))
+
+    def update(self) -> bool:
+        """
+        queues the report bundles of all closed batch windows at the bpa, as far as the rate limit allows
+
+        returns True if any report bundle was queued
+        """
+        if not self.pending:
+            return False
+
+        with self.lock:
+            return self._update()
+
+    def _update(self) -> bool:
+        self._refill_tokens()
+
+        if CONFIGURATION.STATUS_REPORTS.BATCHING_ENABLED:
+            max_reports_per_bundle = CONFIGURATION.STATUS_REPORTS.MAX_REPORTS_PER_BUNDLE
+        else:
+            max_reports_per_bundle = 1
+
+        queued_any = False
+        now = get_current_clock_millis()
+
+        for report_to_uri in list(self.pending):
+            if now - self.window_starts[report_to_uri] < CONFIGURATION.STATUS_REPORTS.BATCH_WINDOW_MILLISECONDS:
+                continue
+
+            reports = self.pending[report_to_uri]
+
+            while reports:
+                # the rate limit and a full dispatch queue keep the reports pending (and mergeable)
+                if self.tokens < 1 or self.bpa.local_bundle_dispatch_queue.is_full():
+                    return queued_any
+
+                batch = []
+                for bundle_id in list(reports)[:max_reports_per_bundle]:
+                    batch.append(reports.pop(bundle_id))
+
+                if len(batch) == 1:
+                    record = [ADMINISTRATIVE_RECORD_TYPE_STATUS_REPORT, batch[0].to_record_content()]
+                else:
+                    record = [ADMINISTRATIVE_RECORD_TYPE_STATUS_REPORT_BATCH, [report.to_record_content() for report in batch]]
+
+                bundle = self.source_endpoint.create_administrative_bundle(record, report_to_uri)
+                self.bpa.local_bundle_dispatch_queue.append(BundleInformation(bundle))
+                debug('queued status report bundle with {} report(s) to {}'.format(len(batch), report_to_uri))
+
+                self.tokens -= 1
+                self.num_pending -= len(batch)
+                queued_any = True
+
+            self._forget(report_to_uri)
+
+        return queued_any
@@ -7,6 +7,9 @@ from dtn7zero.data import BundleInformation, Node
 class Storage(ABC):
 
     def add_node(self, node: Node):
+        """
+        must assign a unique and stable node.index (small integer) for the forwarding ledger of bundles
+        """
         raise NotImplementedError('do not instantiate Storage class directly')
 
     def get_node(self, node_address: str) -> Optional[Node]:
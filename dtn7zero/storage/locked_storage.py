@@ -0,0 +1,53 @@
+import threading
+from typing import Tuple, List, Optional, Iterable
+
+from dtn7zero.data import BundleInformation, Node
+from dtn7zero.storage import Storage
+
+
+class LockedStorage(Storage):
+
+    def __init__(self, storage: Storage):
+        """
+        makes any storage (including its node table) usable from multiple threads (CPython only)
+
+        every call is serialized with one lock, iterables are returned as snapshots
+        """
+        self.storage = storage
+        self.lock = threading.RLock()
+
+    def add_node(self, node: Node):
+        with self.lock:
+            self.storage.add_node(node)
+
+    def get_node(self, node_address: str) -> Optional[Node]:
+        with self.lock:
+            return self.storage.get_node(node_address)
+
+    def get_nodes(self) -> Iterable[Node]:
+        with self.lock:
+            return list(self.storage.get_nodes())
+
+    def was_seen(self, bundle_id: str) -> bool:
+        with self.lock:
+            return self.storage.was_seen(bundle_id)
+
+    def get_seen(self, bundle_id: str) -> Optional[str]:
+        with self.lock:
+            return self.storage.get_seen(bundle_id)
+
+    def store_seen(self, bundle_id: str, node: Optional[str]):
+        with self.lock:
+            self.storage.store_seen(bundle_id, node)
+
+    def remove_bundle(self, bundle_id: str) -> bool:
+        with self.lock:
+            return self.storage.remove_bundle(bundle_id)
+
+    def delay_bundle(self, bundle_information: BundleInformation) -> Tuple[bool, List[BundleInformation]]:
+        with self.lock:
+            return self.storage.delay_bundle(bundle_information)
+
+    def get_bundles_to_retry(self):
+        with self.lock:
+            return iter(list(self.storage.get_bundles_to_retry()))
@@ -12,8 +12,18 @@ class SimpleInMemoryStorage(Storage):
         self.bundles: Dict[str, BundleInformation] = {}
         self.bundle_ids: Dict[str, Optional[str]] = {}
         self.nodes: Dict[str, Node] = {}
+        self.next_node_index = 0
 
     def add_node(self, node: Node):
+        existing_node = self.nodes.get(node.address)
+
+        # node indices are never reused, as bundles may still reference them in their forwarding ledger
+        if existing_node is not None:
+            node.index = existing_node.index
+        else:
+            node.index = self.next_node_index
+            self.next_node_index += 1
+
         self.nodes[node.address] = node
 
     def get_node(self, node_address) -> Optional[Node]:
@@ -64,7 +74,7 @@ class SimpleInMemoryStorage(Storage):
                 del self.bundles[bundle_id]
 
     def get_bundles_to_retry(self):
-        # simply yield all stored bundles
+        # simply yield all stored bundles, highest priority class first (sort is stable -> FIFO inside a class)
         # 1. reason: in-memory storage only stores a limited amount of bundles
         # 2. router only forwards bundles where they have not been forwarded yet -> router filters
-        return (i for i in tuple(self.bundles.values()))
+        return (i for i in sorted(self.bundles.values(), key=lambda bundle_information: -bundle_information.priority))
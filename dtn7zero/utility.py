@@ -1,12 +1,31 @@
 import time
 import re
-from typing import Iterable
+from typing import Iterable, List, Any, Tuple
 
-from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.configuration import CONFIGURATION, RUNNING_MICROPYTHON
+
+if RUNNING_MICROPYTHON:
+    import select
+else:
+    import selectors
+
+try:
+    import _thread
+except ImportError:
+    _thread = None  # micropython port without thread support
 
 NODE_URI_REGEX = re.compile(r'(^dtn://[^~/]+/$)|(^ipn://\d+(\.\d+)*$)')
 ENDPOINT_URI_REGEX = re.compile(r'(^dtn://none$)|(^dtn://[^~/]+/([^~/]+/)*[^~/]+$)|(^ipn://\d+(\.\d+)+$)')
-GROUP_URI_REGEX = re.compile(r'^dtn://[^~/]+/([^~]+/)*~[^/]+$')
+GROUP_URI_REGEX = re.compile(r'^dtn://[^~/]+/([^~/]+/)*(~[^/]+)?$')
+
+
+def get_creation_timestamp(bundle_id: str) -> Tuple[int, int]:
+    """
+    returns the (creation time, sequence number) of a bundle or fragment id
+    """
+    # source-uri might contain unforeseen character, fragment ids append '+<offset>+<length>' to the sequence number
+    _, creation_time, sequence_number = bundle_id.rsplit('-', 2)
+    return int(creation_time), int(sequence_number.split('+', 1)[0])
 
 
 def get_oldest_bundle_id(bundle_ids: Iterable[str]):
@@ -32,11 +51,9 @@ def get_oldest_bundle_id(bundle_ids: Iterable[str]):
     for bundle_id in bundle_ids:
         if oldest is None:
             oldest = bundle_id
-            _, oldest_time, oldest_num = oldest.rsplit('-', 2)  # source-uri might contain unforeseen character
-            oldest_time, oldest_num = int(oldest_time), int(oldest_num)
+            oldest_time, oldest_num = get_creation_timestamp(oldest)
         else:
-            _, bundle_time, bundle_num = bundle_id.rsplit('-', 2)  # source-uri might contain unforeseen character
-            bundle_time, bundle_num = int(bundle_time), int(bundle_num)
+            bundle_time, bundle_num = get_creation_timestamp(bundle_id)
 
             if is_x_older(bundle_time, bundle_num, oldest_time, oldest_num):
                 oldest, oldest_time, oldest_num = bundle_id, bundle_time, bundle_num
@@ -70,6 +87,36 @@ def is_timestamp_older_than_timeout(clock_timestamp_millis: int, timeout_millis:
     return time.time_ns() // 1000000 - clock_timestamp_millis >= timeout_millis
 
 
+class _NoLock:
+
+    def acquire(self, waitflag: bool = True) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def allocate_lock():
+    """
+    returns a lock, or a no-op lock if the platform has no threads
+    """
+    if _thread is None:
+        return _NoLock()
+    return _thread.allocate_lock()
+
+
+def get_thread_ident() -> int:
+    if _thread is None:
+        return 0
+    return _thread.get_ident()
+
+
 def debug(*args):
     if CONFIGURATION.DEBUG:
         print(*args)
@@ -106,6 +153,7 @@ def is_correct_endpoint_uri(endpoint_uri: str) -> bool:
 def is_correct_group_uri(group_uri: str) -> bool:
     """match description:
     dtn -> one or more characters (except "~" or "/"), then zero or more "/"+one or more characters (except "~" or "/"), ending with "/~"+one or more characters (except "~" or "/")
+           or ending with "/" (prefix pattern), the wildcard segments "*" and "~*" are matched as normal characters
     ipn -> no group registration
 
     Currently used only on group-endpoint registration by the bpa to check the validity of a full-group-uri.
@@ -123,3 +171,81 @@ def build_broadcast_ipv4_address(address: str, subnet: str) -> str:
         address_parts[idx] = str(int(address_parts[idx]) & subnet_part | inverse_subnet_part)
 
     return '.'.join(address_parts)
+
+
+class SocketPoller:
+    """
+    readiness notification for a changing set of sockets
+
+    CPython uses the best selector of the platform (epoll on linux), MicroPython uses select.poll.
+    Sockets must be unregistered before they are closed.
+    """
+
+    def __init__(self):
+        if RUNNING_MICROPYTHON:
+            self.poller = select.poll()
+            self.registered = {}  # socket -> (data, events)
+        else:
+            self.poller = selectors.DefaultSelector()
+
+    def __len__(self) -> int:
+        if RUNNING_MICROPYTHON:
+            return len(self.registered)
+        return len(self.poller.get_map())
+
+    def register(self, sock, data: Any = None, writable: bool = False):
+        if RUNNING_MICROPYTHON:
+            events = select.POLLIN | select.POLLOUT if writable else select.POLLIN
+            self.registered[sock] = (data, events)
+            self.poller.register(sock, events)
+        else:
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE if writable else selectors.EVENT_READ
+            self.poller.register(sock, events, data)
+
+    def modify(self, sock, data: Any = None, writable: bool = False):
+        if RUNNING_MICROPYTHON:
+            events = select.POLLIN | select.POLLOUT if writable else select.POLLIN
+            self.registered[sock] = (data, events)
+            self.poller.modify(sock, events)
+        else:
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE if writable else selectors.EVENT_READ
+            self.poller.modify(sock, events, data)
+
+    def unregister(self, sock):
+        if RUNNING_MICROPYTHON:
+            if self.registered.pop(sock, None) is not None:
+                self.poller.unregister(sock)
+        else:
+            try:
+                self.poller.unregister(sock)
+            except (KeyError, ValueError):
+                pass  # not registered
+
+    def poll(self, timeout_milliseconds: int) -> List[Any]:
+        """
+        blocks until at least one socket is ready or the timeout (None -> infinite) passed
+
+        returns a list of (socket, data, readable, writable) tuples
+        """
+        result = []
+
+        if RUNNING_MICROPYTHON:
+            for event in self.poller.poll(-1 if timeout_milliseconds is None else timeout_milliseconds):
+                sock, flags = event[0], event[1]
+                data, _ = self.registered.get(sock, (None, 0))
+                # errors and hang-ups are reported as readable, the following read surfaces them
+                readable = bool(flags & (select.POLLIN | select.POLLERR | select.POLLHUP))
+                result.append((sock, data, readable, bool(flags & select.POLLOUT)))
+        else:
+            try:
+                events = self.poller.select(None if timeout_milliseconds is None else timeout_milliseconds / 1000.0)
+            except OSError:
+                return result  # interrupted or a socket got closed behind our back
+            for key, flags in events:
+                result.append((key.fileobj, key.data, bool(flags & selectors.EVENT_READ), bool(flags & selectors.EVENT_WRITE)))
+
+        return result
+
+    def close(self):
+        if not RUNNING_MICROPYTHON:
+            self.poller.close()
@@ -0,0 +1,33 @@
+"""
+Shared helpers of the test scripts (the directory of the running script is on the import path).
+"""
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock, PayloadBlock, HopCountBlock
+
+try:
+    from cbor2 import dumps
+except ImportError:
+    from cbor import dumps
+
+
+def create_bundle(sequence_number: int, payload: bytes = b'', full_destination_uri: str = 'dtn://node2/sink', bundle_creation_time: int = 1) -> Bundle:
+    """ a minimal bundle from dtn://node1/source, the sequence number makes the bundle id unique
+
+    bundle_creation_time -> a current dtn timestamp for bundles processed by a bpa, which discards the expired default
+    """
+    return Bundle(
+        primary_block=PrimaryBlock.from_objects(
+            full_destination_uri=full_destination_uri,
+            full_source_uri='dtn://node1/source',
+            full_report_to_uri='dtn://node1/',
+            bundle_creation_time=bundle_creation_time,
+            sequence_number=sequence_number
+        ),
+        hop_count_block=HopCountBlock.from_objects(hop_limit=32, hop_count=0),
+        payload_block=PayloadBlock.from_objects(data=payload)
+    )
+
+
+def create_mtcp_message(sequence_number: int, payload: bytes = b'') -> bytes:
+    """ a bundle framed as mtcp message (cbor byte string) """
+    return dumps(create_bundle(sequence_number, payload).to_cbor())
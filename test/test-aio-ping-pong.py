@@ -0,0 +1,108 @@
+"""
+To be run on CPython or MicroPython.
+
+Runs two async bundle protocol agents on one event loop and lets them exchange bundles over the async mtcp cla, and
+checks that a bundle only counts as forwarded once the async mtcp cla drained it into the connection.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+from dtn7zero.aio import AsyncBundleProtocolAgent, AsyncMTcpCLA, AsyncLocalEndpoint
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.data import Node, BundleInformation
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from helpers import create_bundle
+
+CONFIGURATION.IPND.ENABLED = False
+
+
+class FakeWriter:
+    """ an established outgoing connection, whose drain fails if the remote reset it """
+
+    def __init__(self, reset: bool):
+        self.reset = reset
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+    async def drain(self):
+        if self.reset:
+            raise OSError('connection reset by peer')
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+def create_bpa(full_node_uri: str, port: int, other_node_specific_part: str, other_port: int) -> AsyncBundleProtocolAgent:
+    storage = SimpleInMemoryStorage()
+    storage.add_node(Node('127.0.0.1', (1, other_node_specific_part), {CONFIGURATION.IPND.IDENTIFIER_MTCP: other_port}, 0))
+    router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: AsyncMTcpCLA(port)}, storage)
+    return AsyncBundleProtocolAgent(full_node_uri, storage, router)
+
+
+async def main():
+    bpa1 = create_bpa('dtn://node1/', 16001, '//node2/', 16002)
+    bpa2 = create_bpa('dtn://node2/', 16002, '//node1/', 16001)
+
+    ping = bpa1.register_endpoint(AsyncLocalEndpoint('ping'))
+    pong = bpa2.register_endpoint(AsyncLocalEndpoint('pong'))
+
+    bpa1.start()
+    bpa2.start()
+
+    for counter in range(10):
+        payload = str(counter).encode()
+        print('sending ping: {}'.format(payload))
+        await ping.send(payload, 'dtn://node2/pong')
+
+        bundle = await asyncio.wait_for(pong.receive(), 5)
+        print('sending back pong: {}'.format(bundle.payload_block.data))
+        await pong.send(bundle.payload_block.data, bundle.primary_block.full_source_uri)
+
+        bundle = await asyncio.wait_for(ping.receive(), 5)
+        print('received pong: {}'.format(bundle.payload_block.data))
+        assert bundle.payload_block.data == payload
+
+    bpa1.task.cancel()
+    bpa2.task.cancel()
+    await asyncio.sleep(0.1)
+
+
+async def forward_over(reset: bool) -> (BundleInformation, Node):
+    storage = SimpleInMemoryStorage()
+    storage.add_node(Node('127.0.0.1', (1, '//node2/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: 16003}, 0))
+    cla = AsyncMTcpCLA(16004)
+    cla.send_connections[('127.0.0.1', 16003)] = FakeWriter(reset)
+    router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: cla}, storage)
+
+    bundle_information = BundleInformation(create_bundle(0))
+    node = storage.get_node('127.0.0.1')
+
+    router.immediate_forwarding_attempt('dtn://node1/', bundle_information)
+    assert bundle_information.is_forwarding_to(node) and not bundle_information.was_forwarded_to(node)
+
+    await asyncio.sleep(0.1)
+    assert not bundle_information.is_forwarding_to(node)
+    return bundle_information, node
+
+
+async def check_forwarding_results():
+    bundle_information, node = await forward_over(reset=False)
+    assert bundle_information.was_forwarded_to(node)
+
+    bundle_information, node = await forward_over(reset=True)
+    assert not bundle_information.was_forwarded_to(node)
+    assert node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP).is_backed_off()
+
+
+asyncio.run(main())
+asyncio.run(check_forwarding_results())
+
+print('aio tests passed')
@@ -0,0 +1,69 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the bounded local dispatch queue: would-block results, self-draining blocking sends, capacity callbacks and
+(CPython only) blocking sends woken up by the thread draining the queue.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+CONFIGURATION.LOCAL_DISPATCH_QUEUE_SIZE = 5
+
+from dtn7zero import setup, update
+import dtn7zero.api
+
+try:
+    import threading
+except ImportError:
+    threading = None
+
+received = []
+node_endpoint = setup("dtn://node1/", lambda payload, *args: received.append(payload))
+
+# non-blocking sends report would-block as soon as the queue is full
+results = [node_endpoint.send(str(idx).encode(), "dtn://node1/", timeout_milliseconds=0) for idx in range(7)]
+print('non-blocking send results: {}'.format(results))
+assert results == [True] * 5 + [False] * 2
+
+notified = []
+node_endpoint.notify_when_writable(lambda: notified.append(True))
+assert not notified
+
+# a blocking send without an update thread drains the queue itself
+assert node_endpoint.send(b'blocking', "dtn://node1/")
+assert notified
+
+while update():
+    pass
+
+print('received: {}'.format(received))
+assert received == [b'0', b'1', b'2', b'3', b'4', b'blocking']
+
+if threading is not None:
+    # another thread updates -> the blocked producer waits for the pop of the queue, not in the idle wait of the bpa
+    results = [node_endpoint.send(str(idx).encode(), "dtn://node1/", timeout_milliseconds=0) for idx in range(5)]
+    assert results == [True] * 5
+
+    bpa = dtn7zero.api.BPA
+    idle_waits = []
+    original_wait = bpa.wait
+    bpa.wait = lambda *args: idle_waits.append(args) or original_wait(*args)
+
+    with bpa.update_lock:
+        producer = threading.Thread(target=lambda: results.append(node_endpoint.send(b'woken', "dtn://node1/", timeout_milliseconds=5000)))
+        producer.start()
+        time.sleep(0.05)
+        assert len(results) == 5 and idle_waits == []
+
+        start = time.time()
+        bpa.local_bundle_dispatch_queue.pop()
+        producer.join()
+
+    print('producer woken after {:.1f} ms'.format((time.time() - start) * 1000))
+    assert results[5] is True
+
+    while update():
+        pass
+    assert received[-1] == b'woken'
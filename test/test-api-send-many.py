@@ -0,0 +1,51 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the bulk send api: send_many(...) with destination addresses and reusable templates, partial sends on a full
+local dispatch queue and the filling of the queue at once.
+"""
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+CONFIGURATION.LOCAL_DISPATCH_QUEUE_SIZE = 5
+
+from dtn7zero import setup, register, update, BundlePriority
+
+received = []
+primary_blocks = []
+
+
+def receive(payload, full_source_uri, full_destination_uri, primary_block):
+    received.append(payload)
+    primary_blocks.append(primary_block)
+
+
+node_endpoint = setup("dtn://node1/")
+register("telemetry", receive)
+
+# non-blocking: only the free capacity is filled
+assert node_endpoint.send_many([str(idx).encode() for idx in range(7)], "dtn://node1/telemetry", timeout_milliseconds=0) == 5
+
+while update():
+    pass
+
+assert received == [b'0', b'1', b'2', b'3', b'4']
+
+# blocking: the queue is drained in between (without update thread by the sending thread itself)
+template = node_endpoint.create_template("dtn://node1/telemetry", priority=BundlePriority.EXPEDITED)
+payloads = [str(idx).encode() for idx in range(5, 17)]
+
+assert node_endpoint.send_many(payloads, template) == len(payloads)
+assert node_endpoint.send_many([b'last'], template) == 1
+
+while update():
+    pass
+
+print('received: {}'.format(received))
+
+assert received == [str(idx).encode() for idx in range(17)] + [b'last']
+
+# all bundles have unique creation timestamps
+timestamps = set((primary_block.bundle_creation_time, primary_block.sequence_number) for primary_block in primary_blocks)
+assert len(timestamps) == len(received)
+assert all(primary_block.full_source_uri == "dtn://node1/" for primary_block in primary_blocks)
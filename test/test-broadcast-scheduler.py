@@ -0,0 +1,108 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the trickle rebroadcast pacing, the counting of sent broadcasts only, the forgetting and eviction of tracked
+bundles and the airtime budget of the broadcast scheduler.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+
+from dtn7zero.broadcast_scheduler import BroadcastScheduler, AirtimeBudget
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.data import BundleInformation, BundleStatusReportReasonCodes
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import get_current_clock_millis, is_timestamp_older_than_timeout
+from helpers import create_bundle
+
+CONFIGURATION.BROADCAST.TRICKLE_INTERVAL_MIN_MILLISECONDS = 20
+CONFIGURATION.BROADCAST.TRICKLE_INTERVAL_MAX_MILLISECONDS = 80
+
+
+scheduler = BroadcastScheduler()
+broadcast_times = []
+
+start = get_current_clock_millis()
+while not is_timestamp_older_than_timeout(start, 1500):
+    if scheduler.should_broadcast('dtn://node1/-0-1'):
+        scheduler.broadcast_sent('dtn://node1/-0-1')
+        broadcast_times.append(get_current_clock_millis() - start)
+    time.sleep(0.001)
+
+print('broadcast at milliseconds: {}'.format(broadcast_times))
+
+assert broadcast_times[0] < 5  # first broadcast is immediate
+assert len(broadcast_times) == CONFIGURATION.BROADCAST.MAX_REBROADCASTS
+
+
+# hearing enough duplicates of a bundle suppresses the own rebroadcast in the current interval
+scheduler = BroadcastScheduler()
+
+for _ in range(CONFIGURATION.BROADCAST.TRICKLE_REDUNDANCY_CONSTANT):
+    scheduler.heard_duplicate('dtn://node1/-0-2')
+
+start = get_current_clock_millis()
+suppressed = True
+while not is_timestamp_older_than_timeout(start, CONFIGURATION.BROADCAST.TRICKLE_INTERVAL_MIN_MILLISECONDS - 2):
+    if scheduler.should_broadcast('dtn://node1/-0-2'):
+        suppressed = False
+    time.sleep(0.001)
+
+assert suppressed
+
+
+# a broadcast refused by the cla (e.g. airtime budget) stays due and is not counted
+scheduler = BroadcastScheduler()
+
+assert scheduler.should_broadcast('dtn://node1/-0-3')
+assert scheduler.should_broadcast('dtn://node1/-0-3')
+assert scheduler.states['dtn://node1/-0-3'][4] == 0  # rebroadcasts
+
+scheduler.broadcast_sent('dtn://node1/-0-3')
+assert not scheduler.should_broadcast('dtn://node1/-0-3')
+assert scheduler.states['dtn://node1/-0-3'][4] == 1
+
+# bundles that left the storage are forgotten, the earliest tracked bundle is evicted first
+scheduler.forget('dtn://node1/-0-3')
+assert scheduler.states == {} and scheduler.tracking_order == []
+
+for idx in range(CONFIGURATION.BROADCAST.MAX_TRACKED_BUNDLES + 1):
+    scheduler.should_broadcast('dtn://node1/-{}-0'.format(1000 - idx))
+assert len(scheduler.states) == CONFIGURATION.BROADCAST.MAX_TRACKED_BUNDLES
+assert 'dtn://node1/-1000-0' not in scheduler.states
+assert 'dtn://node1/-999-0' in scheduler.states
+
+# a forgotten bundle leaves the tracking order, the newest bundle is never evicted
+scheduler.forget('dtn://node1/-998-0')
+scheduler.should_broadcast('dtn://node2/-0-0')
+scheduler.should_broadcast('dtn://node2/-0-1')
+assert len(scheduler.states) == CONFIGURATION.BROADCAST.MAX_TRACKED_BUNDLES
+assert 'dtn://node1/-999-0' not in scheduler.states and 'dtn://node1/-997-0' in scheduler.states
+assert scheduler.tracking_order[-2:] == ['dtn://node2/-0-0', 'dtn://node2/-0-1']
+assert sorted(scheduler.tracking_order) == sorted(scheduler.states)
+
+# the bpa lets the router forget a deleted bundle
+storage = SimpleInMemoryStorage()
+router = SimpleEpidemicRouter({}, storage)
+bpa = BundleProtocolAgent('dtn://node1/', storage, router)
+
+bundle = create_bundle(0)
+scheduler = router.broadcast_schedulers[CONFIGURATION.IPND.IDENTIFIER_ESPNOW]
+assert scheduler.should_broadcast(bundle.bundle_id)
+
+bpa.bundle_deletion(BundleInformation(bundle), BundleStatusReportReasonCodes.LIFETIME_EXPIRED)
+assert bundle.bundle_id not in scheduler.states
+
+
+budget = AirtimeBudget(duty_cycle=0.01, window_milliseconds=1000)  # 10 milliseconds of airtime per second
+
+assert budget.has_budget()
+budget.consume(20)
+assert not budget.has_budget()
+time.sleep(1.2)
+assert budget.has_budget()
+
+print('broadcast scheduler test successful')
@@ -0,0 +1,75 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the CRC-16/X.25 and CRC-32C engines, the crc computation on bundle serialization and the crc verification on
+bundle deserialization (including fragments and zero-copy decoding).
+"""
+from dtn7zero.crc import crc16_x25, crc32c, calculate_crc
+from dtn7zero.fragmentation import fragment_bundle
+from dtn7zero.serialization import serialize_bundle, deserialize_bundle, FragmentBundle
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock, PayloadBlock, HopCountBlock, CRC_TYPE_X25, CRC_TYPE_CRC32C
+
+try:
+    from cbor2 import dumps
+except ImportError:
+    from cbor import dumps
+
+# check values of the crc catalogue
+assert crc16_x25(b'123456789') == 0x906e
+assert crc32c(b'123456789') == 0xe3069283
+assert crc16_x25(b'56789', crc16_x25(b'1234')) == 0x906e
+assert crc32c(b'56789', crc32c(b'1234')) == 0xe3069283
+
+primary_block = PrimaryBlock.from_objects(
+    full_destination_uri='dtn://node2/sink',
+    full_source_uri='dtn://node1/source',
+    full_report_to_uri='dtn://node1/',
+    bundle_creation_time=1,
+    sequence_number=3
+)
+primary_block.crc_type = CRC_TYPE_X25
+
+hop_count_block = HopCountBlock.from_objects(hop_limit=32, hop_count=0)
+hop_count_block.crc_type = CRC_TYPE_CRC32C
+
+payload_block = PayloadBlock.from_objects(data=b'checked payload' * 100)
+payload_block.crc_type = CRC_TYPE_CRC32C
+
+bundle = Bundle(primary_block=primary_block, hop_count_block=hop_count_block, payload_block=payload_block)
+serialized_bundle = serialize_bundle(bundle)
+
+# the crc of the primary block, computed over the block with the crc field set to zeros
+encoded_primary_block = dumps(primary_block.to_block_data() + (bytes(2),))
+expected_crc = calculate_crc(CRC_TYPE_X25, encoded_primary_block).to_bytes(2, 'big')
+assert serialized_bundle[1:1 + len(encoded_primary_block)] == encoded_primary_block[:-2] + expected_crc
+
+for zero_copy in (False, True):
+    received_bundle = deserialize_bundle(bytearray(serialized_bundle), zero_copy=zero_copy)
+
+    assert received_bundle.bundle_id == bundle.bundle_id
+    assert received_bundle.primary_block.crc_type == CRC_TYPE_X25
+    assert received_bundle.payload_block.crc_type == CRC_TYPE_CRC32C
+    assert bytes(received_bundle.payload_block.data) == payload_block.data
+    assert serialize_bundle(received_bundle) == serialized_bundle
+
+# a flipped bit in any block is detected
+for position in (10, len(serialized_bundle) // 2, len(serialized_bundle) - 10):
+    corrupted_bundle = bytearray(serialized_bundle)
+    corrupted_bundle[position] ^= 0x01
+
+    for zero_copy in (False, True):
+        try:
+            deserialize_bundle(corrupted_bundle, zero_copy=zero_copy)
+        except ValueError as e:
+            print('detected corruption at {}: {}'.format(position, e))
+        else:
+            raise AssertionError('corruption at {} was not detected'.format(position))
+
+# fragments keep the crc of the primary block
+fragments = [deserialize_bundle(serialize_bundle(fragment)) for fragment in fragment_bundle(bundle, 300)]
+assert all(isinstance(fragment, FragmentBundle) for fragment in fragments)
+assert all(fragment.primary_block.crc_type == CRC_TYPE_X25 for fragment in fragments)
+assert b''.join(fragment.payload_block.data for fragment in fragments) == payload_block.data
+
+print('crc tests passed')
@@ -0,0 +1,60 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the local bundle dispatch queue: the priority classes are served highest first (FIFO inside a class), all classes
+share one capacity, partial extends and the one-shot capacity callbacks.
+"""
+from dtn7zero.data import BundleDispatchQueue, BundleInformation
+from dtn7zero.extension_blocks import BundlePriority, create_bundle_priority_block
+from helpers import create_bundle
+
+
+def create_bundle_information(sequence_number: int, priority: int) -> BundleInformation:
+    bundle = create_bundle(sequence_number)
+    bundle.insert_canonical_block(create_bundle_priority_block(priority))
+    return BundleInformation(bundle)
+
+
+def pop_sequence_numbers(queue: BundleDispatchQueue) -> list:
+    sequence_numbers = []
+    while queue:
+        sequence_numbers.append(queue.pop().bundle.primary_block.sequence_number)
+    return sequence_numbers
+
+
+queue = BundleDispatchQueue(6)
+priorities = [BundlePriority.BULK, BundlePriority.NORMAL, BundlePriority.EXPEDITED] * 2
+
+for idx, priority in enumerate(priorities):
+    assert queue.append(create_bundle_information(idx, priority))
+assert len(queue) == 6 and queue.is_full()
+
+# the capacity is shared, a full queue refuses every priority class
+assert not queue.append(create_bundle_information(6, BundlePriority.EXPEDITED))
+assert not queue.append(create_bundle_information(7, BundlePriority.BULK))
+assert queue.extend([create_bundle_information(8, BundlePriority.EXPEDITED)]) == 0
+
+# highest priority class first, FIFO inside a class
+assert pop_sequence_numbers(queue) == [2, 5, 1, 4, 0, 3]
+assert queue.pop() is None and not queue.is_full()
+
+# extend fills the free capacity in order
+assert queue.append(create_bundle_information(10, BundlePriority.NORMAL))
+assert queue.extend([create_bundle_information(idx, BundlePriority.BULK) for idx in range(11, 20)]) == 5
+assert queue.is_full()
+assert pop_sequence_numbers(queue) == [10, 11, 12, 13, 14, 15]
+
+# capacity callbacks: immediately if not full, otherwise once on the next pop
+notified = []
+queue.add_capacity_callback(lambda: notified.append('immediate'))
+assert notified == ['immediate']
+
+assert queue.extend([create_bundle_information(idx, BundlePriority.NORMAL) for idx in range(20, 26)]) == 6
+queue.add_capacity_callback(lambda: notified.append('on pop'))
+assert notified == ['immediate']
+
+queue.pop()
+queue.pop()
+assert notified == ['immediate', 'on pop']
+
+print('dispatch queue tests passed')
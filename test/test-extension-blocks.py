@@ -0,0 +1,86 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the extension block handler registry: validation on reception, updates on forwarding, the pass-through of
+unknown blocks and the bundle priority block.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+
+from dtn7zero import setup, register, update
+from dtn7zero.data import BundleInformation
+from dtn7zero.extension_blocks import ExtensionBlockHandler, register_extension_block_handler, create_extension_block, \
+    get_bundle_priority, create_bundle_priority_block, BundlePriority
+from dtn7zero.routers import Router
+from dtn7zero.serialization import serialize_bundle, deserialize_bundle
+from py_dtn7 import Bundle, to_dtn_timestamp
+from py_dtn7.bundle import CanonicalBlock, BlockProcessingControlFlags
+import dtn7zero.api
+from helpers import create_bundle
+
+BLOCK_TYPE_COPY_BUDGET = 200
+BLOCK_TYPE_UNKNOWN = 222
+
+
+class CopyBudgetBlockHandler(ExtensionBlockHandler):
+    updates_on_forward = True
+
+    def validate(self, bundle, value):
+        return isinstance(value, int) and value >= 0
+
+    def update_on_forward(self, full_node_uri, bundle, value):
+        return value - 1
+
+
+register_extension_block_handler(BLOCK_TYPE_COPY_BUDGET, CopyBudgetBlockHandler())
+
+try:
+    register_extension_block_handler(10, CopyBudgetBlockHandler())
+except Exception:
+    pass
+else:
+    raise AssertionError('the hop count block must not be overridden')
+
+
+def create_extension_bundle(sequence_number: int, copy_budget: int) -> Bundle:
+    bundle = create_bundle(sequence_number, str(copy_budget).encode(), 'dtn://node1/app', to_dtn_timestamp())
+    bundle.insert_canonical_block(create_extension_block(BLOCK_TYPE_COPY_BUDGET, copy_budget))
+    bundle.insert_canonical_block(CanonicalBlock(BLOCK_TYPE_UNKNOWN, 1, BlockProcessingControlFlags(0), 0, b'\xff\xfe not cbor'))
+    bundle.insert_canonical_block(create_bundle_priority_block(BundlePriority.BULK))
+    return bundle
+
+
+# forwarding: the handler updates its block, the unknown block is passed through unchanged
+bundle = create_extension_bundle(0, 3)
+forwarded_bundle = deserialize_bundle(serialize_bundle(Router().prepare_bundle('dtn://node3/', BundleInformation(bundle))))
+
+blocks = {block.block_type_code: block for block in forwarded_bundle.other_blocks}
+assert blocks[BLOCK_TYPE_COPY_BUDGET].data == CopyBudgetBlockHandler().encode(2)
+assert blocks[BLOCK_TYPE_UNKNOWN].data == b'\xff\xfe not cbor'
+assert forwarded_bundle.hop_count_block.hop_count == 1
+assert get_bundle_priority(forwarded_bundle) == BundlePriority.BULK
+
+# the stored bundle is not altered
+assert bundle.other_blocks[0].data == CopyBudgetBlockHandler().encode(3)
+assert bundle.hop_count_block.hop_count == 0
+
+# reception: invalid blocks delete the bundle
+received = []
+setup("dtn://node1/")
+register("app", lambda payload, *args: received.append(payload))
+
+for sequence_number, copy_budget in enumerate((1, -1, 0)):
+    dtn7zero.api.BPA.bundle_reception(BundleInformation(create_extension_bundle(sequence_number, copy_budget)))
+
+start = time.time()
+while time.time() - start < 0.5:
+    if not update():
+        time.sleep(0.01)
+
+print('received: {}'.format(received))
+assert received == [b'1', b'0']
+
+print('extension block tests passed')
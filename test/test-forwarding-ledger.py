@@ -0,0 +1,59 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the forwarding ledger of a bundle (a bitmap over the node indices of the storage): a re-added node keeps its
+index and thereby its ledger bit, a new node never takes over the bit of another node, and asynchronous transmissions.
+"""
+from dtn7zero.data import Node, BundleInformation
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from helpers import create_bundle
+
+
+def create_node(address: str, eid: str) -> Node:
+    return Node(address, (1, eid), {'mtcp': 16100}, 0)
+
+
+storage = SimpleInMemoryStorage()
+storage.add_node(create_node('10.0.0.1', '//node1/'))
+storage.add_node(create_node('10.0.0.2', '//node2/'))
+node1, node2 = storage.get_node('10.0.0.1'), storage.get_node('10.0.0.2')
+assert (node1.index, node2.index) == (0, 1)
+
+bundle_information = BundleInformation(create_bundle(0))
+bundle_information.mark_forwarded_to(node1)
+bundle_information.mark_forwarded_to(node1)
+assert bundle_information.was_forwarded_to(node1) and not bundle_information.was_forwarded_to(node2)
+assert bundle_information.forwarded_to_nodes == 0b01 and bundle_information.forwarded_to_nodes_count == 1
+
+# a re-discovered node (new node object for the same address) keeps its index, the bundle stays forwarded to it
+storage.add_node(create_node('10.0.0.1', '//node1-restarted/'))
+rediscovered_node1 = storage.get_node('10.0.0.1')
+assert rediscovered_node1 is not node1 and rediscovered_node1.index == 0
+assert bundle_information.was_forwarded_to(rediscovered_node1)
+
+# a new node gets a fresh index, even if an older node was replaced in between
+storage.add_node(create_node('10.0.0.3', '//node3/'))
+node3 = storage.get_node('10.0.0.3')
+assert node3.index == 2
+assert not bundle_information.was_forwarded_to(node3)
+
+# asynchronous transmissions: only a successful completion marks the node as forwarded to
+bundle_information.mark_forwarding_to(node2)
+bundle_information.mark_forwarding_to(node3)
+assert bundle_information.is_forwarding_to(node2) and bundle_information.is_forwarding_to(node3)
+
+bundle_information.complete_forwarding_to(node2, False)
+bundle_information.complete_forwarding_to(node3, True)
+assert bundle_information.forwarding_to_nodes == 0
+assert not bundle_information.was_forwarded_to(node2) and bundle_information.was_forwarded_to(node3)
+assert bundle_information.forwarded_to_nodes == 0b101 and bundle_information.forwarded_to_nodes_count == 2
+
+# indices beyond a machine word
+for idx in range(4, 100):
+    storage.add_node(create_node('10.0.1.{}'.format(idx), '//node{}/'.format(idx)))
+far_node = storage.get_node('10.0.1.99')
+assert far_node.index == 98
+bundle_information.mark_forwarded_to(far_node)
+assert bundle_information.was_forwarded_to(far_node) and bundle_information.forwarded_to_nodes_count == 3
+
+print('forwarding ledger tests passed')
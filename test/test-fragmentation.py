@@ -0,0 +1,99 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the proactive fragmentation to a cla mtu, the reactive fragmentation of an interrupted transfer, and the
+reassembly of the fragments (in memory and spilled to files).
+"""
+import os
+import random
+
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.extension_blocks import create_bundle_priority_block, BundlePriority
+from dtn7zero.fragmentation import fragment_bundle, create_reactive_fragment, Reassembler
+from dtn7zero.serialization import deserialize_bundle, FragmentBundle
+from dtn7zero.utility import get_creation_timestamp, get_oldest_bundle_id
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock, PayloadBlock, HopCountBlock, BundleAgeBlock, BundleProcessingControlFlags
+
+MTU = 250
+
+payload = bytes(random.getrandbits(8) for _ in range(50 * 1024))
+
+bundle = Bundle(
+    primary_block=PrimaryBlock.from_objects(
+        full_destination_uri='dtn://node2/image',
+        full_source_uri='dtn://node1/camera',
+        full_report_to_uri='dtn://node1/',
+        bundle_creation_time=0,
+        sequence_number=7
+    ),
+    bundle_age_block=BundleAgeBlock.from_objects(age_milliseconds=12),
+    hop_count_block=HopCountBlock.from_objects(hop_limit=32, hop_count=0),
+    payload_block=PayloadBlock.from_objects(data=payload),
+    other_blocks=[create_bundle_priority_block(BundlePriority.EXPEDITED)]
+)
+
+# proactive fragmentation
+fragments = [fragment.to_cbor() for fragment in fragment_bundle(bundle, MTU)]
+print('{} byte payload -> {} fragments'.format(len(payload), len(fragments)))
+
+assert all(len(fragment) <= MTU for fragment in fragments)
+
+fragment_bundles = [deserialize_bundle(fragment) for fragment in fragments]
+assert all(isinstance(fragment, FragmentBundle) for fragment in fragment_bundles)
+assert len(set(fragment.bundle_id for fragment in fragment_bundles)) == len(fragments)
+assert all(fragment.original_bundle_id == bundle.bundle_id for fragment in fragment_bundles)
+assert all(fragment.bundle_age_block is not None for fragment in fragment_bundles)  # creation time is zero
+
+# the creation timestamp of a fragment id is parsed like the one of a bundle id (eviction from the seen-set)
+assert all(get_creation_timestamp(fragment.bundle_id) == (0, 7) for fragment in fragment_bundles)
+assert get_oldest_bundle_id([fragment_bundles[1].bundle_id, 'dtn://node-1/camera-0-8', fragment_bundles[0].bundle_id]) == fragment_bundles[1].bundle_id
+assert get_oldest_bundle_id([fragment_bundles[0].bundle_id, 'dtn://node-1/camera-0-6']) == 'dtn://node-1/camera-0-6'
+
+# out of order reassembly with duplicates
+random.shuffle(fragment_bundles)
+reassembler = Reassembler()
+results = [reassembler.add(fragment) for fragment in fragment_bundles[:10] + fragment_bundles]
+reassembled = [result for result in results if result is not None]
+
+assert len(reassembled) == 1
+assert reassembled[0].bundle_id == bundle.bundle_id
+assert reassembled[0].payload_block.data == payload
+assert reassembled[0].other_blocks[0].data == bundle.other_blocks[0].data
+assert not reassembler.buffers
+
+# reactive fragmentation: the transfer broke after 1000 bytes, the rest arrives in proactive fragments
+serialized_bundle = bundle.to_cbor()
+reactive_fragment = deserialize_bundle(create_reactive_fragment(serialized_bundle[:1000]).to_cbor())
+print('reactive fragment: {} payload bytes'.format(len(reactive_fragment.payload_block.data)))
+
+assert reactive_fragment.primary_block.fragment_offset == 0
+assert payload.startswith(reactive_fragment.payload_block.data)
+assert create_reactive_fragment(serialized_bundle[:20]) is None  # the primary block is incomplete
+
+# the remainder (overlapping the received part) arrives as proactive fragments
+received_length = len(reactive_fragment.payload_block.data)
+remainder = [fragment for fragment in fragment_bundles if fragment.primary_block.fragment_offset + len(fragment.payload_block.data) > received_length]
+remainder.sort(key=lambda fragment: fragment.primary_block.fragment_offset)
+
+assert reassembler.add(reactive_fragment) is None
+reassembled = [reassembler.add(fragment) for fragment in remainder]
+assert reassembled[-1].payload_block.data == payload
+
+# spilling to files if the reassembly memory is exhausted
+CONFIGURATION.FRAGMENTATION.MAX_REASSEMBLY_MEMORY_BYTES = 1024
+CONFIGURATION.FRAGMENTATION.SPILL_DIRECTORY = 'test-reassembly'
+
+reassembler = Reassembler()
+results = [reassembler.add(deserialize_bundle(fragment)) for fragment in fragments]
+assert results[-1].payload_block.data == payload
+assert reassembler.memory_bytes == 0
+os.rmdir('test-reassembly')  # the spill files are removed after the reassembly
+
+# bundles flagged "do not fragment" stay whole
+flags = BundleProcessingControlFlags(0)
+flags.set_flag(2)
+bundle.primary_block.bundle_processing_control_flags = flags
+assert fragment_bundle(bundle, MTU) is None
+
+print('fragmentation tests passed')
@@ -0,0 +1,81 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the group endpoint trie (exact, wildcard and prefix patterns) and the delivery of bundles to matching
+group-endpoints.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+
+from dtn7zero import setup, register, register_group, update
+from dtn7zero.group_matching import GroupEndpointTrie
+from dtn7zero.utility import is_correct_group_uri
+import dtn7zero.api
+
+assert is_correct_group_uri('dtn://news/~sport')
+assert is_correct_group_uri('dtn://news/~*')
+assert is_correct_group_uri('dtn://*/~alerts')
+assert is_correct_group_uri('dtn://sensors/building1/')
+assert not is_correct_group_uri('dtn://news/~sport/')
+assert not is_correct_group_uri('ipn://1.2')
+
+trie = GroupEndpointTrie()
+trie.insert('dtn://news/~sport', 'sport')
+trie.insert('dtn://news/~*', 'all-news')
+trie.insert('dtn://*/~alerts', 'alerts')
+trie.insert('dtn://sensors/building1/', 'building1')
+trie.insert('dtn://sensors/building1/', 'building1-logger')
+
+assert sorted(trie.match('dtn://news/~sport')) == ['all-news', 'sport']
+assert trie.match('dtn://news/~weather') == ['all-news']
+assert sorted(trie.match('dtn://news/~alerts')) == ['alerts', 'all-news']
+assert trie.match('dtn://news/sport') == []
+assert trie.match('dtn://news/sub/~sport') == []
+assert sorted(trie.match('dtn://sensors/building1/floor2/~humidity')) == ['building1', 'building1-logger']
+assert trie.match('dtn://sensors/building2/~temp') == []
+assert trie.match('ipn://1.2') == []
+
+assert trie.remove('dtn://sensors/building1/', 'building1')
+assert not trie.remove('dtn://sensors/building1/', 'building1')
+assert not trie.remove('dtn://news/~weather', 'all-news')
+assert trie.match('dtn://sensors/building1/~temp') == ['building1-logger']
+
+for full_group_uri, endpoint in (('dtn://news/~sport', 'sport'), ('dtn://news/~*', 'all-news'), ('dtn://*/~alerts', 'alerts'), ('dtn://sensors/building1/', 'building1-logger')):
+    assert trie.remove(full_group_uri, endpoint)
+assert len(trie) == 0 and not trie.root.children  # empty branches are pruned
+
+# delivery over the bundle protocol agent
+received = {'all-news': [], 'sport': [], 'unicast': []}
+
+node_endpoint = setup("dtn://node1/")
+register("app", lambda payload, *args: received['unicast'].append(payload))
+all_news = register_group("dtn://node1/~*", lambda payload, *args: received['all-news'].append(payload))
+register_group("dtn://node1/~sport", lambda payload, *args: received['sport'].append(payload))
+
+node_endpoint.send(b'goal', "dtn://node1/~sport")
+node_endpoint.send(b'rain', "dtn://node1/~weather")
+node_endpoint.send(b'direct', "dtn://node1/app")
+
+start = time.time()
+while time.time() - start < 0.5:
+    if not update():
+        time.sleep(0.01)
+
+print('received: {}'.format(received))
+
+assert received == {'all-news': [b'goal', b'rain'], 'sport': [b'goal'], 'unicast': [b'direct']}
+
+dtn7zero.api.BPA.unregister_group_endpoint(all_news._endpoint)
+node_endpoint.send(b'sun', "dtn://node1/~weather")
+
+start = time.time()
+while time.time() - start < 0.5:
+    if not update():
+        time.sleep(0.01)
+
+assert received['all-news'] == [b'goal', b'rain']
+
+print('group matching tests passed')
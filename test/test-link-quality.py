@@ -0,0 +1,73 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the link quality of a neighbor: the moving averages of latency, throughput and reliability, the exponential
+backoff after consecutive send failures and the preference of the better link.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.LINK_QUALITY.EWMA_ALPHA = 0.5
+CONFIGURATION.LINK_QUALITY.BACKOFF_MIN_MILLISECONDS = 50
+CONFIGURATION.LINK_QUALITY.BACKOFF_MAX_MILLISECONDS = 150
+
+from dtn7zero.data import LinkQuality, Node
+from dtn7zero.utility import get_current_clock_millis
+
+
+def is_close(x: float, y: float) -> bool:
+    return abs(x - y) < 1e-9
+
+
+link_quality = LinkQuality()
+assert link_quality.latency_milliseconds is None and link_quality.reliability == 1.0
+assert link_quality.score == 1.0  # unknown links are optimistic
+
+# the first sample initializes the averages, later samples move them by alpha
+link_quality.record_success(1000, 10)
+assert link_quality.latency_milliseconds == 10 and link_quality.bytes_per_second == 100000
+
+link_quality.record_success(1000, 30)
+assert is_close(link_quality.latency_milliseconds, 20)
+assert is_close(link_quality.bytes_per_second, 100000 + 0.5 * (1000 * 1000 / 30 - 100000))
+assert link_quality.reliability == 1.0
+
+# a send faster than the clock resolution counts as one millisecond
+link_quality.record_success(100, 0)
+assert is_close(link_quality.latency_milliseconds, 10.5)
+
+# failures lower the reliability and back the link off, doubling per consecutive failure up to the maximum
+backoffs = []
+for _ in range(4):
+    now = get_current_clock_millis()
+    link_quality.record_failure()
+    backoffs.append(link_quality.backoff_until - now)
+
+print('backoffs: {}, reliability: {}'.format(backoffs, link_quality.reliability))
+assert is_close(link_quality.reliability, 0.5 ** 4)
+assert link_quality.consecutive_failures == 4
+assert [round(backoff, -1) for backoff in backoffs] == [50, 100, 150, 150]
+assert link_quality.is_backed_off()
+
+time.sleep(0.2)
+assert not link_quality.is_backed_off()
+
+# a success resets the backoff and moves the reliability back up
+link_quality.record_failure()
+assert link_quality.is_backed_off()
+link_quality.record_success(1000, 10)
+assert not link_quality.is_backed_off() and link_quality.consecutive_failures == 0
+assert is_close(link_quality.reliability, 0.5 ** 5 + 0.5 * (1 - 0.5 ** 5))
+
+# the node is scored by its best link, a reliable slow link beats an unreliable fast one
+node = Node('10.0.0.1', (1, '//node1/'), {'fast': 1, 'slow': 2}, 0)
+assert node.link_score == 1.0
+
+node.get_link_quality('fast').record_success(1000, 1)
+node.get_link_quality('fast').record_failure()
+node.get_link_quality('slow').record_success(1000, 200)
+assert node.get_link_quality('slow').score > node.get_link_quality('fast').score
+assert node.link_score == node.get_link_quality('slow').score
+
+print('link quality tests passed')
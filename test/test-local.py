@@ -0,0 +1,131 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the local cla: two bundle protocol agents of one interpreter exchange bundles in-process (not fragmented), the
+wakeup of the receiving poller, the bounded hand over queue and (CPython only) the unix socket transfer to another
+process.
+"""
+import os
+import socket
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.convergence_layer_adapters.local import LocalCLA, create_local_node, get_local_address
+from dtn7zero.endpoints import LocalEndpoint
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import SocketPoller
+from helpers import create_bundle
+
+PORT_1 = 16176
+PORT_2 = 16177
+PORT_OTHER_PROCESS = 16178
+
+
+def create_bpa(full_node_uri: str, port: int, other_full_node_uri: str, other_port: int) -> BundleProtocolAgent:
+    storage = SimpleInMemoryStorage()
+    storage.add_node(create_local_node(other_full_node_uri, other_port))
+    router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_LOCAL: LocalCLA(port)}, storage)
+    return BundleProtocolAgent(full_node_uri, storage, router)
+
+
+# two bpas of one interpreter exchange bundles
+bpa1 = create_bpa('dtn://node1/', PORT_1, 'dtn://node2/', PORT_2)
+bpa2 = create_bpa('dtn://node2/', PORT_2, 'dtn://node1/', PORT_1)
+
+received = []
+ping = bpa1.register_endpoint(LocalEndpoint('ping', lambda bundle: received.append(('ping', bytes(bundle.payload_block.data)))))
+pong = bpa2.register_endpoint(LocalEndpoint('pong', lambda bundle: received.append(('pong', bytes(bundle.payload_block.data)))))
+
+for idx in range(5):
+    ping.start_transmission(b'ping %d' % idx, 'dtn://node2/pong')
+    pong.start_transmission(b'pong %d' % idx, 'dtn://node1/ping')
+
+start = time.time()
+while len(received) < 10 and time.time() - start < 2:
+    bpa1.update()
+    bpa2.update()
+
+print('received: {}'.format(received))
+assert sorted(received) == sorted([('pong', b'ping %d' % idx) for idx in range(5)] + [('ping', b'pong %d' % idx) for idx in range(5)])
+
+cla1 = bpa1.router.clas[CONFIGURATION.IPND.IDENTIFIER_LOCAL]
+cla2 = bpa2.router.clas[CONFIGURATION.IPND.IDENTIFIER_LOCAL]
+
+# the in-process hand over is not limited to the datagram size, large bundles are not fragmented
+assert cla1.get_mtu(bpa1.storage.get_node(get_local_address(PORT_2))) is None
+large_payload = bytes(range(256)) * 400
+received.clear()
+ping.start_transmission(large_payload, 'dtn://node2/pong')
+
+start = time.time()
+while not cla2.in_process_bundles and time.time() - start < 2:
+    bpa1.update()
+assert len(cla2.in_process_bundles) == 1
+
+while not received and time.time() - start < 2:
+    bpa2.update()
+assert received == [('pong', large_payload)]
+
+try:
+    LocalCLA(PORT_1)
+except Exception:
+    pass
+else:
+    raise AssertionError('a local port must not be used twice')
+
+# the hand over queue is bounded
+node2 = create_local_node('dtn://node2/', PORT_2)
+node2.index = 0  # assigned by the storage otherwise
+
+CONFIGURATION.LOCAL.MAX_QUEUED_BUNDLES = 3
+serialized_bundle = create_bundle(0, b'queued').to_cbor()
+assert [cla1.send_to(node2, serialized_bundle) for _ in range(4)] == [True, True, True, False]
+
+bundles = cla2.poll_many(10)
+assert len(bundles) == 3
+assert all(address == get_local_address(PORT_1) for _, address in bundles)
+
+if cla1.socket is not None:
+    # the receiving poller is woken up by an in-process hand over
+    poller = SocketPoller()
+    assert cla2.register_wakeup_poller(poller)
+    assert poller.poll(0) == []
+
+    assert cla1.send_to(node2, serialized_bundle)
+    assert len(poller.poll(0)) == 1
+    assert len(cla2.poll_many(10)) == 1
+    assert poller.poll(0) == []
+
+    # another process sends and receives unix datagrams
+    other_process = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    other_process.bind('{}/{}'.format(CONFIGURATION.LOCAL.SOCKET_DIRECTORY, PORT_OTHER_PROCESS))
+    other_process.settimeout(1)
+    try:
+        other_process.sendto(create_bundle(1, b'from other process').to_cbor(), '{}/{}'.format(CONFIGURATION.LOCAL.SOCKET_DIRECTORY, PORT_2))
+        bundles = cla2.poll_many(10)
+        assert len(bundles) == 1
+        assert bytes(bundles[0][0].payload_block.data) == b'from other process'
+        assert bundles[0][1] == get_local_address(PORT_OTHER_PROCESS)
+
+        other_node = create_local_node('dtn://node3/', PORT_OTHER_PROCESS)
+        other_node.index = 1
+        assert cla2.send_to(other_node, create_bundle(2, b'to other process').to_cbor())
+        assert other_process.recv(CONFIGURATION.LOCAL.MAX_DATAGRAM_SIZE) == create_bundle(2, b'to other process').to_cbor()
+
+        # too large for a datagram -> fragmented by the router
+        assert not cla2.send_to(other_node, create_bundle(3, bytes(cla2.mtu)).to_cbor())
+    finally:
+        other_process.close()
+        os.remove('{}/{}'.format(CONFIGURATION.LOCAL.SOCKET_DIRECTORY, PORT_OTHER_PROCESS))
+
+# the port is released on close
+cla1.close()
+cla2.close()
+LocalCLA(PORT_1).close()
+
+print('local cla tests passed')
@@ -0,0 +1,125 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the asynchronous mtcp send: buffered messages are flushed on poll, the sent callbacks update the forwarding
+ledger of the bundle, a stalled receiver does not block the sender and a refused connect fails at once. The router
+falls back to the synchronous send for clas without outbound buffers (pull based clas).
+"""
+import socket
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.PORT.MTCP = 16168
+CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND = 300
+
+from dtn7zero.convergence_layer_adapters import PullBasedCLA
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.data import Node, BundleInformation
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from helpers import create_bundle
+
+STALLED_PORT = 16169
+REFUSED_PORT = 16183
+PULL_CLA_ID = 'rest'
+
+
+class FakePullCLA(PullBasedCLA):
+    """ records the sent bundles, like the dtn7-rs rest cla it has no outbound buffers """
+
+    def __init__(self):
+        self.sent = []
+
+    def send_to(self, node, serialized_bundle):
+        self.sent.append(node.address)
+        return True
+
+
+cla = MTcpCLA()
+node = Node('127.0.0.1', (1, '//node2/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: CONFIGURATION.PORT.MTCP}, 0)
+node.index = 0  # assigned by the storage otherwise
+
+# buffered messages are sent in order, the callbacks are called on poll
+bundle_informations = [BundleInformation(create_bundle(idx, bytes(idx * 1000))) for idx in range(5)]
+
+for bundle_information in bundle_informations:
+    assert cla.send_to_async(node, bundle_information.bundle.to_cbor(), lambda success, bi=bundle_information: bi.complete_forwarding_to(node, success))
+    bundle_information.mark_forwarding_to(node)
+
+assert all(bundle_information.is_forwarding_to(node) for bundle_information in bundle_informations)
+
+received = []
+start = time.time()
+while len(received) < 5 and time.time() - start < 2:
+    bundle, _ = cla.poll()
+    if bundle is not None:
+        received.append(bundle.primary_block.sequence_number)
+cla.poll()
+
+assert received == [0, 1, 2, 3, 4]
+assert all(bundle_information.was_forwarded_to(node) for bundle_information in bundle_informations)
+assert not any(bundle_information.is_forwarding_to(node) for bundle_information in bundle_informations)
+assert cla.outbound_connections == {}
+assert cla.send_connections.num_idle_connections == 1
+
+# a stalled receiver (accepts, but never reads) does not block the sender
+stalled_listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+stalled_listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+stalled_listener.bind(('127.0.0.1', STALLED_PORT))
+stalled_listener.listen(1)
+
+stalled_node = Node('127.0.0.1', (1, '//node3/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: STALLED_PORT}, 1)
+results = []
+
+start = time.time()
+assert cla.send_to_async(stalled_node, create_bundle(5, bytes(16 * 1024 * 1024)).to_cbor(), results.append)
+print('queued a stalled transmission in {:.3f} seconds'.format(time.time() - start))
+assert time.time() - start < CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND / 1000
+
+start = time.time()
+while not results and time.time() - start < 3:
+    cla.poll()
+    time.sleep(0.01)
+
+print('stalled transmission failed after {:.3f} seconds'.format(time.time() - start))
+assert results == [False]
+assert stalled_node.get_link_quality(CONFIGURATION.IPND.IDENTIFIER_MTCP).is_backed_off()
+assert cla.outbound_connections == {}
+
+stalled_listener.close()
+
+# a refused connect fails the buffered messages as soon as the socket reports the error, without waiting for the
+# stalled timeout
+refused_node = Node('127.0.0.1', (1, '//node4/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: REFUSED_PORT}, 2)
+results = []
+
+start = time.time()
+assert cla.send_to_async(refused_node, create_bundle(6, b'refused').to_cbor(), results.append)
+while not results and time.time() - start < 3:
+    cla.poll()
+    time.sleep(0.01)
+
+print('refused transmission failed after {:.3f} seconds'.format(time.time() - start))
+assert results == [False]
+assert time.time() - start < CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND / 1000
+assert cla.outbound_connections == {}
+
+# the synchronous send fails at once as well
+start = time.time()
+assert not cla.send_to(refused_node, create_bundle(7, b'refused').to_cbor())
+assert time.time() - start < CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_STALLED_SEND / 1000
+
+# a node reachable over a pull based cla only is forwarded to synchronously
+storage = SimpleInMemoryStorage()
+storage.add_node(Node('127.0.0.5', (1, '//node5/'), {PULL_CLA_ID: 3000}, 0))
+pull_cla = FakePullCLA()
+router = SimpleEpidemicRouter({PULL_CLA_ID: pull_cla}, storage)
+assert router.async_send
+
+bundle_information = BundleInformation(create_bundle(8, b'pulled'))
+router.immediate_forwarding_attempt('dtn://node1/', bundle_information)
+assert pull_cla.sent == ['127.0.0.5']
+assert bundle_information.was_forwarded_to(storage.get_node('127.0.0.5'))
+
+print('mtcp async send tests passed')
@@ -0,0 +1,57 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the pooled outgoing mtcp connections: several bundles over one connection, the reconnect after the receiver
+closed the pooled connection and the closing of idle connections.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.PORT.MTCP = 16165
+CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_IDLE_SEND = 500
+
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.data import Node
+from helpers import create_bundle
+
+
+def receive_bundles(cla: MTcpCLA, number_of_bundles: int) -> list:
+    sequence_numbers = []
+    start = time.time()
+    while len(sequence_numbers) < number_of_bundles and time.time() - start < 2:
+        bundle, _ = cla.poll()
+        if bundle is not None:
+            sequence_numbers.append(bundle.primary_block.sequence_number)
+    return sequence_numbers
+
+
+cla = MTcpCLA()
+node = Node('127.0.0.1', (1, '//node2/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: CONFIGURATION.PORT.MTCP}, 0)
+key = ('127.0.0.1', CONFIGURATION.PORT.MTCP)
+
+# several bundles over one connection
+for sequence_number in range(5):
+    assert cla.send_to(node, create_bundle(sequence_number, str(sequence_number).encode()).to_cbor())
+
+assert cla.send_connections.num_idle_connections == 1
+assert receive_bundles(cla, 5) == [0, 1, 2, 3, 4]
+assert len(cla.open_receive_connections) == 1
+
+# the receiver closes the connection -> the sender reconnects
+for reader in cla.open_receive_connections.values():
+    cla._close_connection(reader.connection)
+cla.open_receive_connections.clear()
+time.sleep(0.1)
+
+assert cla.send_to(node, create_bundle(5, b'5').to_cbor())
+assert cla.send_connections.num_idle_connections == 1
+assert receive_bundles(cla, 1) == [5]
+
+# idle connections are closed after the idle timeout
+time.sleep(0.6)
+cla.poll()
+assert cla.send_connections.num_idle_connections == 0
+assert key not in cla.send_connections.idle_connections
+
+print('mtcp connection pool tests passed')
@@ -0,0 +1,74 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the incremental mtcp reception: a message sent in parts (split inside the header and the body) is received over
+several polls without blocking, while complete messages of other connections are received in between.
+"""
+import socket
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.PORT.MTCP = 16166
+
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from helpers import create_mtcp_message
+
+
+def connect() -> socket.socket:
+    connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    connection.connect(('127.0.0.1', CONFIGURATION.PORT.MTCP))
+    return connection
+
+
+def poll_for(cla: MTcpCLA, seconds: float) -> list:
+    bundles = []
+    start = time.time()
+    while time.time() - start < seconds:
+        bundle, _ = cla.poll()
+        if bundle is not None:
+            bundles.append(bundle)
+    return bundles
+
+
+cla = MTcpCLA()
+
+payload = bytes(range(256)) * 300
+slow_message = create_mtcp_message(1, payload)
+assert slow_message[0] == 0x5a  # byte-string with 4 length bytes -> split inside the header
+
+slow_connection = connect()
+fast_connection = connect()
+
+# the header is split
+slow_connection.send(slow_message[:2])
+assert poll_for(cla, 0.2) == []
+
+# another connection is not blocked by the partial message
+fast_connection.send(create_mtcp_message(2, b'fast'))
+bundles = poll_for(cla, 0.2)
+assert [bundle.primary_block.sequence_number for bundle in bundles] == [2]
+
+# the body is split
+slow_connection.send(slow_message[2:5000])
+assert poll_for(cla, 0.2) == []
+slow_connection.sendall(slow_message[5000:])
+
+bundles = poll_for(cla, 0.5)
+assert [bundle.primary_block.sequence_number for bundle in bundles] == [1]
+assert bundles[0].payload_block.data == payload
+
+# the next message on the same connection is received with a fresh state
+slow_connection.send(create_mtcp_message(3, b'next'))
+bundles = poll_for(cla, 0.2)
+assert [bytes(bundle.payload_block.data) for bundle in bundles] == [b'next']
+
+# invalid headers close the connection
+fast_connection.send(b'\xa0')
+poll_for(cla, 0.2)
+assert len(cla.open_receive_connections) == 1
+
+slow_connection.close()
+fast_connection.close()
+
+print('mtcp incremental receive tests passed')
@@ -0,0 +1,61 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the batched mtcp reception: poll_many(...) accepts all waiting connections and reads all complete messages
+available, within the item and byte budgets.
+"""
+import socket
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.PORT.MTCP = 16170
+
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from helpers import create_mtcp_message
+
+NUMBER_OF_BUNDLES = 200
+NUMBER_OF_CONNECTIONS = 4
+
+
+cla = MTcpCLA()
+
+# a burst over one connection and single bundles over new connections, all waiting before the first poll
+burst_connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+burst_connection.connect(('127.0.0.1', CONFIGURATION.PORT.MTCP))
+burst_connection.sendall(b''.join(create_mtcp_message(idx, bytes(100)) for idx in range(NUMBER_OF_BUNDLES)))
+
+connections = [burst_connection]
+for idx in range(NUMBER_OF_CONNECTIONS):
+    connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    connection.connect(('127.0.0.1', CONFIGURATION.PORT.MTCP))
+    connection.sendall(create_mtcp_message(NUMBER_OF_BUNDLES + idx, bytes(100)))
+    connections.append(connection)
+
+time.sleep(0.2)
+
+# the item budget
+bundles = cla.poll_many(10)
+assert len(bundles) == 10
+assert [bundle.primary_block.sequence_number for bundle, _ in bundles] == list(range(10))
+assert len(cla.open_receive_connections) == NUMBER_OF_CONNECTIONS + 1
+
+# the byte budget, the last bundle may exceed it
+bundle_length = len(create_mtcp_message(10, bytes(100))) - 2  # without the cbor byte-string header
+bundles = cla.poll_many(1000, 5 * bundle_length - 1)
+assert len(bundles) == 5
+
+# everything else at once
+bundles = cla.poll_many(1000)
+sequence_numbers = [bundle.primary_block.sequence_number for bundle, _ in bundles]
+print('received {} bundles with one poll'.format(len(bundles)))
+
+assert len(bundles) == NUMBER_OF_BUNDLES + NUMBER_OF_CONNECTIONS - 15
+assert [number for number in sequence_numbers if number < NUMBER_OF_BUNDLES] == list(range(15, NUMBER_OF_BUNDLES))
+assert all(node_address == '127.0.0.1' for _, node_address in bundles)
+assert cla.poll_many(1000) == []
+
+for connection in connections:
+    connection.close()
+
+print('mtcp poll many tests passed')
@@ -0,0 +1,79 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the readiness-based mtcp reception: with many open idle connections only the ready ones are read on a poll,
+and the inactivity timeout still closes the idle connections.
+"""
+import socket
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.PORT.MTCP = 16167
+CONFIGURATION.MTCP.TIMEOUT_MILLISECONDS_INACTIVE_RECEIVE = 1000
+
+import dtn7zero.convergence_layer_adapters.mtcp as mtcp
+from helpers import create_mtcp_message
+
+NUMBER_OF_IDLE_CONNECTIONS = 50
+
+reads = []
+read_message_or_none = mtcp._MessageReader.read_message_or_none
+
+
+def counting_read_message_or_none(reader):
+    reads.append(reader)
+    return read_message_or_none(reader)
+
+
+mtcp._MessageReader.read_message_or_none = counting_read_message_or_none
+
+
+def connect() -> socket.socket:
+    connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    connection.connect(('127.0.0.1', CONFIGURATION.PORT.MTCP))
+    return connection
+
+
+cla = mtcp.MTcpCLA()
+
+# the connections are accepted one at a time, the listen queue is short
+idle_connections = []
+for _ in range(NUMBER_OF_IDLE_CONNECTIONS):
+    idle_connections.append(connect())
+    cla.poll()
+active_connection = connect()
+
+start = time.time()
+while len(cla.open_receive_connections) < NUMBER_OF_IDLE_CONNECTIONS + 1 and time.time() - start < 2:
+    cla.poll()
+assert len(cla.open_receive_connections) == NUMBER_OF_IDLE_CONNECTIONS + 1
+
+# no connection is ready -> no connection is read
+del reads[:]
+for _ in range(10):
+    assert cla.poll() == (None, None)
+assert reads == []
+
+active_connection.send(create_mtcp_message(1, b'active'))
+
+bundle = None
+start = time.time()
+while bundle is None and time.time() - start < 2:
+    bundle, _ = cla.poll()
+
+assert bytes(bundle.payload_block.data) == b'active'
+print('connection reads for one bundle with {} idle connections: {}'.format(NUMBER_OF_IDLE_CONNECTIONS, len(reads)))
+assert len(reads) <= 2
+
+# the idle connections are still closed after the inactivity timeout
+time.sleep(1.1)
+start = time.time()
+while cla.open_receive_connections and time.time() - start < 2:
+    cla.poll()
+assert len(cla.open_receive_connections) == 0
+
+for connection in idle_connections + [active_connection]:
+    connection.close()
+
+print('mtcp receive multiplexing tests passed')
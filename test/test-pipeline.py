@@ -0,0 +1,79 @@
+"""
+To be run on CPython.
+
+Tests the pipelined bpa: bundles pass the receive, processing and forwarding stages (with full stage queues), the
+forwarding workers add status reports while the processing stage sends them batched, and the stages stop on stop().
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+CONFIGURATION.SEND_STATUS_REPORTS_ENABLED = True
+CONFIGURATION.STATUS_REPORTS.BATCH_WINDOW_MILLISECONDS = 5
+CONFIGURATION.STATUS_REPORTS.BATCHING_ENABLED = True
+CONFIGURATION.PIPELINE.QUEUE_SIZE = 4
+CONFIGURATION.PIPELINE.FORWARDING_WORKERS = 4
+CONFIGURATION.SIMPLE_EPIDEMIC_ROUTER_MIN_NODES_TO_FORWARD_TO = 1
+
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.data import Node
+from dtn7zero.endpoints import LocalEndpoint
+from dtn7zero.pipeline import PipelinedBundleProtocolAgent
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.status_reports import AdministrativeEndpoint, StatusReportRequest
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from helpers import create_bundle
+from py_dtn7 import to_dtn_timestamp
+
+PORT_BPA = 16179
+PORT_NEIGHBOR = 16180
+NUMBER_OF_BUNDLES = 50
+
+CONFIGURATION.PORT.MTCP = PORT_BPA
+storage = SimpleInMemoryStorage()
+storage.add_node(Node('127.0.0.2', (1, '//node2/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: PORT_NEIGHBOR}, 0))
+bpa = PipelinedBundleProtocolAgent('dtn://node1/', storage, SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: MTcpCLA()}, storage))
+
+# the neighbor sends to the bpa and receives the forwarded bundles
+CONFIGURATION.PORT.MTCP = PORT_NEIGHBOR
+neighbor_cla = MTcpCLA()
+bpa_node = Node('127.0.0.1', (1, '//node1/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: PORT_BPA}, 0)
+bpa_node.index = 0  # assigned by the storage otherwise
+
+delivered = []
+forwarded = []
+reports = []
+sink = bpa.register_endpoint(LocalEndpoint('sink', lambda bundle: delivered.append(bytes(bundle.payload_block.data))))
+bpa.register_administrative_endpoint(AdministrativeEndpoint(reports.append))
+
+bpa.start()
+assert len(bpa.threads) == 1 + CONFIGURATION.PIPELINE.FORWARDING_WORKERS
+
+# receive stage -> processing stage -> local delivery
+creation_time = to_dtn_timestamp()
+for idx in range(NUMBER_OF_BUNDLES):
+    assert neighbor_cla.send_to(bpa_node, create_bundle(idx, b'in %d' % idx, 'dtn://node1/sink', creation_time).to_cbor())
+
+# processing stage -> forwarding stage, the forwarding workers add the forwarding reports
+for idx in range(NUMBER_OF_BUNDLES):
+    assert sink.start_transmission(b'out %d' % idx, 'dtn://node3/far', status_report_requests=StatusReportRequest.FORWARDING) is not None
+
+start = time.time()
+while (len(delivered) < NUMBER_OF_BUNDLES or len(set(forwarded)) < NUMBER_OF_BUNDLES or len(reports) < NUMBER_OF_BUNDLES) and time.time() - start < 10:
+    if not bpa.update():
+        bpa.wait(10)
+    forwarded.extend(bytes(bundle.payload_block.data) for bundle, _ in neighbor_cla.poll_many(100))
+
+print('delivered: {}, forwarded: {}, reports: {}, dropped reports: {}'.format(len(delivered), len(set(forwarded)), len(reports), bpa.status_reports.num_dropped))
+assert sorted(delivered) == sorted(b'in %d' % idx for idx in range(NUMBER_OF_BUNDLES))
+assert set(forwarded) >= set(b'out %d' % idx for idx in range(NUMBER_OF_BUNDLES))
+assert len(reports) == NUMBER_OF_BUNDLES
+assert bpa.status_reports.num_dropped == 0
+
+# all stages stop
+threads = list(bpa.threads)
+bpa.stop()
+assert bpa.threads == [] and not any(thread.is_alive() for thread in threads)
+
+print('pipeline tests passed')
@@ -0,0 +1,128 @@
+"""
+To be run on CPython.
+
+Tests the sharded workers (two in one process): the ownership by bundle id hash, the handover of a bundle received by
+a non-owning worker, the duplicate detection by the owner, that the bundle is not sent back to the previous node and
+that the owner takes a handed over bundle on its next update.
+"""
+import queue
+import socket
+import threading
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+
+from dtn7zero.convergence_layer_adapters import PushBasedCLA
+from dtn7zero.data import Node
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.sharding import ShardWorkerBundleProtocolAgent, get_shard_index
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from helpers import create_bundle
+from py_dtn7 import to_dtn_timestamp
+
+CLA_ID = 'fake'
+PREVIOUS_NODE_ADDRESS = '127.0.0.1'
+NEXT_NODE_ADDRESS = '127.0.0.2'
+CREATION_TIME = to_dtn_timestamp()
+
+
+class FakeCLA(PushBasedCLA):
+    """ receives the injected bundles and records the sent ones """
+
+    def __init__(self):
+        self.received = []
+        self.sent = []
+
+    def poll(self):
+        if self.received:
+            return self.received.pop(0)
+        return None, None
+
+    def send_to(self, node, serialized_bundle):
+        self.sent.append(node.address)
+        return True
+
+
+class FeederQueue(queue.Queue):
+    """ like a multiprocessing queue, put_nowait() passes the item on in a background thread """
+
+    def put_nowait(self, item):
+        threading.Timer(0.01, self.put, (item,)).start()
+
+
+def create_worker(shard_index: int) -> ShardWorkerBundleProtocolAgent:
+    storage = SimpleInMemoryStorage()
+    storage.add_node(Node(PREVIOUS_NODE_ADDRESS, (1, '//node1/'), {CLA_ID: 1}, 0))
+    storage.add_node(Node(NEXT_NODE_ADDRESS, (1, '//node3/'), {CLA_ID: 1}, 0))
+    router = SimpleEpidemicRouter({CLA_ID: FakeCLA()}, storage)
+    return ShardWorkerBundleProtocolAgent('dtn://node2/', storage, router, shard_index, handover_queues, waker_sockets, queue.Queue())
+
+
+def update_all(seconds: float = 0.2):
+    start = time.time()
+    while time.time() - start < seconds:
+        for worker in workers:
+            worker.update()
+
+
+handover_queues = [queue.Queue(10), queue.Queue(10)]
+waker_sockets = [socket.socketpair() for _ in range(2)]
+for _, waker_send in waker_sockets:
+    waker_send.setblocking(False)
+
+workers = [create_worker(0), create_worker(1)]
+clas = [worker.router.clas[CLA_ID] for worker in workers]
+
+# a bundle owned by worker 1, the destination is neither this node nor a neighbor
+sequence_number = 0
+while get_shard_index(create_bundle(sequence_number, b'', 'dtn://node4/sink', CREATION_TIME).bundle_id, 2) != 1:
+    sequence_number += 1
+bundle = create_bundle(sequence_number, b'sharded', 'dtn://node4/sink', CREATION_TIME)
+bundle_id = bundle.bundle_id
+
+assert not workers[0]._is_owner(bundle) and workers[1]._is_owner(bundle)
+
+# received by the non-owner -> handed over, the owner stores and forwards it
+clas[0].received.append((bundle, PREVIOUS_NODE_ADDRESS))
+update_all()
+
+print('sent by worker 0: {}, sent by worker 1: {}'.format(clas[0].sent, clas[1].sent))
+assert workers[0].storage.bundles.get(bundle_id) is None
+assert workers[1].storage.bundles.get(bundle_id) is not None
+assert workers[0].storage.get_seen(bundle_id) == PREVIOUS_NODE_ADDRESS
+assert workers[1].storage.get_seen(bundle_id) == PREVIOUS_NODE_ADDRESS
+
+# not echoed back to the previous node
+assert clas[0].sent == []
+assert clas[1].sent == [NEXT_NODE_ADDRESS]
+
+# a copy received by the owner itself is a duplicate
+clas[1].received.append((create_bundle(sequence_number, b'sharded', 'dtn://node4/sink', CREATION_TIME), NEXT_NODE_ADDRESS))
+update_all()
+assert clas[1].sent == [NEXT_NODE_ADDRESS]
+
+# a copy received by the non-owner again is dropped by its own seen-set
+clas[0].received.append((create_bundle(sequence_number, b'sharded', 'dtn://node4/sink', CREATION_TIME), NEXT_NODE_ADDRESS))
+update_all()
+assert handover_queues[1].empty()
+assert clas[0].sent == [] and clas[1].sent == [NEXT_NODE_ADDRESS]
+
+# the handover queue passes items on in a feeder thread, the announced bundle is taken by the next update of the owner
+handover_queues[1] = FeederQueue(10)
+
+owned_sequence_numbers = []
+while len(owned_sequence_numbers) < 5:
+    sequence_number += 1
+    if get_shard_index(create_bundle(sequence_number, b'', 'dtn://node4/sink', CREATION_TIME).bundle_id, 2) == 1:
+        owned_sequence_numbers.append(sequence_number)
+
+for sequence_number in owned_sequence_numbers:
+    bundle = create_bundle(sequence_number, b'sharded', 'dtn://node4/sink', CREATION_TIME)
+    clas[0].received.append((bundle, PREVIOUS_NODE_ADDRESS))
+    workers[0].update()
+    workers[1].update()
+    assert workers[1].storage.bundles.get(bundle.bundle_id) is not None
+
+print('sharding tests passed')
@@ -0,0 +1,73 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the status report generation: reports are batched per report-to endpoint (if enabled), merged per bundle and
+delivered to the administrative endpoints of the reporting node. Without batching every report is a standard report.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+CONFIGURATION.SEND_STATUS_REPORTS_ENABLED = True
+CONFIGURATION.STATUS_REPORTS.BATCH_WINDOW_MILLISECONDS = 100
+CONFIGURATION.STATUS_REPORTS.BATCHING_ENABLED = True
+
+from dtn7zero import setup, register, register_status_reports, update, StatusReportRequest
+import dtn7zero.api
+
+received = []
+reports = []
+
+node_endpoint = setup("dtn://node1/")
+app_endpoint = register("app", lambda payload, *args: received.append(payload))
+register_status_reports(reports.append)
+
+# count the administrative bundles to check the batching
+administrative_bundles = []
+original_delivery = dtn7zero.api.BPA.administrative_record_delivery
+dtn7zero.api.BPA.administrative_record_delivery = lambda bundle_information: administrative_bundles.append(bundle_information) or original_delivery(bundle_information)
+
+for idx in range(3):
+    assert node_endpoint.send(str(idx).encode(), "dtn://node1/app", status_report_requests=StatusReportRequest.RECEPTION | StatusReportRequest.DELIVERY)
+node_endpoint.send(b'unreported', "dtn://node1/app")
+
+start = time.time()
+while len(reports) < 3 and time.time() - start < 2:
+    if not update():
+        time.sleep(0.01)
+
+print('received: {}'.format(received))
+print('reports: {}'.format(reports))
+
+assert received == [b'0', b'1', b'2', b'unreported']
+assert len(reports) == 3
+
+for report in reports:
+    # reception and delivery of a bundle are merged into one report
+    assert report.received and report.delivered and not report.forwarded and not report.deleted
+    assert report.full_source_uri == "dtn://node1/"
+    assert report.reporting_node_uri == "dtn://node1/"
+
+# all three reports were sent in one batch bundle
+assert len(set(report.bundle_id for report in reports)) == 3
+assert len(administrative_bundles) == 1
+
+# without batching (the default) each report is sent as a standard status report in its own bundle
+CONFIGURATION.STATUS_REPORTS.BATCHING_ENABLED = False
+time.sleep(1)  # refill the rate limit
+reports.clear()
+administrative_bundles.clear()
+
+for idx in range(3, 5):
+    assert node_endpoint.send(str(idx).encode(), "dtn://node1/app", status_report_requests=StatusReportRequest.DELIVERY)
+
+start = time.time()
+while len(reports) < 2 and time.time() - start < 2:
+    if not update():
+        time.sleep(0.01)
+
+assert len(reports) == 2 and all(report.delivered for report in reports)
+assert len(administrative_bundles) == 2
+
+print('status report tests passed')
@@ -0,0 +1,124 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the TCPCLv4 cla: the session establishment and parameter negotiation, segmented transfers over one reused
+session, the transfer mru, the interrupted transfer (reactive fragment), the rejection of non-tcpcl peers and the
+announcement in the ipnd service block.
+"""
+import socket
+import struct
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.convergence_layer_adapters import tcpcl
+from dtn7zero.convergence_layer_adapters.tcpcl import TcpclCLA
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.data import Node
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.serialization import FragmentBundle
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from helpers import create_bundle
+
+PORT_A = 16171
+PORT_B = 16172
+
+
+def poll_both(condition, seconds: float = 2):
+    start = time.time()
+    while not condition() and time.time() - start < seconds:
+        for bundle, address in cla_b.poll_many(10):
+            received_b.append(bundle)
+        for bundle, address in cla_a.poll_many(10):
+            received_a.append(bundle)
+        time.sleep(0.001)
+
+
+# both nodes offer different parameters, the session uses the minimum
+CONFIGURATION.TCPCL.KEEPALIVE_INTERVAL_SECONDS = 10
+CONFIGURATION.TCPCL.SEGMENT_MRU = 4096
+cla_a = TcpclCLA('dtn://node1/', PORT_A)
+
+CONFIGURATION.TCPCL.KEEPALIVE_INTERVAL_SECONDS = 5
+CONFIGURATION.TCPCL.SEGMENT_MRU = 1000
+CONFIGURATION.TCPCL.TRANSFER_MRU = 100000
+cla_b = TcpclCLA('dtn://node2/', PORT_B)
+
+node_b = Node('127.0.0.1', (1, '//node2/'), {CONFIGURATION.IPND.IDENTIFIER_TCPCL: PORT_B}, 0)
+node_b.index = 0  # assigned by the storage otherwise
+
+received_a = []
+received_b = []
+results = []
+
+# a small and a multi-segment bundle over the same session
+payloads = [b'small', bytes(range(256)) * 20]
+for idx, payload in enumerate(payloads):
+    assert cla_a.send_to_async(node_b, create_bundle(idx, payload).to_cbor(), results.append)
+
+poll_both(lambda: len(results) == 2 and len(received_b) == 2)
+
+print('sent: {}, received: {}'.format(results, [bundle.primary_block.sequence_number for bundle in received_b]))
+assert results == [True, True]
+assert [bytes(bundle.payload_block.data) for bundle in received_b] == payloads
+
+assert len(cla_a.active_sessions) == 1 and len(cla_b.passive_sessions) == 1
+session_a = cla_a.active_sessions[('127.0.0.1', PORT_B)]
+session_b = list(cla_b.passive_sessions.values())[0]
+
+assert session_a.peer_node_id == 'dtn://node2/' and session_b.peer_node_id == 'dtn://node1/'
+assert session_a.keepalive_interval == 5 and session_b.keepalive_interval == 5
+assert session_a.segment_size == 1000 and session_b.segment_size == 1000
+assert session_a.next_transfer_id == 2
+
+# the session is reused, bundles larger than the transfer mru of the peer are not sent
+assert cla_a.send_to_async(node_b, create_bundle(2, b'reused').to_cbor(), results.append)
+assert not cla_a.send_to_async(node_b, create_bundle(3, bytes(200000)).to_cbor(), results.append)
+poll_both(lambda: len(received_b) == 3)
+
+assert results == [True, True, True]
+assert bytes(received_b[2].payload_block.data) == b'reused'
+assert len(cla_a.active_sessions) == 1 and len(cla_b.passive_sessions) == 1
+
+# an interrupted transfer is kept as reactive fragment
+serialized_bundle = create_bundle(4, bytes(range(256)) * 8).to_cbor()
+
+peer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+peer.connect(('127.0.0.1', PORT_B))
+peer.send(tcpcl.encode_contact_header())
+peer.send(tcpcl.encode_sess_init(0, 100000, 100000, 'dtn://node3/'))
+peer.send(tcpcl.encode_xfer_segment(tcpcl.XFER_SEGMENT_FLAG_START, 0, serialized_bundle[:1200], len(serialized_bundle)))
+
+acknowledgement = b''
+poll_both(lambda: False, 0.2)
+peer.settimeout(1)
+while len(acknowledgement) < 6 + 37 + 18:  # contact header, SESS_INIT (node id of 12 bytes), XFER_ACK
+    acknowledgement += peer.recv(1024)
+assert acknowledgement[:4] == b'dtn!'
+assert struct.unpack('!BBQQ', acknowledgement[-18:]) == (tcpcl.MESSAGE_TYPE_XFER_ACK, tcpcl.XFER_SEGMENT_FLAG_START, 0, 1200)
+
+peer.close()
+poll_both(lambda: len(received_b) == 4)
+
+fragment = received_b[3]
+print('reactive fragment: {} of {} payload bytes'.format(len(fragment.payload_block.data), fragment.primary_block.total_application_data_unit_length))
+assert isinstance(fragment, FragmentBundle)
+assert fragment.primary_block.sequence_number == 4
+assert bytes(fragment.payload_block.data) == (bytes(range(256)) * 8)[:len(fragment.payload_block.data)]
+assert len(cla_b.passive_sessions) == 1
+
+# a peer without the tcpcl contact header is disconnected
+peer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+peer.connect(('127.0.0.1', PORT_B))
+peer.send(b'GET / HTTP/1.1\r\n\r\n')
+poll_both(lambda: False, 0.2)
+peer.settimeout(1)
+assert peer.recv(1024) == b''
+assert len(cla_b.passive_sessions) == 1
+peer.close()
+
+# both clas are announced by ipnd
+CONFIGURATION.PORT.MTCP = 16173
+router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: MTcpCLA(), CONFIGURATION.IPND.IDENTIFIER_TCPCL: cla_a}, SimpleInMemoryStorage())
+assert sorted(router.get_ipnd_services()) == [(CONFIGURATION.IPND.IDENTIFIER_MTCP, 16173), (CONFIGURATION.IPND.IDENTIFIER_TCPCL, PORT_A)]
+
+print('tcpcl tests passed')
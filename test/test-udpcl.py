@@ -0,0 +1,87 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the udp cla: one bundle per datagram, the draining of the socket in batches, the packing of small bundles to the
+same node into one datagram, the wakeup of the bpa for packed datagrams and the announcement in the ipnd service block.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.convergence_layer_adapters.udpcl import UdpCLA, split_datagram
+from dtn7zero.data import Node
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import SocketPoller
+from helpers import create_bundle
+
+PORT_A = 16174
+PORT_B = 16175
+
+
+def receive(cla: UdpCLA, num_bundles: int, max_items: int = 100) -> list:
+    bundles = []
+    start = time.time()
+    while len(bundles) < num_bundles and time.time() - start < 2:
+        bundles.extend(bundle for bundle, _ in cla.poll_many(max_items))
+    return bundles
+
+
+cla_a = UdpCLA(PORT_A)
+cla_b = UdpCLA(PORT_B)
+assert cla_a.mtu == CONFIGURATION.UDPCL.MAX_DATAGRAM_SIZE
+
+node_b = Node('127.0.0.1', (1, '//node2/'), {CONFIGURATION.IPND.IDENTIFIER_UDPCL: PORT_B}, 0)
+node_b.index = 0  # assigned by the storage otherwise
+
+# one bundle per datagram, the socket is drained in batches
+for idx in range(10):
+    assert cla_a.send_to(node_b, create_bundle(idx, b'reading %d' % idx).to_cbor())
+assert not cla_a.send_to(node_b, create_bundle(10, bytes(2000)).to_cbor())
+
+received = receive(cla_b, 10, max_items=4)
+print('received: {}'.format([bundle.primary_block.sequence_number for bundle in received]))
+assert [bundle.primary_block.sequence_number for bundle in received] == list(range(10))
+
+# without packing, bundles are not buffered
+assert not cla_a.send_to_async(node_b, create_bundle(11, b'packed').to_cbor(), print)
+
+# small bundles are packed into one datagram, sent on the next poll of the sender
+CONFIGURATION.UDPCL.PACK_BUNDLES = True
+
+wakeup_poller = SocketPoller()
+assert cla_a.register_wakeup_poller(wakeup_poller)
+assert wakeup_poller.poll(0) == []
+
+results = []
+serialized_bundles = [create_bundle(idx, b'packed %d' % idx).to_cbor() for idx in range(20, 60)]
+for serialized_bundle in serialized_bundles:
+    assert cla_a.send_to_async(node_b, serialized_bundle, results.append)
+
+# a full datagram is sent at once, its callbacks are called on poll as well
+num_datagrams = 1 + sum(len(serialized_bundle) for serialized_bundle in serialized_bundles) // cla_a.mtu
+assert len(cla_a.packed_datagrams) == 1
+assert results == []
+assert len(wakeup_poller.poll(0)) == 1
+
+cla_a.poll()
+assert results == [True] * len(serialized_bundles)
+assert cla_a.packed_datagrams == {}
+assert wakeup_poller.poll(0) == []
+
+received = receive(cla_b, len(serialized_bundles))
+print('received {} packed bundles in at least {} datagrams'.format(len(received), num_datagrams))
+assert [bundle.primary_block.sequence_number for bundle in received] == list(range(20, 60))
+assert bytes(received[-1].payload_block.data) == b'packed 59'
+
+# a synchronous send keeps the order of the packed bundles
+assert cla_a.send_to_async(node_b, create_bundle(60, b'first').to_cbor(), results.append)
+assert cla_a.send_to(node_b, create_bundle(61, b'second').to_cbor())
+assert [bundle.primary_block.sequence_number for bundle in receive(cla_b, 2)] == [60, 61]
+
+assert split_datagram(serialized_bundles[0] + serialized_bundles[1]) == serialized_bundles[:2]
+
+# the cla is announced by ipnd
+router = SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_UDPCL: cla_a}, SimpleInMemoryStorage())
+assert router.get_ipnd_services() == [(CONFIGURATION.IPND.IDENTIFIER_UDPCL, PORT_A)]
+
+print('udpcl tests passed')
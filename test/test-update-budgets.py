@@ -0,0 +1,68 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the budgets of the bpa update: update() returns after the item budget or once the time budget is spent, the
+remaining bundles stay queued for the next update, and an idle update returns False.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+CONFIGURATION.LOCAL_DISPATCH_QUEUE_SIZE = 100
+CONFIGURATION.STORAGE_RETRY_INTERVAL_MILLISECONDS = 60000  # only the local stage is active
+
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.endpoints import LocalEndpoint
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import get_current_clock_millis
+
+NUMBER_OF_BUNDLES = 20
+DELIVERY_MILLISECONDS = 20
+
+storage = SimpleInMemoryStorage()
+bpa = BundleProtocolAgent('dtn://node1/', storage, SimpleEpidemicRouter({}, storage))
+bpa.last_storage_retry_sweep = get_current_clock_millis()
+
+received = []
+slow_delivery = [False]
+
+
+def receive(bundle):
+    received.append(bytes(bundle.payload_block.data))
+    if slow_delivery[0]:
+        time.sleep(DELIVERY_MILLISECONDS / 1000)
+
+
+endpoint = bpa.register_endpoint(LocalEndpoint('sink', receive))
+
+for idx in range(NUMBER_OF_BUNDLES):
+    assert endpoint.start_transmission(str(idx).encode(), 'dtn://node1/sink') is not None
+
+# the item budget
+assert bpa.update(max_items=5)
+print('item budget: {} bundles, {} queued'.format(len(received), len(bpa.local_bundle_dispatch_queue)))
+assert len(received) == 5
+assert len(bpa.local_bundle_dispatch_queue) == NUMBER_OF_BUNDLES - 5
+
+# the time budget, the item crossing it is the last one
+slow_delivery[0] = True
+received.clear()
+queued = len(bpa.local_bundle_dispatch_queue)
+start = get_current_clock_millis()
+assert bpa.update(time_budget_milliseconds=3 * DELIVERY_MILLISECONDS)
+duration = get_current_clock_millis() - start
+
+print('time budget: {} bundles in {} milliseconds'.format(len(received), duration))
+assert 2 <= len(received) <= 4
+assert len(bpa.local_bundle_dispatch_queue) == queued - len(received)
+
+# the remaining bundles are processed by the next updates, then the bpa is idle
+slow_delivery[0] = False
+while bpa.update():
+    pass
+assert not bpa.local_bundle_dispatch_queue
+assert not bpa.update()
+
+print('update budget tests passed')
@@ -0,0 +1,77 @@
+"""
+To be run on CPython.
+
+Tests the idle wait of the bpa: wait() blocks until the maximum wait time, and returns early on a wakeup() from another
+thread, on a readable cla socket and if a local bundle is queued.
+"""
+import socket
+import threading
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+
+CONFIGURATION.IPND.ENABLED = False
+CONFIGURATION.STORAGE_RETRY_INTERVAL_MILLISECONDS = 60000
+CONFIGURATION.PORT.MTCP = 16184
+
+from dtn7zero.bundle_protocol_agent import BundleProtocolAgent
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.endpoints import LocalEndpoint
+from dtn7zero.routers.simple_epidemic_router import SimpleEpidemicRouter
+from dtn7zero.storage.simple_in_memory_storage import SimpleInMemoryStorage
+from dtn7zero.utility import get_current_clock_millis
+from helpers import create_mtcp_message
+
+storage = SimpleInMemoryStorage()
+bpa = BundleProtocolAgent('dtn://node1/', storage, SimpleEpidemicRouter({CONFIGURATION.IPND.IDENTIFIER_MTCP: MTcpCLA()}, storage))
+bpa.last_storage_retry_sweep = get_current_clock_millis()
+assert bpa.poller_covers_all_clas
+
+
+def timed_wait(max_wait_milliseconds: int) -> float:
+    start = time.time()
+    bpa.wait(max_wait_milliseconds)
+    return (time.time() - start) * 1000
+
+
+def run_later(function):
+    thread = threading.Timer(0.05, function)
+    thread.start()
+    return thread
+
+
+# without events the wait lasts the maximum wait time
+duration = timed_wait(100)
+print('idle wait: {:.1f} ms'.format(duration))
+assert 90 <= duration < 1000
+
+# a wakeup from another thread
+thread = run_later(bpa.wakeup)
+duration = timed_wait(5000)
+thread.join()
+print('wait with wakeup: {:.1f} ms'.format(duration))
+assert duration < 1000
+assert not bpa.waiting
+
+# a wakeup while not waiting is not pending for the next wait
+bpa.wakeup()
+assert timed_wait(100) >= 90
+
+# a bundle arriving on the mtcp socket
+sender = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+thread = run_later(lambda: sender.connect(('127.0.0.1', CONFIGURATION.PORT.MTCP)) or sender.sendall(create_mtcp_message(0, b'wake up')))
+duration = timed_wait(5000)
+thread.join()
+print('wait with incoming bundle: {:.1f} ms'.format(duration))
+assert duration < 1000
+
+while bpa.update():
+    pass
+sender.close()
+
+# a queued local bundle ends the wait at once
+endpoint = bpa.register_endpoint(LocalEndpoint('source'))
+assert endpoint.start_transmission(b'queued', 'dtn://node2/sink') is not None
+assert timed_wait(5000) < 100
+
+print('wait tests passed')
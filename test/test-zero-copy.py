@@ -0,0 +1,76 @@
+"""
+To be run on CPython or MicroPython.
+
+Tests the zero-copy bundle decoding (payload as memoryview into the received message), the serialization of such
+bundles and the reception over the mtcp cla.
+"""
+import time
+
+from dtn7zero.configuration import CONFIGURATION
+from dtn7zero.convergence_layer_adapters.mtcp import MTcpCLA
+from dtn7zero.data import Node
+from dtn7zero.endpoints import LocalEndpoint
+from dtn7zero.fragmentation import fragment_bundle
+from dtn7zero.serialization import deserialize_bundle, serialize_bundle, FragmentBundle
+from py_dtn7 import Bundle
+from py_dtn7.bundle import PrimaryBlock, PayloadBlock, HopCountBlock
+
+payload = bytes(range(256)) * 40
+
+bundle = Bundle(
+    primary_block=PrimaryBlock.from_objects(
+        full_destination_uri='dtn://node2/sink',
+        full_source_uri='dtn://node1/source',
+        full_report_to_uri='dtn://node1/',
+        bundle_creation_time=1,
+        sequence_number=1
+    ),
+    hop_count_block=HopCountBlock.from_objects(hop_limit=32, hop_count=0),
+    payload_block=PayloadBlock.from_objects(data=payload)
+)
+serialized_bundle = bytearray(bundle.to_cbor())
+
+zero_copy_bundle = deserialize_bundle(serialized_bundle, zero_copy=True)
+data = zero_copy_bundle.payload_block.data
+
+assert isinstance(data, memoryview)
+assert data.obj is serialized_bundle  # a view, not a copy
+assert bytes(data) == payload
+assert zero_copy_bundle.bundle_id == bundle.bundle_id
+assert zero_copy_bundle.hop_count_block.hop_limit == 32
+
+# the serialization of a view payload equals the one of a bytes payload
+assert serialize_bundle(zero_copy_bundle) == bytes(serialized_bundle)
+assert serialize_bundle(bundle) == bytes(serialized_bundle)
+
+# fragments of a view payload are serialized like the ones of a bytes payload
+fragments = [deserialize_bundle(serialize_bundle(fragment)) for fragment in fragment_bundle(zero_copy_bundle, 1024)]
+assert all(isinstance(fragment, FragmentBundle) for fragment in fragments)
+assert b''.join(fragment.payload_block.data for fragment in fragments) == payload
+
+# endpoints without opt-in receive bytes
+received = []
+LocalEndpoint('sink', received.append).bpa_local_bundle_delivery(deserialize_bundle(serialized_bundle, zero_copy=True))
+LocalEndpoint('sink', received.append, zero_copy=True).bpa_local_bundle_delivery(deserialize_bundle(serialized_bundle, zero_copy=True))
+assert isinstance(received[0].payload_block.data, bytes)
+assert isinstance(received[1].payload_block.data, memoryview)
+
+# reception over mtcp
+CONFIGURATION.PORT.MTCP = 16164
+cla = MTcpCLA()
+node = Node('127.0.0.1', (1, '//node1/'), {CONFIGURATION.IPND.IDENTIFIER_MTCP: CONFIGURATION.PORT.MTCP}, 0)
+
+assert cla.send_to(node, bytes(serialized_bundle))
+
+received_bundle = None
+start = time.time()
+while received_bundle is None and time.time() - start < 2:
+    received_bundle, _ = cla.poll()
+
+print('received bundle over mtcp: {}'.format(received_bundle.bundle_id))
+
+assert isinstance(received_bundle.payload_block.data, memoryview)
+assert isinstance(received_bundle.payload_block.data.obj, bytearray)
+assert received_bundle.payload_block.data == payload
+
+print('zero-copy tests passed')